@@ -1,5 +1,8 @@
 from django.contrib import admin
+from courses.cache import bump_learner_version
+from .answer_keys import bump_quiz_version
 from .models import Quiz, Question, Answer, QuizAttempt, StudentAnswer
+from .signals import answer_quiz_id, attempt_course_id
 
 
 class AnswerInline(admin.TabularInline):
@@ -54,6 +57,22 @@ class QuestionAdmin(admin.ModelAdmin):
     )
 
 
+class AnswerAdmin(admin.ModelAdmin):
+    """Admin interface for Answer model."""
+    
+    # Answers have no post_delete signal (see assessments.signals)
+    def delete_model(self, request, obj):
+        quiz_id = answer_quiz_id(obj)
+        super().delete_model(request, obj)
+        bump_quiz_version(quiz_id)
+    
+    def delete_queryset(self, request, queryset):
+        quiz_ids = set(queryset.values_list('question__quiz_id', flat=True))
+        super().delete_queryset(request, queryset)
+        for quiz_id in quiz_ids:
+            bump_quiz_version(quiz_id)
+
+
 class StudentAnswerInline(admin.TabularInline):
     """Show student answers inline when viewing an attempt."""
     model = StudentAnswer
@@ -68,7 +87,7 @@ class QuizAttemptAdmin(admin.ModelAdmin):
     list_display = ['student', 'quiz', 'attempt_number', 'score', 'passed', 'completed_at']
     list_filter = ['passed', 'completed_at', 'quiz']
     search_fields = ['student__email', 'quiz__title']
-    readonly_fields = ['started_at', 'completed_at', 'score', 'total_points', 'earned_points']
+    readonly_fields = ['started_at', 'deadline', 'completed_at', 'score', 'total_points', 'earned_points']
     
     inlines = [StudentAnswerInline]
     
@@ -80,13 +99,25 @@ class QuizAttemptAdmin(admin.ModelAdmin):
             'fields': ('score', 'total_points', 'earned_points', 'passed')
         }),
         ('Timing', {
-            'fields': ('started_at', 'completed_at', 'time_taken_seconds')
+            'fields': ('started_at', 'deadline', 'completed_at', 'time_taken_seconds')
         }),
     )
+    
+    # Attempts have no post_delete signal (see assessments.signals)
+    def delete_model(self, request, obj):
+        course_id = attempt_course_id(obj)
+        super().delete_model(request, obj)
+        bump_learner_version(course_id, obj.student_id)
+    
+    def delete_queryset(self, request, queryset):
+        learners = set(queryset.values_list('quiz__lesson__course_id', 'student_id'))
+        super().delete_queryset(request, queryset)
+        for learner in learners:
+            bump_learner_version(*learner)
 
 
 admin.site.register(Quiz, QuizAdmin)
 admin.site.register(Question, QuestionAdmin)
-admin.site.register(Answer, admin.ModelAdmin)
+admin.site.register(Answer, AnswerAdmin)
 admin.site.register(QuizAttempt, QuizAttemptAdmin)
 admin.site.register(StudentAnswer, admin.ModelAdmin)
\ No newline at end of file
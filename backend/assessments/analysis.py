@@ -0,0 +1,173 @@
+"""
+Item analysis for quizzes.
+
+Classical test statistics computed over the attempt x question matrix of
+completed attempts. The matrix is loaded in one query and every statistic
+is computed with NumPy array operations rather than Python loops.
+"""
+
+import numpy as np
+from django.core.cache import cache
+
+from .answer_keys import get_answer_key
+from .models import QuizAttempt
+
+ANALYSIS_CACHE_TIMEOUT = 60 * 60  # 1 hour
+
+# Share of top and bottom scorers compared by the discrimination index
+DISCRIMINATION_GROUP = 0.27
+
+SCORE_BINS = np.linspace(0, 100, 11)
+
+
+def _round(value, digits=3):
+    """Round a NumPy scalar for JSON, mapping NaN (undefined) to None."""
+    value = float(value)
+    return None if np.isnan(value) else round(value, digits)
+
+
+def _load_matrix(quiz_id, key):
+    """
+    Return (correct, selected) matrices of shape (attempts, questions).
+
+    correct holds 1 where the attempt answered the question correctly,
+    selected holds the chosen answer id or 0 when the question was skipped.
+    """
+    rows = np.array(
+        list(QuizAttempt.objects.filter(
+            quiz_id=quiz_id,
+            completed_at__isnull=False
+        ).values_list(
+            'id',
+            'student_answers__question_id',
+            'student_answers__selected_answer_id',
+            'student_answers__is_correct',
+        )),
+        dtype=object
+    ).reshape(-1, 4)
+    # Attempts without any answers come back once with NULL answer columns
+    rows[rows == None] = 0  # noqa: E711
+    attempt_col, question_col, answer_col, correct_col = rows.astype(np.int64).T
+
+    attempt_ids, attempt_rows = np.unique(attempt_col, return_inverse=True)
+    question_ids = np.array(key.question_ids, dtype=np.int64)
+    correct = np.zeros((len(attempt_ids), len(question_ids)), dtype=np.float64)
+    selected = np.zeros((len(attempt_ids), len(question_ids)), dtype=np.int64)
+    if not len(question_ids):
+        return correct, selected
+
+    # Map question ids to matrix columns
+    order = np.argsort(question_ids)
+    position = np.clip(np.searchsorted(question_ids, question_col, sorter=order), 0, len(order) - 1)
+    columns = order[position]
+    answered = question_ids[columns] == question_col
+
+    correct[attempt_rows[answered], columns[answered]] = correct_col[answered]
+    selected[attempt_rows[answered], columns[answered]] = answer_col[answered]
+    return correct, selected
+
+
+def _point_biserial(items, totals):
+    """
+    Correlation of each item with the rest of the test (total minus item),
+    computed column-wise.
+    """
+    rest = totals[:, None] - items
+    items_c = items - items.mean(axis=0)
+    rest_c = rest - rest.mean(axis=0)
+    denominator = np.sqrt((items_c ** 2).sum(axis=0) * (rest_c ** 2).sum(axis=0))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (items_c * rest_c).sum(axis=0) / denominator
+
+
+def _discrimination(correct, totals):
+    """Difference in p-value between the top and bottom scoring groups."""
+    n = len(totals)
+    group = max(int(round(n * DISCRIMINATION_GROUP)), 1)
+    order = np.argsort(totals, kind='stable')
+    return correct[order[-group:]].mean(axis=0) - correct[order[:group]].mean(axis=0)
+
+
+def _cronbach_alpha(items, totals):
+    k = items.shape[1]
+    total_var = totals.var(ddof=1)
+    if k < 2 or not total_var:
+        return np.nan
+    return k / (k - 1) * (1 - items.var(axis=0, ddof=1).sum() / total_var)
+
+
+def compute_item_analysis(quiz_id):
+    """Compute item statistics for a quiz without caching."""
+    key = get_answer_key(quiz_id)
+    correct, selected = _load_matrix(quiz_id, key)
+    n_attempts, n_questions = correct.shape
+
+    points = np.array([key.points[qid] for qid in key.question_ids], dtype=np.float64)
+    items = correct * points
+    totals = items.sum(axis=1)
+    percent = totals / key.total_points * 100 if key.total_points else np.zeros(n_attempts)
+
+    if n_attempts:
+        p_values = correct.mean(axis=0)
+        point_biserial = _point_biserial(items, totals) if n_attempts > 1 else np.full(n_questions, np.nan)
+        discrimination = _discrimination(correct, totals)
+        alpha = _cronbach_alpha(items, totals) if n_attempts > 1 else np.nan
+    else:
+        p_values = point_biserial = discrimination = np.full(n_questions, np.nan)
+        alpha = np.nan
+
+    # Answer option histograms: count every selected answer id at once
+    option_counts = dict(zip(*np.unique(selected[selected > 0], return_counts=True)))
+    skipped = (selected == 0).sum(axis=0)
+
+    options = {question_id: [] for question_id in key.question_ids}
+    for answer_id, (question_id, is_correct) in key.answers.items():
+        options[question_id].append({
+            'answer_id': answer_id,
+            'is_correct': is_correct,
+            'count': int(option_counts.get(answer_id, 0)),
+        })
+
+    questions = [
+        {
+            'question_id': question_id,
+            'points': key.points[question_id],
+            'p_value': _round(p_values[i]),
+            'discrimination_index': _round(discrimination[i]),
+            'point_biserial': _round(point_biserial[i]),
+            'skipped': int(skipped[i]),
+            'options': options[question_id],
+        }
+        for i, question_id in enumerate(key.question_ids)
+    ]
+
+    histogram, _ = np.histogram(percent, bins=SCORE_BINS)
+    return {
+        'quiz_id': quiz_id,
+        'attempts': n_attempts,
+        'questions': questions,
+        'cronbach_alpha': _round(alpha),
+        'score_summary': {
+            'mean': _round(percent.mean(), 2) if n_attempts else None,
+            'median': _round(np.median(percent), 2) if n_attempts else None,
+            'std_dev': _round(percent.std(ddof=1), 2) if n_attempts > 1 else None,
+        },
+        'score_distribution': [
+            {'range': f'{int(low)}-{int(high)}%', 'count': int(count)}
+            for low, high, count in zip(SCORE_BINS[:-1], SCORE_BINS[1:], histogram)
+        ],
+    }
+
+
+def get_item_analysis(quiz_id):
+    """Item statistics for a quiz, cached per quiz version and attempt count."""
+    attempt_count = QuizAttempt.objects.filter(
+        quiz_id=quiz_id,
+        completed_at__isnull=False
+    ).count()
+    cache_key = f'item-analysis:{quiz_id}:{get_answer_key(quiz_id).version}:{attempt_count}'
+    data = cache.get(cache_key)
+    if data is None:
+        data = compute_item_analysis(quiz_id)
+        cache.set(cache_key, data, ANALYSIS_CACHE_TIMEOUT)
+    return data
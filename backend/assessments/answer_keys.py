@@ -0,0 +1,145 @@
+"""
+Compiled answer keys for quizzes.
+
+Quiz content changes rarely, but grading and several serializers need the
+quiz's structure on every request. An AnswerKey is built once per quiz
+version and kept in a small per-process LRU backed by the shared cache.
+The version is bumped whenever the quiz, one of its questions or one of
+their answers is saved or deleted (see signals.py).
+"""
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import cached_property
+from types import MappingProxyType
+
+from django.core.cache import cache
+
+from courses.cache import get_version, bump_version
+from .models import Question
+
+LOCAL_CACHE_SIZE = 256
+SHARED_CACHE_TIMEOUT = 60 * 60 * 24  # 1 day
+
+# Bump when AnswerKey's fields change, so old pickles in the shared cache are ignored
+KEY_FORMAT = 2
+
+_local_cache = OrderedDict()
+_local_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class AnswerKey:
+    """
+    Everything needed to grade a quiz.
+
+    Keys are shared between requests and threads, so they hold only tuples;
+    the mappings below are read-only views built from them on first use.
+
+    points: question id -> points for the question
+    answers: answer id -> (question id, is_correct)
+    correct_answers: question id -> tuple of correct answer ids
+    correct_answer_text: question id -> text of the first correct answer
+    """
+
+    quiz_id: int
+    version: int
+    point_items: tuple
+    answer_items: tuple
+    correct_answer_items: tuple
+    correct_answer_text_items: tuple
+
+    def __getstate__(self):
+        # Only the tuples go to the shared cache, not the views built from them
+        return {field: self.__dict__[field] for field in self.__dataclass_fields__}
+
+    @cached_property
+    def points(self):
+        return MappingProxyType(dict(self.point_items))
+
+    @cached_property
+    def answers(self):
+        return MappingProxyType(dict(self.answer_items))
+
+    @cached_property
+    def correct_answers(self):
+        return MappingProxyType(dict(self.correct_answer_items))
+
+    @cached_property
+    def correct_answer_text(self):
+        return MappingProxyType(dict(self.correct_answer_text_items))
+
+    @cached_property
+    def question_ids(self):
+        return tuple(question_id for question_id, _ in self.point_items)
+
+    @cached_property
+    def total_points(self):
+        return sum(points for _, points in self.point_items)
+
+    @property
+    def question_count(self):
+        return len(self.point_items)
+
+    @classmethod
+    def compile(cls, quiz_id, version=None):
+        """Build the key for a quiz from the database in one query."""
+        points = {}
+        answers = {}
+        correct_answers = {}
+        correct_answer_text = {}
+        rows = Question.objects.filter(quiz_id=quiz_id).order_by(
+            'order', 'id', 'answers__order', 'answers__id'
+        ).values_list(
+            'id', 'points', 'answers__id', 'answers__is_correct', 'answers__answer_text'
+        )
+        for question_id, question_points, answer_id, is_correct, answer_text in rows:
+            points[question_id] = question_points
+            if answer_id is None:
+                continue
+            answers[answer_id] = (question_id, is_correct)
+            if is_correct:
+                correct_answers[question_id] = correct_answers.get(question_id, ()) + (answer_id,)
+                correct_answer_text.setdefault(question_id, answer_text)
+        return cls(
+            quiz_id=quiz_id,
+            version=version,
+            point_items=tuple(points.items()),
+            answer_items=tuple(answers.items()),
+            correct_answer_items=tuple(correct_answers.items()),
+            correct_answer_text_items=tuple(correct_answer_text.items()),
+        )
+
+
+def quiz_version(quiz_id):
+    return get_version('quiz', quiz_id)
+
+
+def bump_quiz_version(quiz_id):
+    bump_version('quiz', quiz_id)
+
+
+def get_answer_key(quiz_id):
+    """Return the current answer key for a quiz."""
+    version = quiz_version(quiz_id)
+    local_key = (quiz_id, version)
+
+    with _local_lock:
+        key = _local_cache.get(local_key)
+        if key is not None:
+            _local_cache.move_to_end(local_key)
+            return key
+
+    shared_key = f'answer-key:{KEY_FORMAT}:{quiz_id}:{version}'
+    key = cache.get(shared_key)
+    if key is None:
+        key = AnswerKey.compile(quiz_id, version)
+        cache.set(shared_key, key, SHARED_CACHE_TIMEOUT)
+
+    with _local_lock:
+        _local_cache[local_key] = key
+        _local_cache.move_to_end(local_key)
+        while len(_local_cache) > LOCAL_CACHE_SIZE:
+            _local_cache.popitem(last=False)
+    return key
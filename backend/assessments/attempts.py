@@ -0,0 +1,107 @@
+"""
+Quiz attempt allocation and per-student attempt summaries.
+
+Attempt numbers are unique per student and quiz, so the database itself
+decides which of two concurrent starts gets a number: the loser hits the
+unique constraint and retries with the next free number, or gives up once
+the quiz's attempt limit is reached. A start that keeps losing to concurrent
+ones gives up with AttemptAllocationConflict, which is worth retrying.
+"""
+
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Q, Window
+from django.db.models.functions import FirstValue, RowNumber
+from django.utils import timezone
+
+from .models import QuizAttempt
+
+MAX_ALLOCATION_RETRIES = 5
+
+
+class AttemptLimitReached(Exception):
+    """The student has used all attempts allowed for the quiz."""
+
+
+class AttemptAllocationConflict(Exception):
+    """Concurrent starts took every number tried; the start can be retried."""
+
+
+def allocate_attempt(student, quiz):
+    """Create the student's next attempt at a quiz."""
+    for _ in range(MAX_ALLOCATION_RETRIES):
+        last_number = QuizAttempt.objects.filter(
+            student=student,
+            quiz=quiz
+        ).aggregate(last=Max('attempt_number'))['last'] or 0
+
+        if last_number >= quiz.max_attempts:
+            raise AttemptLimitReached(quiz.max_attempts)
+
+        deadline = None
+        if quiz.time_limit_minutes:
+            deadline = timezone.now() + timedelta(minutes=quiz.time_limit_minutes)
+
+        try:
+            with transaction.atomic():
+                return QuizAttempt.objects.create(
+                    student=student,
+                    quiz=quiz,
+                    attempt_number=last_number + 1,
+                    deadline=deadline
+                )
+        except IntegrityError:
+            # Another request took this number first, try the next one
+            continue
+
+    raise AttemptAllocationConflict(quiz.pk)
+
+
+def attempt_summaries(student, course_id=None):
+    """
+    One summary row per quiz the student has attempted, in a single query.
+
+    Window functions over the student's attempts (partitioned by quiz,
+    newest first) give the best and latest completed scores, the number of
+    attempts used and whether any attempt passed; only the newest row of
+    each partition is kept.
+    """
+    attempts = QuizAttempt.objects.filter(student=student)
+    if course_id is not None:
+        attempts = attempts.filter(quiz__lesson__course_id=course_id)
+
+    completed = Q(completed_at__isnull=False)
+    by_quiz = {'partition_by': [F('quiz_id')]}
+    rows = attempts.annotate(
+        row_number=Window(RowNumber(), order_by=F('started_at').desc(), **by_quiz),
+        attempts_used=Window(Count('id'), **by_quiz),
+        best_score=Window(Max('score', filter=completed), **by_quiz),
+        latest_score=Window(
+            FirstValue('score'),
+            order_by=[F('completed_at').desc(nulls_last=True)],
+            **by_quiz
+        ),
+        passed_count=Window(Count('id', filter=Q(passed=True)), **by_quiz),
+    ).filter(row_number=1).values(
+        'quiz_id', 'quiz__title', 'quiz__max_attempts', 'quiz__lesson_id',
+        'started_at', 'completed_at', 'attempts_used', 'best_score',
+        'latest_score', 'passed_count'
+    ).order_by('quiz_id')
+
+    return [
+        {
+            'quiz': row['quiz_id'],
+            'quiz_title': row['quiz__title'],
+            'lesson': row['quiz__lesson_id'],
+            'best_score': row['best_score'],
+            # Only completed attempts have a score worth reporting
+            'latest_score': row['latest_score'] if row['best_score'] is not None else None,
+            'attempts_used': row['attempts_used'],
+            'attempts_remaining': max(row['quiz__max_attempts'] - row['attempts_used'], 0),
+            'passed': row['passed_count'] > 0,
+            'last_attempt_at': row['started_at'],
+            'has_open_attempt': row['completed_at'] is None,
+        }
+        for row in rows
+    ]
@@ -0,0 +1,253 @@
+"""
+Quiz grading engine.
+
+Grades a whole submission in memory against the quiz's cached answer key,
+so the number of queries per submission doesn't grow with the number of
+questions.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import (
+    Case, DecimalField, Exists, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from courses.cache import bump_course_version, bump_learner_version
+
+from .answer_keys import get_answer_key
+from .models import Answer, Question, QuizAttempt, StudentAnswer
+
+
+# Allowance for network latency on submissions made right at the deadline
+SUBMISSION_GRACE = timedelta(seconds=30)
+
+
+class AttemptAlreadyGraded(Exception):
+    """The attempt was completed by an earlier (or concurrent) submission."""
+
+
+def attempt_score(earned, total):
+    """Percentage score as stored: a Decimal rounded half-even to 2 places."""
+    score = Decimal(earned * 100) / total if total > 0 else Decimal(0)
+    return round(score, 2)
+
+
+def pass_threshold(passing_score, total):
+    """Smallest earned_points whose unrounded score reaches passing_score."""
+    if total:
+        return -(-passing_score * total // 100)
+    return 0 if passing_score <= 0 else 1
+
+
+@transaction.atomic
+def grade_attempt(attempt, answers_data, key=None):
+    """
+    Grade submitted answers and complete the attempt.
+
+    answers_data is a list of {'question_id': ..., 'answer_id': ...} dicts.
+    Answers that don't belong to the quiz are ignored, as is any repeat
+    answer to a question already answered in the same submission.
+
+    The attempt is claimed with a conditional UPDATE before grading, so when
+    the same attempt is submitted twice only one submission grades it and
+    the other raises AttemptAlreadyGraded.
+
+    Timed attempts are completed at their deadline at the latest. Answers
+    arriving more than SUBMISSION_GRACE after the deadline are discarded.
+    """
+    completed_at = timezone.now()
+    if attempt.deadline:
+        if completed_at > attempt.deadline + SUBMISSION_GRACE:
+            answers_data = []
+        completed_at = min(completed_at, attempt.deadline)
+
+    claimed = QuizAttempt.objects.filter(
+        pk=attempt.pk,
+        completed_at__isnull=True
+    ).update(completed_at=completed_at)
+    if not claimed:
+        raise AttemptAlreadyGraded(attempt.pk)
+
+    quiz = attempt.quiz
+    if key is None:
+        key = get_answer_key(quiz.pk)
+
+    student_answers = {}
+    for answer_data in answers_data:
+        question_id = answer_data.get('question_id')
+        answer_id = answer_data.get('answer_id')
+
+        if question_id not in key.points or question_id in student_answers:
+            continue
+        answer_question_id, is_correct = key.answers.get(answer_id, (None, False))
+        if answer_question_id != question_id:
+            continue
+
+        student_answers[question_id] = StudentAnswer(
+            attempt=attempt,
+            question_id=question_id,
+            selected_answer_id=answer_id,
+            is_correct=is_correct,
+            points_earned=key.points[question_id] if is_correct else 0
+        )
+
+    earned = sum(sa.points_earned for sa in student_answers.values())
+    total = key.total_points
+
+    attempt.completed_at = completed_at
+    attempt.time_taken_seconds = int((completed_at - attempt.started_at).total_seconds())
+    attempt.total_points = total
+    attempt.earned_points = earned
+    attempt.score = attempt_score(earned, total)
+    attempt.passed = earned >= pass_threshold(quiz.passing_score, total)
+
+    StudentAnswer.objects.bulk_create(student_answers.values())
+    attempt.save(update_fields=[
+        'time_taken_seconds', 'total_points', 'earned_points', 'score', 'passed'
+    ])
+    return attempt
+
+
+def close_expired_attempts(now=None, chunk_size=500):
+    """
+    Complete open attempts whose deadline (plus grace) has passed.
+
+    Expired attempts never had their answers submitted, so they are graded
+    as empty and took the whole time from their start to their deadline
+    (the time limit when they started, whatever the quiz's limit is now).
+    Attempts are walked in id order in chunks, and each chunk is closed with
+    one UPDATE per quiz and attempt duration. Returns the number of
+    attempts closed.
+    """
+    if now is None:
+        now = timezone.now()
+
+    expired = QuizAttempt.objects.filter(
+        completed_at__isnull=True,
+        deadline__lt=now - SUBMISSION_GRACE
+    ).order_by('id')
+
+    closed = 0
+    last_id = 0
+    while True:
+        chunk = list(expired.filter(id__gt=last_id).values_list(
+            'id', 'quiz_id', 'student_id', 'quiz__passing_score',
+            'started_at', 'deadline', 'quiz__lesson__course_id'
+        )[:chunk_size])
+        if not chunk:
+            break
+        last_id = chunk[-1][0]
+
+        # Attempts started under the same time limit share a duration
+        by_quiz = {}
+        for attempt_id, quiz_id, _, passing_score, started_at, deadline, _ in chunk:
+            time_taken = round((deadline - started_at).total_seconds())
+            by_quiz.setdefault((quiz_id, passing_score, time_taken), []).append(attempt_id)
+
+        with transaction.atomic():
+            for (quiz_id, passing_score, time_taken), attempt_ids in by_quiz.items():
+                closed += QuizAttempt.objects.filter(
+                    id__in=attempt_ids,
+                    completed_at__isnull=True
+                ).update(
+                    completed_at=F('deadline'),
+                    time_taken_seconds=time_taken,
+                    total_points=get_answer_key(quiz_id).total_points,
+                    earned_points=0,
+                    score=0,
+                    passed=passing_score <= 0
+                )
+
+        # Bulk updates skip signals, so invalidate cached learner data here
+        for learner in {(course_id, student_id) for _, _, student_id, _, _, _, course_id in chunk}:
+            bump_learner_version(*learner)
+
+    return closed
+
+
+def regrade_quiz(quiz, batch_size=2000):
+    """
+    Recompute every completed attempt of a quiz against its current answers.
+
+    Used after an answer's is_correct flag or a question's points change.
+    Attempts are walked in id order in batches. Each batch is regraded with
+    set-based UPDATEs, so student answers are never loaded into Python.
+    Scores can only take total + 1 values, so the ones a batch needs are
+    computed by attempt_score, exactly as grade_attempt stores them, rather
+    than by the database's ROUND (half away from zero, on floats in SQLite).
+
+    Returns a report with the number of attempts regraded and the ids of the
+    attempts whose pass/fail outcome changed.
+    """
+    key = get_answer_key(quiz.pk)
+    total = key.total_points
+    threshold = pass_threshold(quiz.passing_score, total)
+
+    selected_answer = Answer.objects.filter(pk=OuterRef('selected_answer_id'))
+    question_points = Question.objects.filter(
+        pk=OuterRef('question_id')
+    ).values('points')[:1]
+    attempt_earned = StudentAnswer.objects.filter(
+        attempt_id=OuterRef('pk')
+    ).values('attempt_id').annotate(earned=Sum('points_earned')).values('earned')
+
+    attempts = QuizAttempt.objects.filter(
+        quiz=quiz,
+        completed_at__isnull=False
+    ).order_by('id')
+
+    report = {'regraded': 0, 'newly_passed': [], 'newly_failed': []}
+    last_id = 0
+    while True:
+        ids = list(attempts.filter(id__gt=last_id).values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        first_id, last_id = ids[0], ids[-1]
+        batch = attempts.filter(id__gte=first_id, id__lte=last_id)
+
+        with transaction.atomic():
+            StudentAnswer.objects.filter(
+                attempt__quiz=quiz,
+                attempt_id__gte=first_id,
+                attempt_id__lte=last_id
+            ).update(
+                is_correct=Coalesce(Subquery(selected_answer.values('is_correct')[:1]), Value(False)),
+                points_earned=Case(
+                    When(Exists(selected_answer.filter(is_correct=True)), then=Subquery(question_points)),
+                    default=Value(0),
+                    output_field=IntegerField()
+                )
+            )
+            batch.update(
+                earned_points=Coalesce(Subquery(attempt_earned), Value(0)),
+                total_points=total
+            )
+
+            report['newly_passed'] += batch.filter(
+                passed=False, earned_points__gte=threshold
+            ).values_list('id', flat=True)
+            report['newly_failed'] += batch.filter(
+                passed=True, earned_points__lt=threshold
+            ).values_list('id', flat=True)
+
+            earned_values = batch.order_by().values_list('earned_points', flat=True).distinct()
+            report['regraded'] += batch.update(
+                score=Case(
+                    *[When(earned_points=earned, then=Value(attempt_score(earned, total)))
+                      for earned in earned_values],
+                    default=Value(Decimal(0)),
+                    output_field=DecimalField(max_digits=5, decimal_places=2)
+                ),
+                passed=Case(
+                    When(earned_points__gte=threshold, then=Value(True)),
+                    default=Value(False)
+                )
+            )
+
+    # Bulk updates skip signals: invalidate every student's cached view of the course
+    bump_course_version(quiz.lesson.course_id)
+    return report
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from assessments.grading import close_expired_attempts
+
+
+class Command(BaseCommand):
+    help = 'Close and grade timed quiz attempts whose deadline has passed'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Number of attempts closed per batch'
+        )
+
+    def handle(self, *args, **options):
+        closed = close_expired_attempts(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Closed {closed} expired attempt(s)'))
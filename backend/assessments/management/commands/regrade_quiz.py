@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from assessments.grading import regrade_quiz
+from assessments.models import Quiz
+
+
+class Command(BaseCommand):
+    help = 'Regrade every completed attempt of a quiz against its current answer key'
+
+    def add_arguments(self, parser):
+        parser.add_argument('quiz_id', type=int)
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Number of attempts regraded per batch'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            quiz = Quiz.objects.select_related('lesson').get(pk=options['quiz_id'])
+        except Quiz.DoesNotExist:
+            raise CommandError(f"Quiz {options['quiz_id']} does not exist")
+
+        report = regrade_quiz(quiz, batch_size=options['batch_size'])
+
+        self.stdout.write(f"Regraded {report['regraded']} attempt(s)")
+        self.stdout.write(f"Newly passed: {len(report['newly_passed'])} {report['newly_passed']}")
+        self.stdout.write(f"Newly failed: {len(report['newly_failed'])} {report['newly_failed']}")
+        self.stdout.write(self.style.SUCCESS('Regrade complete'))
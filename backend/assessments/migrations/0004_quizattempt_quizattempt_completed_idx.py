@@ -0,0 +1,19 @@
+# Generated by Django 5.2.9 on 2026-10-19 00:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0003_quizattempt_quizattempt_student_quiz_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['student', 'quiz', 'completed_at', 'started_at'], name='quizattempt_completed_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.9 on 2026-10-19 03:42
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0004_quizattempt_quizattempt_completed_idx'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='quizattempt',
+            name='quizattempt_open_idx',
+        ),
+    ]
@@ -34,7 +34,13 @@ class Quiz(models.Model):
     
     def total_points(self):
         """Calculate total points in quiz."""
-        return sum(q.points for q in self.questions.all())
+        from .answer_keys import get_answer_key
+        return get_answer_key(self.pk).total_points
+    
+    def total_questions(self):
+        """Count questions in quiz."""
+        from .answer_keys import get_answer_key
+        return get_answer_key(self.pk).question_count
 
 
 class Question(models.Model):
@@ -118,6 +124,7 @@ class QuizAttempt(models.Model):
     passed = models.BooleanField(default=False)
     
     started_at = models.DateTimeField(auto_now_add=True)
+    deadline = models.DateTimeField(null=True, blank=True, help_text='Set for timed quizzes')
     completed_at = models.DateTimeField(null=True, blank=True)
     time_taken_seconds = models.IntegerField(null=True, blank=True)
     
@@ -127,6 +134,23 @@ class QuizAttempt(models.Model):
     class Meta:
         ordering = ['-started_at']
         unique_together = ['student', 'quiz', 'attempt_number']
+        indexes = [
+            models.Index(
+                fields=['student', 'quiz', '-started_at'],
+                name='quizattempt_student_quiz_idx'
+            ),
+            # Completed-attempt lookups (best score, results, summaries)
+            models.Index(
+                fields=['student', 'quiz', 'completed_at', 'started_at'],
+                name='quizattempt_completed_idx'
+            ),
+            # Deadline sweeps; only open attempts are indexed, so it stays small
+            models.Index(
+                fields=['deadline'],
+                condition=models.Q(completed_at__isnull=True),
+                name='quizattempt_open_deadline_idx'
+            ),
+        ]
     
     def calculate_score(self):
         """Calculate score based on student answers."""
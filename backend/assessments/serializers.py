@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from .answer_keys import get_answer_key
 from .models import Quiz, Question, Answer, QuizAttempt, StudentAnswer
 
 
@@ -43,7 +44,7 @@ class QuizSerializer(serializers.ModelSerializer):
     """Serializer for Quiz model (basic info)."""
     
     total_points = serializers.IntegerField(read_only=True)
-    total_questions = serializers.SerializerMethodField()
+    total_questions = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = Quiz
@@ -52,9 +53,6 @@ class QuizSerializer(serializers.ModelSerializer):
             'passing_score', 'time_limit_minutes', 'max_attempts',
             'total_points', 'total_questions'
         ]
-    
-    def get_total_questions(self, obj):
-        return obj.questions.count()
 
 
 class QuizDetailSerializer(serializers.ModelSerializer):
@@ -89,8 +87,12 @@ class StudentAnswerSerializer(serializers.ModelSerializer):
         ]
     
     def get_correct_answer_text(self, obj):
-        correct = obj.question.get_correct_answer()
-        return correct.answer_text if correct else None
+        # Answer keys are looked up once per quiz for the whole result list
+        keys = self.context.setdefault('answer_keys', {})
+        quiz_id = obj.question.quiz_id
+        if quiz_id not in keys:
+            keys[quiz_id] = get_answer_key(quiz_id)
+        return keys[quiz_id].correct_answer_text.get(obj.question_id)
 
 
 class QuizAttemptSerializer(serializers.ModelSerializer):
@@ -104,11 +106,11 @@ class QuizAttemptSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'quiz', 'quiz_title', 'student', 'student_email',
             'attempt_number', 'score', 'total_points', 'earned_points',
-            'passed', 'started_at', 'completed_at', 'time_taken_seconds'
+            'passed', 'started_at', 'deadline', 'completed_at', 'time_taken_seconds'
         ]
         read_only_fields = [
             'student', 'score', 'total_points', 'earned_points',
-            'passed', 'started_at', 'completed_at'
+            'passed', 'started_at', 'deadline', 'completed_at', 'time_taken_seconds'
         ]
 
 
@@ -123,11 +125,26 @@ class QuizAttemptDetailSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'quiz', 'quiz_title', 'attempt_number',
             'score', 'total_points', 'earned_points', 'passed',
-            'started_at', 'completed_at', 'time_taken_seconds',
+            'started_at', 'deadline', 'completed_at', 'time_taken_seconds',
             'student_answers'
         ]
 
 
+class QuizAttemptSummarySerializer(serializers.Serializer):
+    """Serializer for a student's attempt summary on one quiz."""
+    
+    quiz = serializers.IntegerField()
+    quiz_title = serializers.CharField()
+    lesson = serializers.IntegerField()
+    best_score = serializers.DecimalField(max_digits=5, decimal_places=2, allow_null=True)
+    latest_score = serializers.DecimalField(max_digits=5, decimal_places=2, allow_null=True)
+    attempts_used = serializers.IntegerField()
+    attempts_remaining = serializers.IntegerField()
+    passed = serializers.BooleanField()
+    last_attempt_at = serializers.DateTimeField()
+    has_open_attempt = serializers.BooleanField()
+
+
 class SubmitQuizSerializer(serializers.Serializer):
     """Serializer for submitting quiz answers."""
     
@@ -136,4 +153,4 @@ class SubmitQuizSerializer(serializers.Serializer):
             child=serializers.IntegerField()
         )
     )
-    time_taken_seconds = serializers.IntegerField(required=False)
\ No newline at end of file
+    attempt_id = serializers.IntegerField(required=False)
\ No newline at end of file
@@ -0,0 +1,57 @@
+"""
+Signal handlers that keep cached quiz data fresh.
+
+Answers and quiz attempts have no post_delete handler: a receiver would
+stop Django from fast-deleting them when a question, quiz, lesson or course
+is deleted, and those deletions bump the quiz or course version themselves.
+AnswerAdmin and QuizAttemptAdmin bump for rows deleted on their own.
+"""
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from courses.cache import bump_course_version, bump_learner_version
+from .answer_keys import bump_quiz_version
+from .models import Quiz, Question, Answer, QuizAttempt
+
+
+def answer_quiz_id(answer):
+    """Quiz of an answer; no query if its question is loaded (as in admin inlines)."""
+    if Answer.question.is_cached(answer):
+        return answer.question.quiz_id
+    return Question.objects.values_list('quiz_id', flat=True).get(pk=answer.question_id)
+
+
+def attempt_course_id(attempt):
+    """Course of an attempt's quiz; no query if the quiz and its lesson are loaded."""
+    if QuizAttempt.quiz.is_cached(attempt) and Quiz.lesson.is_cached(attempt.quiz):
+        return attempt.quiz.lesson.course_id
+    return Quiz.objects.values_list('lesson__course_id', flat=True).get(pk=attempt.quiz_id)
+
+
+def cascaded(sender, origin=None):
+    """True for a post_delete caused by deleting rows of another model."""
+    return origin is not None and getattr(origin, 'model', type(origin)) is not sender
+
+
+@receiver([post_save, post_delete], sender=Quiz)
+def quiz_changed(sender, instance, origin=None, **kwargs):
+    bump_quiz_version(instance.pk)
+    # A deleted lesson or course bumps the course version itself
+    if not cascaded(sender, origin):
+        bump_course_version(instance.lesson.course_id)
+
+
+@receiver([post_save, post_delete], sender=Question)
+def question_changed(sender, instance, **kwargs):
+    bump_quiz_version(instance.quiz_id)
+
+
+@receiver(post_save, sender=Answer)
+def answer_changed(sender, instance, **kwargs):
+    bump_quiz_version(answer_quiz_id(instance))
+
+
+@receiver(post_save, sender=QuizAttempt)
+def quiz_attempt_changed(sender, instance, **kwargs):
+    bump_learner_version(attempt_course_id(instance), instance.student_id)
@@ -1,3 +1,497 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.db import IntegrityError, connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from config.query_budget import QUERY_BUDGETS, query_budget
+from config.query_plans import QueryPlanAssertions, seed_dataset
+from courses.models import Category, Course, Lesson
+from enrollments.models import Enrollment
+from users.models import User
+from .analysis import compute_item_analysis
+from .answer_keys import bump_quiz_version, get_answer_key
+from .attempts import AttemptAllocationConflict, allocate_attempt, attempt_summaries
+from .grading import close_expired_attempts, grade_attempt, regrade_quiz
+from .models import Answer, Question, Quiz, QuizAttempt, StudentAnswer
+
+
+def make_quiz(questions, max_attempts=3, time_limit_minutes=None):
+    """A published course whose one quiz has `questions` four-answer questions."""
+    instructor = User.objects.create_user(
+        email=f'instructor{User.objects.count()}@example.com', password='unused', role='instructor'
+    )
+    category, _ = Category.objects.get_or_create(name='Tests', slug='tests')
+    course = Course.objects.create(
+        title='Quiz course', description='For tests', instructor=instructor,
+        category=category, status='published'
+    )
+    lesson = Lesson.objects.create(course=course, title='Lesson', order=1)
+    quiz = Quiz.objects.create(
+        lesson=lesson, title='Quiz', max_attempts=max_attempts,
+        time_limit_minutes=time_limit_minutes
+    )
+    created = Question.objects.bulk_create(
+        Question(quiz=quiz, question_text=f'Q{n}', points=1, order=n) for n in range(questions)
+    )
+    Answer.objects.bulk_create(
+        Answer(question=question, answer_text=f'A{m}', is_correct=m == 0, order=m)
+        for question in created for m in range(4)
+    )
+    return quiz
+
+
+def make_student(quiz):
+    student = User.objects.create_user(
+        email=f'student{User.objects.count()}@example.com', password='unused'
+    )
+    Enrollment.objects.create(student=student, course=quiz.lesson.course)
+    return student
+
+
+def client_for(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+def correct_answers(quiz):
+    key = get_answer_key(quiz.pk)
+    return [
+        {'question_id': question_id, 'answer_id': key.correct_answers[question_id][0]}
+        for question_id in key.question_ids
+    ]
+
+
+class SubmitQueryCountTests(TestCase):
+    """Grading a submission costs the same number of queries at any quiz size."""
+
+    # Quiz, attempt, claim UPDATE, answers INSERT, attempt UPDATE, two for
+    # the results, and the SAVEPOINT/RELEASE of grade_attempt's transaction
+    SUBMIT_QUERIES = 9
+
+    def assert_submit_queries(self, questions):
+        quiz = make_quiz(questions)
+        student = make_student(quiz)
+        attempt = allocate_attempt(student, quiz)
+        answers = correct_answers(quiz)  # also warms the answer key
+
+        with self.assertNumQueries(self.SUBMIT_QUERIES):
+            response = client_for(student).post(
+                f'/api/quizzes/{quiz.pk}/submit/',
+                {'attempt_id': attempt.pk, 'answers': answers},
+                format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['earned_points'], questions)
+
+    def test_submit_10_questions(self):
+        self.assert_submit_queries(10)
+
+    def test_submit_100_questions(self):
+        self.assert_submit_queries(100)
+
+
+def run_concurrently(count, func):
+    """Call func() from `count` threads at once; return their results."""
+    barrier = threading.Barrier(count)
+    results = []
+
+    def run():
+        try:
+            barrier.wait()
+            results.append(func())
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=run) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class RepeatSubmitTests(TestCase):
+    def test_repeat_submit_without_attempt_id_returns_graded_result(self):
+        quiz = make_quiz(3)
+        student = make_student(quiz)
+        client = client_for(student)
+        client.post(f'/api/quizzes/{quiz.pk}/start_attempt/')
+        answers = correct_answers(quiz)
+
+        first = client.post(f'/api/quizzes/{quiz.pk}/submit/', {'answers': answers}, format='json')
+        again = client.post(f'/api/quizzes/{quiz.pk}/submit/', {'answers': []}, format='json')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.data['id'], first.data['id'])
+        self.assertEqual(again.data['earned_points'], 3)
+
+    def test_submit_without_any_attempt_is_rejected(self):
+        quiz = make_quiz(1)
+        response = client_for(make_student(quiz)).post(
+            f'/api/quizzes/{quiz.pk}/submit/', {'answers': []}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class AttemptStartTests(TestCase):
+    def test_start_losing_every_race_is_a_conflict(self):
+        quiz = make_quiz(1)
+        student = make_student(quiz)
+
+        with mock.patch.object(QuizAttempt.objects, 'create', side_effect=IntegrityError):
+            with self.assertRaises(AttemptAllocationConflict):
+                allocate_attempt(student, quiz)
+            response = client_for(student).post(f'/api/quizzes/{quiz.pk}/start_attempt/')
+        self.assertEqual(response.status_code, 409)
+
+
+class AttemptSummaryTests(TestCase):
+    def setUp(self):
+        self.practice = make_quiz(2)
+        self.exam = make_quiz(10)
+        self.student = make_student(self.practice)
+        Enrollment.objects.create(student=self.student, course=self.exam.lesson.course)
+
+        def answered(quiz, correct):
+            return correct_answers(quiz)[:correct]
+
+        for correct in (2, 1):
+            grade_attempt(allocate_attempt(self.student, self.practice), answered(self.practice, correct))
+        allocate_attempt(self.student, self.practice)
+        grade_attempt(allocate_attempt(self.student, self.exam), answered(self.exam, 3))
+        # Someone else's attempts stay out of it
+        other = make_student(self.exam)
+        grade_attempt(allocate_attempt(other, self.exam), correct_answers(self.exam))
+
+    def summary(self, query=''):
+        return client_for(self.student).get(f'/api/quiz-attempts/summary/{query}')
+
+    def test_one_row_per_quiz(self):
+        with self.assertNumQueries(1):
+            summaries = attempt_summaries(self.student)
+        self.assertEqual([row['quiz'] for row in summaries], [self.practice.pk, self.exam.pk])
+
+        response = self.summary()
+        self.assertEqual(response.status_code, 200)
+        practice, exam = response.data
+        self.assertEqual(
+            {key: practice[key] for key in (
+                'best_score', 'latest_score', 'attempts_used', 'attempts_remaining',
+                'passed', 'has_open_attempt'
+            )},
+            {
+                'best_score': '100.00', 'latest_score': '50.00', 'attempts_used': 3,
+                'attempts_remaining': 0, 'passed': True, 'has_open_attempt': True,
+            }
+        )
+        self.assertEqual(
+            (exam['best_score'], exam['latest_score'], exam['attempts_used'], exam['passed']),
+            ('30.00', '30.00', 1, False)
+        )
+        self.assertEqual(exam['attempts_remaining'], 2)
+        self.assertFalse(exam['has_open_attempt'])
+
+    def test_filter_by_course(self):
+        response = self.summary(f'?course_id={self.exam.lesson.course_id}')
+        self.assertEqual([row['quiz'] for row in response.data], [self.exam.pk])
+
+        response = self.summary('?course_id=first')
+        self.assertEqual(response.status_code, 400)
+
+
+class ConcurrentAttemptTests(TransactionTestCase):
+    """Concurrent starts and submits from one student, each on its own connection."""
+
+    def test_concurrent_starts_allocate_exactly_max_attempts(self):
+        quiz = make_quiz(2, max_attempts=3)
+        student = make_student(quiz)
+
+        statuses = run_concurrently(
+            10, lambda: client_for(student).post(f'/api/quizzes/{quiz.pk}/start_attempt/').status_code
+        )
+        self.assertEqual(sorted(statuses), [201] * 3 + [400] * 7)
+        self.assertEqual(
+            sorted(QuizAttempt.objects.filter(student=student).values_list('attempt_number', flat=True)),
+            [1, 2, 3]
+        )
+
+    def test_concurrent_submits_grade_once(self):
+        quiz = make_quiz(5)
+        student = make_student(quiz)
+        attempt = allocate_attempt(student, quiz)
+        answers = correct_answers(quiz)
+
+        def submit():
+            response = client_for(student).post(
+                f'/api/quizzes/{quiz.pk}/submit/',
+                {'attempt_id': attempt.pk, 'answers': answers},
+                format='json'
+            )
+            return response.status_code, response.data['id'], response.data['earned_points']
+
+        results = run_concurrently(8, submit)
+        self.assertEqual(results, [(200, attempt.pk, 5)] * 8)
+        self.assertEqual(StudentAnswer.objects.filter(attempt=attempt).count(), 5)
+
+
+class CloseExpiredAttemptsTests(TestCase):
+    def test_time_taken_comes_from_each_attempts_deadline(self):
+        quiz = make_quiz(2, max_attempts=5, time_limit_minutes=10)
+        first = allocate_attempt(make_student(quiz), quiz)
+        quiz.time_limit_minutes = 20
+        quiz.save()
+        second = allocate_attempt(make_student(quiz), quiz)
+        # Limits can also be removed while timed attempts are still open
+        quiz.time_limit_minutes = None
+        quiz.save()
+
+        closed = close_expired_attempts(now=timezone.now() + timedelta(hours=1))
+        self.assertEqual(closed, 2)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.time_taken_seconds, 600)
+        self.assertEqual(second.time_taken_seconds, 1200)
+        self.assertEqual(first.completed_at, first.deadline)
+        self.assertEqual(second.total_points, 2)
+
+
+class RegradeTests(TestCase):
+    def test_regrade_matches_a_fresh_grade(self):
+        quiz = make_quiz(3)
+        questions = list(quiz.questions.order_by('order'))
+        for question, points in zip(questions, (1, 2, 797)):
+            question.points = points
+            question.save()
+
+        def answer(question, option):
+            return {'question_id': question.pk, 'answer_id': question.answers.get(order=option).pk}
+
+        q0, q1, q2 = questions
+        submissions = [
+            [answer(q0, 0)],
+            [answer(q0, 0), answer(q1, 0)],
+            [answer(q1, 0)],
+            [answer(q1, 0), answer(q2, 1)],
+        ]
+        graded = []
+        for answers in submissions:
+            student = make_student(quiz)
+            graded.append((student, answers, grade_attempt(allocate_attempt(student, quiz), answers)))
+
+        # Out of 800 points, 1 scores 0.125%: 0.12 rounded half-even, 0.13 by SQL ROUND
+        q1.points = 1
+        q1.save()
+        q2.points = 798
+        q2.save()
+        q2.answers.filter(order=0).update(is_correct=False)
+        answer_1 = q2.answers.get(order=1)
+        answer_1.is_correct = True
+        answer_1.save()
+
+        report = regrade_quiz(quiz, batch_size=3)
+        self.assertEqual(report['regraded'], 4)
+        self.assertEqual(report['newly_passed'], [graded[3][2].pk])
+
+        for student, answers, attempt in graded:
+            attempt.refresh_from_db()
+            fresh = grade_attempt(allocate_attempt(student, quiz), answers)
+            self.assertEqual(
+                (attempt.earned_points, attempt.total_points, attempt.score, attempt.passed),
+                (fresh.earned_points, fresh.total_points, fresh.score, fresh.passed)
+            )
+            self.assertEqual(
+                set(attempt.student_answers.values_list('question_id', 'is_correct', 'points_earned')),
+                set(fresh.student_answers.values_list('question_id', 'is_correct', 'points_earned'))
+            )
+        self.assertEqual(str(graded[2][2].score), '0.12')
+
+
+class ItemAnalysisTests(TestCase):
+    def setUp(self):
+        self.quiz = make_quiz(3)
+        questions = list(self.quiz.questions.order_by('order'))
+
+        def answers(*options):
+            # Option 0 is the correct one; None skips the question
+            return [
+                {'question_id': question.pk, 'answer_id': question.answers.get(order=option).pk}
+                for question, option in zip(questions, options) if option is not None
+            ]
+
+        # Correct per question:   q0  q1  q2    total
+        submissions = [
+            answers(0, 0, 0),     # 1   1   1     3
+            answers(0, 1, 0),     # 1   0   1     2
+            answers(1, 0, 2),     # 0   1   0     1
+            answers(0, None, 1),  # 1   -   0     1
+        ]
+        for submission in submissions:
+            student = make_student(self.quiz)
+            grade_attempt(allocate_attempt(student, self.quiz), submission)
+
+    def test_statistics(self):
+        analysis = compute_item_analysis(self.quiz.pk)
+        self.assertEqual(analysis['attempts'], 4)
+        questions = analysis['questions']
+        self.assertEqual([q['p_value'] for q in questions], [0.75, 0.5, 0.5])
+        # 27% of 4 attempts rounds to one: the top (3 points) against the
+        # first of the two lowest (1 point each)
+        self.assertEqual([q['discrimination_index'] for q in questions], [1.0, 0.0, 1.0])
+        self.assertEqual([q['skipped'] for q in questions], [0, 1, 0])
+        self.assertEqual([option['count'] for option in questions[2]['options']], [2, 1, 1, 0])
+        # Item variances sum to the variance of the totals
+        self.assertEqual(analysis['cronbach_alpha'], 0.0)
+        self.assertEqual(analysis['score_summary'], {'mean': 58.33, 'median': 50.0, 'std_dev': 31.91})
+
+    def test_quiz_without_attempts(self):
+        quiz = make_quiz(2)
+        analysis = compute_item_analysis(quiz.pk)
+        self.assertEqual(analysis['attempts'], 0)
+        self.assertEqual(
+            [(q['p_value'], q['discrimination_index'], q['skipped']) for q in analysis['questions']],
+            [(None, None, 0)] * 2
+        )
+        self.assertEqual(analysis['score_summary'], {'mean': None, 'median': None, 'std_dev': None})
+        self.assertEqual(sum(row['count'] for row in analysis['score_distribution']), 0)
+
+    def test_only_the_instructor_sees_the_report(self):
+        path = f'/api/quizzes/{self.quiz.pk}/item_analysis/'
+        student = client_for(make_student(self.quiz))
+        # The course comes with the quiz
+        with self.assertNumQueries(1):
+            response = student.get(path)
+        self.assertEqual(response.status_code, 403)
+
+        response = client_for(self.quiz.lesson.course.instructor).get(path)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['attempts'], 4)
+
+
+class ResultsQueryCountTests(TestCase):
+    """Results and attempt history render in a fixed number of queries."""
+
+    # The attempt, then its answers with their questions and chosen answers
+    RESULTS_QUERIES = 2
+    # The attempts with their quizzes and students
+    HISTORY_QUERIES = 1
+
+    def assert_results_queries(self, questions):
+        quiz = make_quiz(questions)
+        student = make_student(quiz)
+        attempt = allocate_attempt(student, quiz)
+        grade_attempt(attempt, correct_answers(quiz))
+
+        with self.assertNumQueries(self.RESULTS_QUERIES):
+            response = client_for(student).get(f'/api/quiz-attempts/{attempt.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['student_answers']), questions)
+        self.assertTrue(all(row['correct_answer_text'] == 'A0' for row in response.data['student_answers']))
+
+    def test_results_5_questions(self):
+        self.assert_results_queries(5)
+
+    def test_results_50_questions(self):
+        self.assert_results_queries(50)
+
+    def assert_history_queries(self, quizzes, attempts_each):
+        quiz_list = [make_quiz(1, max_attempts=attempts_each) for _ in range(quizzes)]
+        student = make_student(quiz_list[0])
+        QuizAttempt.objects.bulk_create(
+            QuizAttempt(student=student, quiz=quiz, attempt_number=n + 1)
+            for quiz in quiz_list for n in range(attempts_each)
+        )
+
+        with self.assertNumQueries(self.HISTORY_QUERIES):
+            response = client_for(student).get('/api/quiz-attempts/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), quizzes * attempts_each)
+
+    def test_history_1_attempt(self):
+        self.assert_history_queries(1, 1)
+
+    def test_history_200_attempts(self):
+        self.assert_history_queries(4, 50)
+
+
+class AnswerKeyTests(TestCase):
+    def test_key_cannot_be_changed_through_its_mappings(self):
+        quiz = make_quiz(3)
+        key = get_answer_key(quiz.pk)
+        question_id = key.question_ids[0]
+        with self.assertRaises(TypeError):
+            key.points[question_id] = 100
+        self.assertEqual(get_answer_key(quiz.pk).total_points, 3)
+
+    def test_answer_edit_invalidates_key(self):
+        quiz = make_quiz(2)
+        question = quiz.questions.first()
+        self.assertEqual(get_answer_key(quiz.pk).total_points, 2)
+        answer = Answer.objects.filter(question=question, is_correct=False).select_related('question').first()
+        # The question is loaded, so the signal needs no query
+        with self.assertNumQueries(1):
+            answer.is_correct = True
+            answer.save()
+        self.assertEqual(len(get_answer_key(quiz.pk).correct_answers[question.pk]), 2)
+
+    def test_quiz_delete_query_count_does_not_grow_with_answers(self):
+        def delete_queries(questions):
+            quiz = make_quiz(questions)
+            with CaptureQueriesContext(connection) as queries:
+                quiz.delete()
+            return len(queries)
+
+        # Up to 100 answers, so Django deletes them in a single batch
+        self.assertEqual(delete_queries(25), delete_queries(5))
+
+
+class QueryPlanTests(QueryPlanAssertions, TestCase):
+    """Hot quiz endpoints don't scan tables that grow with students."""
+
+    ENDPOINTS = [
+        ('quiz detail', 'student', '/api/quizzes/{quiz}/'),
+        ('attempt history', 'student', '/api/quiz-attempts/'),
+        ('attempt results', 'student', '/api/quiz-attempts/{attempt}/'),
+        ('attempt summary', 'student', '/api/quiz-attempts/summary/?course_id={course}'),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seed = seed_dataset()
+
+    def test_hot_endpoints_use_indexes(self):
+        self.assertNoFullScans(self.seed, self.ENDPOINTS)
+
+
+class QueryBudgetTests(TestCase):
+    """Hot quiz endpoints stay within their QUERY_BUDGETS."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seed = seed_dataset()
+
+    def setUp(self):
+        student = self.seed['users']['student']
+        self.quiz = Quiz.objects.get(pk=self.seed['ids']['quiz'])
+        self.attempt = allocate_attempt(student, self.quiz)
+        self.answers = [
+            {'question_id': question.pk, 'answer_id': question.answers.all()[0].pk}
+            for question in self.quiz.questions.prefetch_related('answers')
+        ]
+        self.client = client_for(student)
+        # A new version: the budget covers building the answer key too
+        bump_quiz_version(self.quiz.pk)
+
+    @query_budget(QUERY_BUDGETS['QuizViewSet.submit'])
+    def test_submit(self):
+        response = self.client.post(
+            f'/api/quizzes/{self.quiz.pk}/submit/',
+            {'attempt_id': self.attempt.pk, 'answers': self.answers},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
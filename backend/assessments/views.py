@@ -1,18 +1,36 @@
+from django.db.models import Prefetch
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.utils import timezone
+from config.throttling import UserRateThrottle, scoped
+from .attempts import (
+    allocate_attempt, attempt_summaries, AttemptAllocationConflict, AttemptLimitReached
+)
+from .grading import grade_attempt, AttemptAlreadyGraded
 from .models import Quiz, QuizAttempt, StudentAnswer
 from .serializers import (
     QuizSerializer,
     QuizDetailSerializer,
     QuizAttemptSerializer,
     QuizAttemptDetailSerializer,
+    QuizAttemptSummarySerializer,
     SubmitQuizSerializer
 )
 
 
+def attempt_results_queryset():
+    """Attempts with everything the results serializer reads, in two queries."""
+    return QuizAttempt.objects.select_related('quiz').prefetch_related(
+        Prefetch(
+            'student_answers',
+            queryset=StudentAnswer.objects.select_related(
+                'question', 'selected_answer'
+            ).order_by('question__order', 'question_id')
+        )
+    )
+
+
 class QuizViewSet(viewsets.ReadOnlyModelViewSet):
     """
     API endpoints for quizzes.
@@ -21,43 +39,59 @@ class QuizViewSet(viewsets.ReadOnlyModelViewSet):
     retrieve: Get quiz details with questions
     """
     
-    queryset = Quiz.objects.all()
+    # The lesson comes along for the course id of cache invalidation
+    queryset = Quiz.objects.select_related('lesson')
     permission_classes = [IsAuthenticated]
     
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'item_analysis':
+            # For the instructor check
+            queryset = queryset.select_related('lesson__course')
+        return queryset
+    
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return QuizDetailSerializer
         return QuizSerializer
     
+    @action(detail=True, methods=['get'])
+    def item_analysis(self, request, pk=None):
+        """Question difficulty and discrimination statistics (instructors only)."""
+        quiz = self.get_object()
+        
+        if quiz.lesson.course.instructor_id != request.user.id:
+            return Response(
+                {'error': 'Only the course instructor can view item analysis'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        # NumPy is only imported when an instructor asks for the report
+        from .analysis import get_item_analysis
+        return Response(get_item_analysis(quiz.pk))
+    
     @action(detail=True, methods=['post'])
     def start_attempt(self, request, pk=None):
         """Start a new quiz attempt."""
         quiz = self.get_object()
-        student = request.user
-        
-        # Check if student can take quiz
-        previous_attempts = QuizAttempt.objects.filter(
-            student=student,
-            quiz=quiz
-        ).count()
         
-        if previous_attempts >= quiz.max_attempts:
+        try:
+            attempt = allocate_attempt(request.user, quiz)
+        except AttemptLimitReached:
             return Response(
                 {'error': f'Maximum attempts ({quiz.max_attempts}) reached'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
-        # Create new attempt
-        attempt = QuizAttempt.objects.create(
-            student=student,
-            quiz=quiz,
-            attempt_number=previous_attempts + 1
-        )
+        except AttemptAllocationConflict:
+            return Response(
+                {'error': 'Another attempt was started at the same time, please try again'},
+                status=status.HTTP_409_CONFLICT
+            )
         
         serializer = QuizAttemptSerializer(attempt)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'], throttle_classes=[scoped(UserRateThrottle, 'quiz_submit')])
     def submit(self, request, pk=None):
         """Submit quiz answers."""
         quiz = self.get_object()
@@ -66,51 +100,32 @@ class QuizViewSet(viewsets.ReadOnlyModelViewSet):
         serializer = SubmitQuizSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        # Get the latest attempt
-        try:
-            attempt = QuizAttempt.objects.filter(
-                student=student,
-                quiz=quiz,
-                completed_at__isnull=True
-            ).latest('started_at')
-        except QuizAttempt.DoesNotExist:
+        # Get the attempt being submitted, or the latest open one. Without
+        # an open attempt this is a repeat of a submission that already
+        # graded the latest one.
+        attempts = QuizAttempt.objects.filter(student=student, quiz=quiz).select_related('quiz__lesson')
+        attempt_id = serializer.validated_data.get('attempt_id')
+        if attempt_id:
+            attempt = attempts.filter(pk=attempt_id).first()
+        else:
+            attempt = (
+                attempts.filter(completed_at__isnull=True).order_by('-started_at').first()
+                or attempts.filter(completed_at__isnull=False).order_by('-completed_at').first()
+            )
+        if attempt is None:
             return Response(
                 {'error': 'No active attempt found'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Process answers
-        answers_data = serializer.validated_data['answers']
-        
-        for answer_data in answers_data:
-            question_id = answer_data.get('question_id')
-            answer_id = answer_data.get('answer_id')
-            
-            if not question_id or not answer_id:
-                continue
-            
-            try:
-                from .models import Question, Answer
-                question = Question.objects.get(id=question_id, quiz=quiz)
-                answer = Answer.objects.get(id=answer_id, question=question)
-                
-                # Create student answer
-                student_answer = StudentAnswer.objects.create(
-                    attempt=attempt,
-                    question=question,
-                    selected_answer=answer,
-                    is_correct=answer.is_correct,
-                    points_earned=question.points if answer.is_correct else 0
-                )
-            except (Question.DoesNotExist, Answer.DoesNotExist):
-                continue
-        
-        # Complete attempt
-        attempt.completed_at = timezone.now()
-        attempt.time_taken_seconds = serializer.validated_data.get('time_taken_seconds')
-        attempt.calculate_score()
+        # A repeated submission gets the result of the one that graded it
+        try:
+            grade_attempt(attempt, serializer.validated_data['answers'])
+        except AttemptAlreadyGraded:
+            pass
         
         # Return detailed results
+        attempt = attempt_results_queryset().get(pk=attempt.pk)
         result_serializer = QuizAttemptDetailSerializer(attempt)
         return Response(result_serializer.data)
 
@@ -128,9 +143,31 @@ class QuizAttemptViewSet(viewsets.ReadOnlyModelViewSet):
     
     def get_queryset(self):
         """Only show current user's attempts."""
-        return QuizAttempt.objects.filter(student=self.request.user)
+        if self.action == 'retrieve':
+            queryset = attempt_results_queryset()
+        else:
+            queryset = QuizAttempt.objects.select_related('quiz', 'student')
+        return queryset.filter(student=self.request.user)
     
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return QuizAttemptDetailSerializer
-        return QuizAttemptSerializer
\ No newline at end of file
+        return QuizAttemptSerializer
+    
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        """
+        Best score, latest score and attempts left for each quiz the user
+        has attempted. Filter with ?course_id= for a single course.
+        """
+        course_id = request.query_params.get('course_id')
+        if course_id is not None:
+            try:
+                course_id = int(course_id)
+            except ValueError:
+                return Response(
+                    {'error': 'course_id must be an integer'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        summaries = attempt_summaries(request.user, course_id=course_id)
+        return Response(QuizAttemptSummarySerializer(summaries, many=True).data)
\ No newline at end of file
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class ConfigConfig(AppConfig):
+    """Project-wide plumbing: database setup and operational commands."""
+
+    name = "config"
+
+    def ready(self):
+        from . import db  # noqa: F401
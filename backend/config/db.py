@@ -0,0 +1,67 @@
+"""
+Database connection setup.
+
+SQLite connections are tuned as soon as they are opened: write-ahead logging
+lets readers carry on while one process writes, busy_timeout makes writers
+queue for the lock instead of failing, and the cache settings keep hot pages
+in memory. Write transactions start with BEGIN IMMEDIATE (see SQLITE_OPTIONS
+in settings), so they take the write lock up front; a deferred transaction
+that reads first and then writes can fail with "database is locked" without
+ever waiting, when another connection got the write lock in between.
+
+PostgreSQL connections are pooled (see production_settings); pool_stats()
+reports how the pools are doing.
+"""
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'busy_timeout': 10000,  # ms
+    'synchronous': 'NORMAL',  # durable in WAL mode except on power loss
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64000,  # negative: KiB, so 64 MB
+    'temp_store': 'MEMORY',
+}
+
+
+def apply_sqlite_pragmas(cursor, pragmas=SQLITE_PRAGMAS):
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        apply_sqlite_pragmas(cursor)
+
+
+def pool_stats():
+    """Counters of every connection pool in this process, by database alias."""
+    stats = {}
+    for alias in connections:
+        # Not the .pool property, which would create a pool nobody asked for:
+        # only report pools a first query already opened
+        pool = getattr(connections[alias], '_connection_pools', {}).get(alias)
+        if pool is None or pool.closed:
+            continue
+        raw = pool.get_stats()
+        requests = raw.get('requests_num', 0)
+        stats[alias] = {
+            'min_size': raw.get('pool_min', 0),
+            'max_size': raw.get('pool_max', 0),
+            'size': raw.get('pool_size', 0),
+            'checked_out': raw.get('pool_size', 0) - raw.get('pool_available', 0),
+            'waiting': raw.get('requests_waiting', 0),
+            'requests': requests,
+            'wait_ms_total': raw.get('requests_wait_ms', 0),
+            'wait_ms_avg': raw.get('requests_wait_ms', 0) / requests if requests else 0,
+            'timeouts': raw.get('requests_errors', 0),
+            'connections_opened': raw.get('connections_num', 0),
+            'connect_ms_total': raw.get('connections_ms', 0),
+        }
+    return stats
@@ -0,0 +1,252 @@
+"""
+Benchmark the main API endpoints against the current database.
+
+Meant for a database filled by `manage.py seed_lms`: the targets are the
+published course with the most enrollments, one of its students, its
+instructor, its busiest discussion and one of its quizzes. Every endpoint
+is requested `--requests` times in-process, through the full middleware
+stack, after `--warmup` untimed requests. Each endpoint gets p50/p95/p99
+latency, its SQL query count and its payload size.
+
+`--output results.json` saves the numbers; `--compare baseline.json`
+prints the change against an earlier run, e.g. one from before a change.
+"""
+
+import json
+import logging
+import math
+import statistics
+import time
+from contextlib import ExitStack
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Count
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+# (name, who is asking, path); paths are formatted with the target ids
+ENDPOINTS = [
+    ('catalog', None, '/api/courses/'),
+    ('detail', 'student', '/api/courses/{course}/'),
+    ('lessons', 'student', '/api/lessons/?course_id={course}'),
+    ('enrollments', 'student', '/api/enrollments/'),
+    ('progress', 'student', '/api/progress/'),
+    ('reviews', 'student', '/api/reviews/?course_id={course}'),
+    ('discussions', 'student', '/api/discussions/?course_id={course}'),
+    ('comments', 'student', '/api/comments/?discussion_id={discussion}'),
+    ('quiz', 'student', '/api/quizzes/{quiz}/'),
+    ('analytics', 'instructor', '/api/courses/{course}/analytics/'),
+]
+
+COMPARED = ('p50_ms', 'p95_ms', 'queries', 'bytes')
+
+
+def find_targets():
+    """Users and ids to benchmark with, picked from the seeded data."""
+    from assessments.models import Quiz
+    from courses.models import Course, Discussion
+    from enrollments.models import Enrollment
+
+    course = (
+        Course.objects.filter(status='published')
+        .annotate(students=Count('enrollments'))
+        .order_by('-students', 'pk')
+        .select_related('instructor')
+        .first()
+    )
+    if course is None or not course.students:
+        raise CommandError('No published course with enrollments; run `manage.py seed_lms` first')
+
+    enrollment = (
+        Enrollment.objects.filter(course=course)
+        .select_related('student')
+        .order_by('-progress_percentage', 'pk')
+        .first()
+    )
+    discussion = (
+        Discussion.objects.filter(course=course)
+        .annotate(replies=Count('comments'))
+        .order_by('-replies', 'pk')
+        .first()
+    )
+    quiz = Quiz.objects.filter(lesson__course=course).order_by('pk').first()
+    return {
+        'users': {'student': enrollment.student, 'instructor': course.instructor},
+        'ids': {
+            'course': course.pk,
+            'discussion': discussion.pk if discussion else 0,
+            'quiz': quiz.pk if quiz else 0,
+        },
+    }
+
+
+def table_sizes():
+    from assessments.models import QuizAttempt
+    from courses.models import Comment, Course, Lesson
+    from enrollments.models import Enrollment, LessonProgress
+    from users.models import User
+
+    return {
+        model._meta.label: model.objects.count()
+        for model in (User, Course, Lesson, Enrollment, LessonProgress, QuizAttempt, Comment)
+    }
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of sorted `values`."""
+    return values[max(math.ceil(len(values) * p / 100) - 1, 0)]
+
+
+def _count_queries(counter):
+    def count(execute, sql, params, many, context):
+        counter[0] += 1
+        return execute(sql, params, many, context)
+    return count
+
+
+def measure(client, path, requests, warmup):
+    """Request `path` repeatedly; return its figures."""
+    for _ in range(warmup):
+        client.get(path).getvalue()
+
+    durations = []
+    statuses = set()
+    queries = [0]
+    size = 0
+    for _ in range(requests):
+        queries[0] = 0
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(_count_queries(queries)))
+            started = time.perf_counter()
+            response = client.get(path)
+            # Consuming the body is part of the request for streamed responses
+            body = response.getvalue()
+            durations.append(time.perf_counter() - started)
+        statuses.add(response.status_code)
+        size = len(body)
+
+    durations.sort()
+    return {
+        'path': path,
+        'status': sorted(statuses),
+        'requests': requests,
+        'p50_ms': round(percentile(durations, 50) * 1000, 2),
+        'p95_ms': round(percentile(durations, 95) * 1000, 2),
+        'p99_ms': round(percentile(durations, 99) * 1000, 2),
+        'mean_ms': round(statistics.fmean(durations) * 1000, 2),
+        'queries': queries[0],
+        'bytes': size,
+    }
+
+
+def _client(user):
+    from rest_framework.test import APIClient
+    from rest_framework_simplejwt.tokens import RefreshToken
+    from users.authentication import add_user_claims
+
+    client = APIClient()
+    if user is not None:
+        access = add_user_claims(RefreshToken.for_user(user), user).access_token
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+    return client
+
+
+class Command(BaseCommand):
+    help = 'Benchmark API latency, query counts and payload sizes on the current database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help='Timed requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=5, help='Untimed requests per endpoint')
+        parser.add_argument(
+            '--endpoints',
+            nargs='+',
+            choices=[name for name, who, path in ENDPOINTS],
+            help='Only these endpoints'
+        )
+        parser.add_argument('--output', help='Write the results to this JSON file')
+        parser.add_argument('--compare', help='JSON file of an earlier run to compare with')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests must be at least 1')
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Cannot read {options["compare"]}: {e}')
+
+        targets = find_targets()
+        clients = {who: _client(user) for who, user in targets['users'].items()}
+        clients[None] = _client(None)
+
+        # Per-request log lines would drown the report
+        timing_logger = logging.getLogger('config.timing')
+        log_level = timing_logger.level
+        timing_logger.setLevel(logging.ERROR)
+        setup_test_environment()
+        results = {}
+        try:
+            for name, who, path in ENDPOINTS:
+                if options['endpoints'] and name not in options['endpoints']:
+                    continue
+                results[name] = measure(
+                    clients[who], path.format(**targets['ids']),
+                    options['requests'], options['warmup']
+                )
+        finally:
+            teardown_test_environment()
+            timing_logger.setLevel(log_level)
+
+        report = {
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'database': connection.vendor,
+            'tables': table_sizes(),
+            'endpoints': results,
+        }
+        self.print_report(results, baseline)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f'Wrote {options["output"]}')
+
+        failed = [name for name, result in results.items() if max(result['status']) >= 400]
+        if failed:
+            raise CommandError(f'Endpoints answered with an error: {", ".join(failed)}')
+
+    def print_report(self, results, baseline):
+        self.stdout.write(
+            f"{'endpoint':<12} {'status':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+            f"{'queries':>7} {'bytes':>9}"
+        )
+        for name, result in results.items():
+            style = self.style.ERROR if max(result['status']) >= 400 else (lambda text: text)
+            self.stdout.write(style(
+                f"{name:<12} {max(result['status']):>6} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} "
+                f"{result['p99_ms']:>8.2f} {result['queries']:>7} {result['bytes']:>9}"
+            ))
+
+        if baseline is None:
+            return
+        self.stdout.write('\nChange against the baseline:')
+        before = baseline.get('endpoints', {})
+        for name, result in results.items():
+            if name not in before:
+                continue
+            changes = []
+            for key in COMPARED:
+                old, new = before[name].get(key), result[key]
+                if not old:
+                    changes.append(f'{key} {old} -> {new}')
+                    continue
+                change = (new - old) / old * 100
+                text = f'{key} {old} -> {new} ({change:+.0f}%)'
+                if change > 10:
+                    text = self.style.WARNING(text)
+                elif change < -10:
+                    text = self.style.SUCCESS(text)
+                changes.append(text)
+            self.stdout.write(f'{name:<12} ' + ', '.join(changes))
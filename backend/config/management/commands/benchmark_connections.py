@@ -0,0 +1,106 @@
+"""
+Measure what connection setup costs per request at a given concurrency.
+
+Each thread plays a web worker thread serving `--requests` requests that
+each run one query, with three connection strategies:
+
+- direct: connect for every request and close afterwards (CONN_MAX_AGE = 0)
+- persistent: keep one connection per thread (CONN_MAX_AGE > 0)
+- pool: check a connection out of a shared pool per request (PostgreSQL
+  with OPTIONS['pool'], as in production_settings)
+"""
+
+import copy
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import load_backend
+
+MODES = ('direct', 'persistent', 'pool')
+
+
+def _wrapper(alias, mode):
+    """A private connection object for `alias`, configured for `mode`."""
+    settings_dict = copy.deepcopy(connections.settings[alias])
+    options = settings_dict.setdefault('OPTIONS', {})
+    if mode == 'pool':
+        settings_dict['CONN_MAX_AGE'] = 0
+    else:
+        options.pop('pool', None)
+    backend = load_backend(settings_dict['ENGINE'])
+    # A separate alias keeps the benchmark pool apart from the app's pool
+    return backend.DatabaseWrapper(settings_dict, f'{alias}-benchmark')
+
+
+def _serve(alias, mode, requests, timings):
+    connection = _wrapper(alias, mode)
+    durations = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+        if mode != 'persistent':
+            # Like request_finished with CONN_MAX_AGE = 0; returns pooled connections
+            connection.close()
+        durations.append(time.perf_counter() - started)
+    connection.close()
+    timings.extend(durations)
+    return connection
+
+
+def run(alias, mode, threads, requests):
+    """Return (requests per second, p50 ms, p95 ms)."""
+    timings = []
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        futures = [executor.submit(_serve, alias, mode, requests, timings) for _ in range(threads)]
+        wrappers = [future.result() for future in futures]
+    elapsed = time.perf_counter() - started
+
+    if mode == 'pool':
+        wrappers[0].close_pool()
+
+    timings.sort()
+    return (
+        len(timings) / elapsed,
+        statistics.median(timings) * 1000,
+        timings[int(len(timings) * 0.95)] * 1000,
+    )
+
+
+class Command(BaseCommand):
+    help = 'Benchmark per-request connection overhead: direct, persistent and pooled'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            '--threads',
+            type=int,
+            nargs='+',
+            default=[1, 8, 32],
+            help='Concurrency levels to try'
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='Requests per thread'
+        )
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        modes = list(MODES)
+        if connections[alias].vendor != 'postgresql':
+            modes.remove('pool')
+            self.stdout.write('Connection pools need PostgreSQL; skipping the pool mode')
+
+        self.stdout.write(f"{'mode':<11} {'threads':>7} {'req/s':>8} {'p50 ms':>7} {'p95 ms':>7}")
+        for threads in options['threads']:
+            for mode in modes:
+                rate, p50, p95 = run(alias, mode, threads, options['requests'])
+                self.stdout.write(f'{mode:<11} {threads:>7} {rate:>8.0f} {p50:>7.2f} {p95:>7.2f}')
@@ -0,0 +1,111 @@
+"""
+Measure concurrent write throughput on SQLite with and without the tuning
+in config/db.py.
+
+Each worker process runs short read-then-write transactions against a
+scratch database file, like complete_lesson and quiz submission do: read a
+progress row, update it and insert an activity row.
+"""
+
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from config.db import SQLITE_PRAGMAS, apply_sqlite_pragmas
+
+ROWS = 1000
+
+MODES = {
+    # Django's defaults: rollback journal, deferred transactions
+    'default': {'pragmas': {}, 'begin': 'BEGIN'},
+    'tuned': {'pragmas': SQLITE_PRAGMAS, 'begin': 'BEGIN IMMEDIATE'},
+}
+
+
+def _setup(path, mode):
+    db = sqlite3.connect(path)
+    apply_sqlite_pragmas(db.cursor(), MODES[mode]['pragmas'])
+    db.executescript('''
+        CREATE TABLE progress (id INTEGER PRIMARY KEY, completed INTEGER NOT NULL DEFAULT 0);
+        CREATE TABLE activity (id INTEGER PRIMARY KEY, progress_id INTEGER, at REAL);
+    ''')
+    db.executemany('INSERT INTO progress (id) VALUES (?)', [(i,) for i in range(ROWS)])
+    db.commit()
+    db.close()
+
+
+def _worker(path, mode, transactions, seed, results):
+    # Autocommit mode so BEGIN is issued explicitly, as Django does
+    db = sqlite3.connect(path, timeout=5, isolation_level=None)
+    apply_sqlite_pragmas(db.cursor(), MODES[mode]['pragmas'])
+    begin = MODES[mode]['begin']
+    committed = failed = 0
+    for i in range(transactions):
+        row = (seed * 7919 + i * 31) % ROWS
+        try:
+            db.execute(begin)
+            db.execute('SELECT completed FROM progress WHERE id = ?', (row,)).fetchone()
+            db.execute('UPDATE progress SET completed = completed + 1 WHERE id = ?', (row,))
+            db.execute('INSERT INTO activity (progress_id, at) VALUES (?, ?)', (row, time.time()))
+            db.execute('COMMIT')
+            committed += 1
+        except sqlite3.OperationalError:
+            if db.in_transaction:
+                db.execute('ROLLBACK')
+            failed += 1
+    db.close()
+    results.put((committed, failed))
+
+
+def run(mode, workers, transactions):
+    """Return (committed, failed, seconds) for one benchmark run."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bench.sqlite3')
+        _setup(path, mode)
+
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=_worker, args=(path, mode, transactions, n, results))
+            for n in range(workers)
+        ]
+        started = time.perf_counter()
+        for process in processes:
+            process.start()
+        totals = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - started
+
+    return sum(c for c, _ in totals), sum(f for _, f in totals), elapsed
+
+
+class Command(BaseCommand):
+    help = 'Benchmark concurrent SQLite write throughput, default vs tuned settings'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            nargs='+',
+            default=[4, 8, 16],
+            help='Numbers of worker processes to try'
+        )
+        parser.add_argument(
+            '--transactions',
+            type=int,
+            default=500,
+            help='Write transactions per worker'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'mode':<8} {'workers':>7} {'commits/s':>10} {'failed':>7}")
+        for workers in options['workers']:
+            for mode in MODES:
+                committed, failed, elapsed = run(mode, workers, options['transactions'])
+                self.stdout.write(
+                    f'{mode:<8} {workers:>7} {committed / elapsed:>10.0f} {failed:>7}'
+                )
@@ -0,0 +1,105 @@
+import secrets
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from config.seeding import LMSSeeder, SeedConfig
+
+
+def _range(value):
+    low, _, high = value.partition('-')
+    try:
+        low = int(low)
+        high = int(high or low)
+    except ValueError:
+        raise ValueError(f'expected N or LOW-HIGH, got {value!r}')
+    return (low, high)
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill the database with synthetic users, courses, enrollments, quiz '
+        'attempts and discussions at realistic volumes. The same --seed gives '
+        'the same data. Seeded users share a random password, printed at the end. '
+        'Refuses to run with DEBUG off unless --force is given.'
+    )
+
+    def add_arguments(self, parser):
+        defaults = SeedConfig()
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--students', type=int, default=defaults.students)
+        parser.add_argument('--instructors', type=int, default=defaults.instructors)
+        parser.add_argument('--courses', type=int, default=defaults.courses)
+        parser.add_argument(
+            '--lessons',
+            default='{}-{}'.format(*defaults.lessons_per_course),
+            help='Lessons per course, N or LOW-HIGH'
+        )
+        parser.add_argument(
+            '--enrollments',
+            default='{}-{}'.format(*defaults.enrollments_per_student),
+            help='Enrollments per student, N or LOW-HIGH'
+        )
+        parser.add_argument(
+            '--comments',
+            default='{}-{}'.format(*defaults.comments_per_discussion),
+            help='Comments per discussion, N or LOW-HIGH'
+        )
+        parser.add_argument(
+            '--anchor',
+            help='Date (YYYY-MM-DD) the generated history ends at; defaults to today'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Seed even with DEBUG off, e.g. a staging database'
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError(
+                'DEBUG is off, so this may be a production database; '
+                'pass --force to seed it anyway'
+            )
+        try:
+            config = SeedConfig(
+                students=options['students'],
+                instructors=options['instructors'],
+                courses=options['courses'],
+                lessons_per_course=_range(options['lessons']),
+                enrollments_per_student=_range(options['enrollments']),
+                comments_per_discussion=_range(options['comments']),
+            )
+            anchor = None
+            if options['anchor']:
+                anchor = datetime.strptime(options['anchor'], '%Y-%m-%d').replace(tzinfo=timezone.utc)
+        except ValueError as e:
+            raise CommandError(str(e))
+        if config.instructors < 1 or config.courses < 1:
+            raise CommandError('Need at least one instructor and one course')
+
+        password = secrets.token_urlsafe(12)
+        started = time.perf_counter()
+        seeder = LMSSeeder(
+            config,
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            anchor=anchor,
+            password=password,
+            progress=lambda message: self.stdout.write(
+                f'{time.perf_counter() - started:7.1f}s  {message}'
+            ),
+        )
+        counts = seeder.run()
+        elapsed = time.perf_counter() - started
+
+        for label, count in counts.items():
+            self.stdout.write(f'{label:<28} {count:>10}')
+        total = sum(counts.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} rows in {elapsed:.1f}s ({total / elapsed:.0f} rows/s). '
+            f'Every seeded user has the password "{password}".'
+        ))
@@ -0,0 +1,437 @@
+"""
+Application metrics in the Prometheus text format.
+
+The registry holds counters, gauges and fixed-bucket histograms in process
+memory; updating one is a dict operation under a lock. Gunicorn runs several
+worker processes, so with METRICS_DIR set each process also writes a
+snapshot of its metrics to `<METRICS_DIR>/metrics-<pid>.json` every
+METRICS_WRITE_INTERVAL seconds (and at exit), and /metrics adds up the
+snapshots of all processes. Counters and histograms of exited workers keep
+counting, so totals never go down; gauges only come from live processes.
+At each scrape the snapshots of exited workers are folded into
+`metrics-exited.json` and deleted, so the directory holds one file per live
+worker plus that one. Clear METRICS_DIR when the service starts.
+
+RequestTimingMiddleware records request latency, status, SQL queries and
+upload bytes per view action. The cache backends below count cache hits and
+misses. Connection pool gauges are refreshed before every snapshot and
+scrape.
+"""
+
+import atexit
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache.backends import locmem, redis
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WRITE_INTERVAL = 5  # seconds
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Counters and histograms of workers that have exited, added up
+EXITED_SNAPSHOT = 'metrics-exited.json'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Metric:
+    type = None
+
+    def __init__(self, registry, name, documentation, labels=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.values = {}
+
+    def _key(self, label_values):
+        if len(label_values) != len(self.label_names):
+            raise ValueError(f'{self.name} takes labels {self.label_names}')
+        return tuple(str(value) for value in label_values)
+
+    def merge(self, values, into):
+        """Add snapshot `values` (from to_json) to `into`."""
+        for key, value in values:
+            key = tuple(key)
+            into[key] = into.get(key, 0) + value
+
+    def to_json(self):
+        return [[list(key), value] for key, value in self.values.items()]
+
+    def samples(self, values):
+        for key, value in sorted(values.items()):
+            yield f'{self.name}{_labels(self.label_names, key)} {_number(value)}'
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, *label_values, amount=1):
+        key = self._key(label_values)
+        with self.registry.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def set(self, value, *label_values):
+        key = self._key(label_values)
+        with self.registry.lock:
+            self.values[key] = value
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, registry, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *label_values):
+        key = self._key(label_values)
+        with self.registry.lock:
+            # [count per bucket..., count above the last bucket, sum]
+            series = self.values.get(key)
+            if series is None:
+                series = self.values[key] = [0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    break
+            else:
+                index = len(self.buckets)
+            series[index] += 1
+            series[-1] += value
+
+    def to_json(self):
+        return [[list(key), list(series)] for key, series in self.values.items()]
+
+    def merge(self, values, into):
+        for key, series in values:
+            key = tuple(key)
+            total = into.setdefault(key, [0] * len(series))
+            for index, value in enumerate(series):
+                total[index] += value
+
+    def samples(self, values):
+        bounds = self.buckets + (float('inf'),)
+        for key, series in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, series):
+                cumulative += count
+                labels = _labels(self.label_names, key, f'le="{_number(bound)}"')
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = _labels(self.label_names, key)
+            yield f'{self.name}_sum{labels} {_number(series[-1])}'
+            yield f'{self.name}_count{labels} {cumulative}'
+
+
+class Registry:
+    """The metrics of this process, optionally shared through a directory."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self.collectors = []
+        self._pid = os.getpid()
+        self._writer_pid = None
+
+    def _add(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f'Duplicate metric {metric.name}')
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self._add(Counter(self, name, documentation, labels))
+
+    def gauge(self, name, documentation, labels=()):
+        return self._add(Gauge(self, name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(self, name, documentation, labels, buckets))
+
+    def collector(self, func):
+        """Register func() to refresh gauges before snapshots and scrapes."""
+        self.collectors.append(func)
+        return func
+
+    def collect(self):
+        for func in self.collectors:
+            try:
+                func()
+            except Exception:
+                logger.exception('Metrics collector %s failed', func.__name__)
+
+    # ---- sharing between processes ----
+
+    @property
+    def directory(self):
+        return getattr(settings, 'METRICS_DIR', '')
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'pid': os.getpid(),
+                'metrics': {name: metric.to_json() for name, metric in self.metrics.items()},
+            }
+
+    def write(self):
+        """Write this process's snapshot to METRICS_DIR, atomically."""
+        directory = self.directory
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        _write_json(directory, f'metrics-{os.getpid()}.json', self.snapshot())
+
+    def ensure_writer(self):
+        """Start the snapshot writer of this process, once per process."""
+        pid = os.getpid()
+        if self._writer_pid == pid:
+            return
+        with self.lock:
+            if self._writer_pid == pid:
+                return
+            if self._pid != pid:
+                # A forked worker starts from zero, not from its parent's counts
+                for metric in self.metrics.values():
+                    metric.values.clear()
+                self._pid = pid
+            self._writer_pid = pid
+        if not self.directory:
+            return
+        interval = getattr(settings, 'METRICS_WRITE_INTERVAL', DEFAULT_WRITE_INTERVAL)
+        threading.Thread(target=self._run, args=(interval,), daemon=True).start()
+
+    def _run(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.collect()
+                self.write()
+            except Exception:
+                logger.exception('Failed to write metrics')
+
+    def _snapshots(self):
+        """Snapshots of every process; this one's is current."""
+        own = self.snapshot()
+        directory = self.directory
+        if not directory or not os.path.isdir(directory):
+            return [(own, True)]
+
+        snapshots = [(own, True)]
+        # Scrapes run in every worker: one at a time folds and reads
+        with _locked(directory):
+            self.fold_exited(directory)
+            for filename, snapshot in _read_snapshots(directory):
+                if snapshot.get('pid') == own['pid']:
+                    continue
+                snapshots.append((snapshot, _alive(snapshot.get('pid'))))
+        return snapshots
+
+    def fold_exited(self, directory):
+        """
+        Add the counters and histograms of exited workers to EXITED_SNAPSHOT
+        and delete their snapshots. Call with the directory locked.
+        """
+        exited = {}
+        dead = []
+        for filename, snapshot in _read_snapshots(directory):
+            pid = snapshot.get('pid')
+            if filename != EXITED_SNAPSHOT and (pid == os.getpid() or _alive(pid)):
+                continue
+            for name, values in snapshot['metrics'].items():
+                metric = self.metrics.get(name)
+                if metric is not None and metric.type != 'gauge':
+                    metric.merge(values, exited.setdefault(name, {}))
+            if filename != EXITED_SNAPSHOT:
+                dead.append(filename)
+        if not dead:
+            return
+
+        _write_json(directory, EXITED_SNAPSHOT, {
+            'pid': None,
+            'metrics': {
+                name: [[list(key), value] for key, value in values.items()]
+                for name, values in exited.items()
+            },
+        })
+        for filename in dead:
+            os.remove(os.path.join(directory, filename))
+
+    # ---- exposition ----
+
+    def render(self):
+        """All metrics in the Prometheus text format."""
+        self.collect()
+        merged = {name: {} for name in self.metrics}
+        for snapshot, alive in self._snapshots():
+            for name, values in snapshot['metrics'].items():
+                metric = self.metrics.get(name)
+                if metric is None or (metric.type == 'gauge' and not alive):
+                    continue
+                metric.merge(values, merged[name])
+
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.type}')
+            lines.extend(metric.samples(merged[name]))
+        return '\n'.join(lines) + '\n'
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except (OSError, TypeError):
+        return False
+    return True
+
+
+@contextmanager
+def _locked(directory):
+    """Hold an exclusive lock on the metrics directory."""
+    with open(os.path.join(directory, '.metrics.lock'), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)  # released when the file closes
+        yield
+
+
+def _write_json(directory, filename, data):
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.metrics-')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(data, f)
+    os.replace(temp_path, os.path.join(directory, filename))
+
+
+def _read_snapshots(directory):
+    """(filename, snapshot) for every readable snapshot in the directory."""
+    for filename in os.listdir(directory):
+        if not (filename.startswith('metrics-') and filename.endswith('.json')):
+            continue
+        try:
+            with open(os.path.join(directory, filename)) as f:
+                yield filename, json.load(f)
+        except (OSError, ValueError):
+            continue
+
+
+registry = Registry()
+
+REQUESTS = registry.counter(
+    'lms_http_requests_total', 'HTTP requests by view action and status.',
+    ('view', 'method', 'status')
+)
+REQUEST_LATENCY = registry.histogram(
+    'lms_http_request_duration_seconds', 'Time to produce a response.',
+    ('view', 'method'), LATENCY_BUCKETS
+)
+REQUEST_QUERIES = registry.histogram(
+    'lms_http_request_db_queries', 'SQL queries per request.',
+    ('view',), QUERY_BUCKETS
+)
+UPLOAD_BYTES = registry.counter(
+    'lms_http_upload_bytes_total', 'Bytes received in multipart uploads.',
+    ('view',)
+)
+CACHE_REQUESTS = registry.counter(
+    'lms_cache_requests_total', 'Cache lookups by result (hit or miss).',
+    ('result',)
+)
+DB_POOL = registry.gauge(
+    'lms_db_pool', 'Connection pool state by database alias.',
+    ('database', 'stat')
+)
+
+
+def record_request(request, response, timing):
+    """Called by RequestTimingMiddleware once the response is ready."""
+    registry.ensure_writer()
+    view = timing.view or 'unmatched'
+    REQUESTS.inc(view, request.method, response.status_code)
+    REQUEST_LATENCY.observe(timing.total, view, request.method)
+    REQUEST_QUERIES.observe(timing.queries, view)
+    if request.content_type == 'multipart/form-data':
+        try:
+            UPLOAD_BYTES.inc(view, amount=int(request.META.get('CONTENT_LENGTH') or 0))
+        except ValueError:
+            pass
+
+
+@registry.collector
+def collect_pool_stats():
+    from .db import pool_stats
+
+    for alias, stats in pool_stats().items():
+        for stat in ('size', 'checked_out', 'waiting', 'requests', 'timeouts'):
+            DB_POOL.set(stats[stat], alias, stat)
+
+
+def _write_at_exit():
+    if registry.directory and registry._writer_pid == os.getpid():
+        try:
+            registry.write()
+        except Exception:
+            logger.exception('Failed to write metrics at exit')
+
+
+atexit.register(_write_at_exit)
+
+
+# ========== CACHE BACKENDS ==========
+
+_MISSING = object()
+
+
+class CacheMetricsMixin:
+    """Counts get() hits and misses."""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        if value is _MISSING:
+            CACHE_REQUESTS.inc('miss')
+            return default
+        CACHE_REQUESTS.inc('hit')
+        return value
+
+
+class LocMemCache(CacheMetricsMixin, locmem.LocMemCache):
+    # get_many() goes through get()
+    pass
+
+
+class RedisCache(CacheMetricsMixin, redis.RedisCache):
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = super().get_many(keys, version)
+        if len(found):
+            CACHE_REQUESTS.inc('hit', amount=len(found))
+        if len(keys) > len(found):
+            CACHE_REQUESTS.inc('miss', amount=len(keys) - len(found))
+        return found
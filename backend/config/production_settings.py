@@ -1,18 +1,73 @@
 from .settings import *
 import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
 
 # Production settings
 DEBUG = False
 ALLOWED_HOSTS = ['.onrender.com', '.vercel.app']
 
 # Database
+# PostgreSQL connections come from a psycopg pool per worker process. With
+# CONN_HEALTH_CHECKS the pool checks each connection before handing it out,
+# so workers recover by themselves after a failover. (Pooling requires
+# CONN_MAX_AGE = 0.)
+DB_POOL = {
+    'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+    'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+    'timeout': config('DB_POOL_TIMEOUT', default=10, cast=int),  # seconds to wait for a connection
+    'max_idle': 5 * 60,
+    'max_lifetime': 60 * 60,
+}
+
+
+def configure_database(database):
+    database['CONN_HEALTH_CHECKS'] = True
+    if database['ENGINE'] == 'django.db.backends.postgresql':
+        database['CONN_MAX_AGE'] = 0
+        database.setdefault('OPTIONS', {})['pool'] = dict(DB_POOL)
+    elif database['ENGINE'] == 'django.db.backends.sqlite3':
+        database['OPTIONS'] = SQLITE_OPTIONS
+    return database
+
+
 DATABASES = {
-    'default': dj_database_url.config(
+    'default': configure_database(dj_database_url.config(
         default='sqlite:///db.sqlite3',
         conn_max_age=600
-    )
+    ))
 }
 
+# Read replicas: comma-separated database URLs
+DATABASE_REPLICAS = []
+for number, url in enumerate(config('REPLICA_DATABASE_URLS', default='').split(','), 1):
+    if url.strip():
+        alias = f'replica_{number}'
+        DATABASES[alias] = configure_database(dj_database_url.parse(url.strip(), conn_max_age=600))
+        DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+        DATABASE_REPLICAS.append(alias)
+
+# Cache: throttling, token versions and cached payloads must be shared by
+# all workers, so production doesn't start on a per-process cache
+REDIS_URL = config('REDIS_URL', default='')
+if not REDIS_URL:
+    raise ImproperlyConfigured('REDIS_URL must be set: production needs a cache shared by all workers')
+CACHES = {
+    'default': {
+        'BACKEND': 'config.metrics.RedisCache',  # counts hits and misses
+        'LOCATION': REDIS_URL,
+    }
+}
+
+# Proxies in front of the app, each appending to X-Forwarded-For: client
+# IPs for throttling are read from there, not from addresses clients add
+REST_FRAMEWORK['NUM_PROXIES'] = config('NUM_PROXIES', default=1, cast=int)
+
+# Metrics: every request reaches the app through Render's proxy, so
+# REMOTE_ADDR says nothing about the caller; scrapers present the token
+METRICS_ALLOWED_NETWORKS = []
+if not METRICS_TOKEN:
+    raise ImproperlyConfigured('METRICS_TOKEN must be set: /metrics is only served with it in production')
+
 # Static files
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
@@ -0,0 +1,203 @@
+"""
+Sampling request profiler.
+
+ProfilerMiddleware profiles one request in PROFILER_SAMPLE_RATE (0 turns
+random sampling off), plus every request carrying a valid X-Profile header.
+Staff get that header's value from POST /api/profiling/token/; it is signed
+and expires after PROFILER_TOKEN_MAX_AGE seconds.
+
+A profiled request gets a StackSampler: a thread that looks at the request
+thread's stack every PROFILER_INTERVAL seconds and counts each distinct
+stack, in the "collapsed" format of flamegraph tools (`a;b;c`, outermost
+frame first, starting at the middleware). After the response, the counts
+are merged into the shared cache per view action, where staff can read them
+at /api/profiling/<view>/ as a flamegraph tree or collapsed text.
+
+Requests that aren't sampled pay for one random() call and one header
+lookup. Merges from concurrent profiled requests can overwrite each other;
+losing the odd sample set doesn't matter for a profile.
+"""
+
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+
+from .timing import view_label
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+TOKEN_SALT = 'config.profiling'
+
+DEFAULT_INTERVAL = 0.005  # seconds between samples
+DEFAULT_TOKEN_MAX_AGE = 60 * 60  # 1 hour
+
+# Distinct stacks kept per view; the rarest are dropped beyond this
+MAX_STACKS = 2000
+
+PROFILE_TIMEOUT = 60 * 60 * 24  # profiles expire a day after the last merge
+VIEWS_KEY = 'profile:views'
+
+
+def _profile_key(view):
+    return f'profile:view:{view}'
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{frame.f_globals.get('__name__', '?')}.{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class StackSampler:
+    """Samples the stack of one thread, below `root`, until stopped."""
+
+    def __init__(self, thread_id, root, interval):
+        self.thread_id = thread_id
+        self.root = root
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            while frame is not None and frame is not self.root:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            if self._stop.is_set():
+                # The request is done; this is the stack of stop() itself
+                break
+            if frame is self.root and labels:
+                self.stacks[';'.join(reversed(labels))] += 1
+
+
+# ========== TOKENS ==========
+
+def make_profile_token(user):
+    """Value of the X-Profile header that gets `user`'s requests profiled."""
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign(str(user.pk))
+
+
+def check_profile_token(token):
+    max_age = getattr(settings, 'PROFILER_TOKEN_MAX_AGE', DEFAULT_TOKEN_MAX_AGE)
+    try:
+        signing.TimestampSigner(salt=TOKEN_SALT).unsign(token, max_age=max_age)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+# ========== STORAGE ==========
+
+def merge_profile(view, stacks, duration):
+    """Add one profiled request to the view's profile in the cache."""
+    key = _profile_key(view)
+    profile = cache.get(key) or {'requests': 0, 'seconds': 0.0, 'stacks': {}}
+    profile['requests'] += 1
+    profile['seconds'] += duration
+    merged = Counter(profile['stacks'])
+    merged.update(stacks)
+    profile['stacks'] = dict(merged.most_common(MAX_STACKS))
+    cache.set(key, profile, PROFILE_TIMEOUT)
+
+    views = cache.get(VIEWS_KEY) or set()
+    if view not in views:
+        cache.set(VIEWS_KEY, views | {view}, PROFILE_TIMEOUT)
+
+
+def get_profile(view):
+    return cache.get(_profile_key(view))
+
+
+def profiled_views():
+    """{view: (requests, samples)} for every view with a profile."""
+    summary = {}
+    for view in sorted(cache.get(VIEWS_KEY) or ()):
+        profile = get_profile(view)
+        if profile:
+            summary[view] = (profile['requests'], sum(profile['stacks'].values()))
+    return summary
+
+
+def clear_profiles():
+    cache.delete_many([_profile_key(view) for view in cache.get(VIEWS_KEY) or ()] + [VIEWS_KEY])
+
+
+def flamegraph_tree(stacks, name='all'):
+    """Collapsed stacks as the nested {name, value, children} of d3-flame-graph."""
+    root = {'name': name, 'value': 0, 'children': {}}
+    for stack, count in stacks.items():
+        root['value'] += count
+        node = root
+        for label in stack.split(';'):
+            node = node['children'].setdefault(label, {'name': label, 'value': 0, 'children': {}})
+            node['value'] += count
+
+    def finish(node):
+        children = sorted(node['children'].values(), key=lambda child: -child['value'])
+        node['children'] = [finish(child) for child in children]
+        return node
+
+    return finish(root)
+
+
+def collapsed_text(stacks):
+    return ''.join(f'{stack} {count}\n' for stack, count in sorted(stacks.items()))
+
+
+# ========== MIDDLEWARE ==========
+
+class ProfilerMiddleware:
+    """Profiles sampled requests; see the module docstring."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def should_profile(self, request):
+        token = request.META.get(PROFILE_HEADER)
+        if token:
+            return check_profile_token(token)
+        rate = getattr(settings, 'PROFILER_SAMPLE_RATE', 0)
+        return bool(rate) and random.random() * rate < 1
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        request._profiled = True
+        sampler = StackSampler(
+            threading.get_ident(),
+            sys._getframe(),
+            getattr(settings, 'PROFILER_INTERVAL', DEFAULT_INTERVAL)
+        )
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            stacks = sampler.stop()
+        duration = time.perf_counter() - started
+
+        view = getattr(request, '_profile_view', None)
+        if view is not None:
+            merge_profile(view, stacks, duration)
+            response['X-Profiled'] = view
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if getattr(request, '_profiled', False):
+            request._profile_view = view_label(view_func, request.method)
@@ -0,0 +1,71 @@
+"""
+Query budgets for the hot API endpoints.
+
+QUERY_BUDGETS caps how many SQL queries a view action may run. The caps
+don't depend on the amount of data: an endpoint whose query count grows
+with the number of rows it returns has an N+1 problem.
+
+The budgets are enforced in two places:
+
+- the apps' QueryBudgetTests, which request the endpoints under
+  @query_budget / assert_max_queries, so `manage.py test` fails when a
+  change goes over,
+- RequestTimingMiddleware, which logs a warning for live requests over
+  budget.
+"""
+
+import functools
+from contextlib import contextmanager
+
+from .query_plans import capture_statements
+
+# Max queries per view action, counted with the data from
+# query_plans.seed_dataset() plus a little headroom
+QUERY_BUDGETS = {
+    'CourseViewSet.list': 3,
+    'CourseViewSet.retrieve': 5,
+    'CourseViewSet.analytics': 5,
+    'EnrollmentViewSet.list': 5,
+    'ReviewViewSet.list': 2,
+    # Streamed lists, counted until the last chunk
+    'LessonViewSet.list': 2,
+    'CommentViewSet.list': 2,
+    'QuizViewSet.submit': 12,
+}
+
+
+class QueryBudgetExceeded(AssertionError):
+    """More queries ran than the budget allows."""
+
+    def __init__(self, label, budget, statements):
+        self.label = label
+        self.budget = budget
+        self.statements = statements
+        lines = '\n'.join(f'{n}. {sql}' for n, (sql, params) in enumerate(statements, 1))
+        super().__init__(
+            f'{label or "Block"} ran {len(statements)} queries, budget is {budget}:\n{lines}'
+        )
+
+
+def budget_for(view):
+    return QUERY_BUDGETS.get(view)
+
+
+@contextmanager
+def assert_max_queries(budget, label=None):
+    """Fail with the list of queries if the block runs more than `budget`."""
+    with capture_statements() as statements:
+        yield statements
+    if len(statements) > budget:
+        raise QueryBudgetExceeded(label, budget, list(statements))
+
+
+def query_budget(budget):
+    """Decorator form of assert_max_queries, e.g. for test methods."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with assert_max_queries(budget, func.__qualname__):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
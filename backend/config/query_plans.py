@@ -0,0 +1,216 @@
+"""
+Query plan regression checks for the hot API endpoints.
+
+check_endpoints() requests endpoints against a seeded database, records
+each SQL statement they run and asks the database how it would execute it
+(EXPLAIN QUERY PLAN on SQLite, EXPLAIN on PostgreSQL). A statement that
+reads one of the WATCHED_TABLES with a full table scan is a regression:
+those tables grow with the number of students, so a scan that is harmless
+on a small dataset becomes the slow query in production.
+
+Each app's QueryPlanTests runs it for the app's hot endpoints, on the data
+from seed_dataset(), so `manage.py test` fails on a regression. On other
+databases the tests are skipped.
+"""
+
+import json
+import re
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import timedelta
+from unittest import SkipTest
+
+from django.db import connection
+from django.utils import timezone
+
+# Tables that grow with enrollment and activity; small lookup tables
+# (categories, courses, lessons, quizzes) may be scanned.
+WATCHED_TABLES = {
+    'enrollments_enrollment',
+    'enrollments_lessonprogress',
+    'assessments_quizattempt',
+    'assessments_studentanswer',
+    'courses_review',
+    'courses_discussion',
+    'courses_comment',
+    'users_user',
+}
+
+SQLITE_SCAN_RE = re.compile(r'^SCAN (\w+)(?: AS (\w+))?$')
+TABLE_ALIAS_RE = re.compile(r'"(\w+)" (?:AS )?"?(\w+)"?')
+
+
+@dataclass
+class PlannedQuery:
+    sql: str
+    plan: list
+    full_scans: list = field(default_factory=list)
+
+
+@dataclass
+class EndpointPlan:
+    name: str
+    path: str
+    status_code: int
+    queries: list = field(default_factory=list)
+
+    @property
+    def regressions(self):
+        return [query for query in self.queries if query.full_scans]
+
+    def describe_regressions(self):
+        """The full-scanning queries with their plans, for a test failure."""
+        lines = [f'{self.name} ({self.path}): {len(self.regressions)} query(ies) scan a large table']
+        for query in self.regressions:
+            lines.append(f'    {query.sql}')
+            lines.extend(f'      {line}' for line in query.plan)
+        return '\n'.join(lines)
+
+
+def seed_dataset(students=20):
+    """A small course with every kind of row the hot endpoints read."""
+    from assessments.models import Quiz, Question, Answer, QuizAttempt, StudentAnswer
+    from courses.models import Category, Course, Lesson, Review, Discussion, Comment
+    from enrollments.models import Enrollment, LessonProgress
+    from users.models import User
+
+    instructor = User.objects.create_user(
+        email='plan-instructor@example.com', password='unused', role='instructor'
+    )
+    category = Category.objects.create(name='Plans', slug='plans')
+    course = Course.objects.create(
+        title='Query plans', description='Seeded course', instructor=instructor,
+        category=category, status='published'
+    )
+    lessons = [Lesson.objects.create(course=course, title=f'Lesson {n}', order=n) for n in range(5)]
+    quiz = Quiz.objects.create(lesson=lessons[0], title='Quiz', max_attempts=3)
+    questions = []
+    for n in range(5):
+        question = Question.objects.create(quiz=quiz, question_text=f'Q{n}', points=1, order=n)
+        for m in range(4):
+            Answer.objects.create(question=question, answer_text=f'A{m}', is_correct=m == 0, order=m)
+        questions.append(question)
+
+    now = timezone.now()
+    student = None
+    for n in range(students):
+        student = User.objects.create_user(email=f'plan-student{n}@example.com', password='unused')
+        enrollment = Enrollment.objects.create(student=student, course=course)
+        for lesson in lessons:
+            LessonProgress.objects.create(enrollment=enrollment, lesson=lesson, completed=n % 2 == 0)
+        attempt = QuizAttempt.objects.create(
+            student=student, quiz=quiz, completed_at=now - timedelta(minutes=n), score=n * 5
+        )
+        for question in questions:
+            answer = question.answers.first()
+            StudentAnswer.objects.create(
+                attempt=attempt, question=question, selected_answer=answer,
+                is_correct=answer.is_correct, points_earned=question.points
+            )
+        Review.objects.create(course=course, student=student, rating=n % 5 + 1, review_text='ok')
+
+    discussion = Discussion.objects.create(course=course, user=student, title='Help', content='?')
+    Comment.objects.create(discussion=discussion, user=instructor, content='!')
+
+    return {
+        'users': {'instructor': instructor, 'student': student},
+        'ids': {
+            'course': course.pk,
+            'discussion': discussion.pk,
+            'quiz': quiz.pk,
+            'attempt': attempt.pk,
+        },
+    }
+
+
+@contextmanager
+def capture_statements():
+    """Collect (sql, params) for every statement run on the default database."""
+    statements = []
+
+    def record(execute, sql, params, many, context):
+        statements.append((sql, params))
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(record):
+        yield statements
+
+
+def _aliases(sql):
+    """Map table aliases used in the SQL back to table names."""
+    return {alias: table for table, alias in TABLE_ALIAS_RE.findall(sql)}
+
+
+def explain(sql, params):
+    """Return (plan lines, fully scanned tables) for one SELECT statement."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = [row[-1] for row in cursor.fetchall()]
+            aliases = _aliases(sql)
+            scans = []
+            for line in plan:
+                match = SQLITE_SCAN_RE.match(line.strip())
+                if match:
+                    name = match.group(1)
+                    scans.append(aliases.get(name, name))
+            return plan, scans
+
+        if connection.vendor == 'postgresql':
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            raw = cursor.fetchone()[0]
+            root = (json.loads(raw) if isinstance(raw, str) else raw)[0]['Plan']
+            plan, scans, nodes = [], [], [root]
+            while nodes:
+                node = nodes.pop()
+                plan.append(f"{node['Node Type']} {node.get('Relation Name', '')}".strip())
+                if node['Node Type'] == 'Seq Scan':
+                    scans.append(node['Relation Name'])
+                nodes.extend(node.get('Plans', []))
+            return plan, scans
+
+    raise SkipTest(
+        f'Query plans are only checked on SQLite and PostgreSQL, not {connection.vendor}'
+    )
+
+
+def check_endpoints(seed, endpoints, watched=WATCHED_TABLES):
+    """
+    Request each endpoint and explain every SELECT it ran.
+
+    endpoints are (name, who is asking, path) tuples; paths are formatted
+    with the seeded ids, and who is a key of seed['users'] or None.
+    """
+    from rest_framework.test import APIClient
+
+    results = []
+    for name, who, path in endpoints:
+        client = APIClient()
+        if who:
+            client.force_authenticate(seed['users'][who])
+        url = path.format(**seed['ids'])
+
+        with capture_statements() as statements:
+            response = client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+
+        result = EndpointPlan(name, url, response.status_code)
+        for sql, params in statements:
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            plan, scans = explain(sql, params)
+            result.queries.append(PlannedQuery(sql, plan, [t for t in scans if t in watched]))
+        results.append(result)
+    return results
+
+
+class QueryPlanAssertions:
+    """TestCase mixin for the apps' query plan tests."""
+
+    def assertNoFullScans(self, seed, endpoints, watched=WATCHED_TABLES):
+        for result in check_endpoints(seed, endpoints, watched):
+            with self.subTest(endpoint=result.name):
+                self.assertEqual(result.status_code, 200, result.path)
+                if result.regressions:
+                    self.fail(result.describe_regressions())
@@ -0,0 +1,85 @@
+"""
+Read replica routing.
+
+Viewsets opt in with ReplicaReadMixin, naming the actions that only read
+(list, retrieve, ...). Such an action picks one of settings.DATABASE_REPLICAS
+when it starts, and ReplicaRouter sends all of its reads there; everything
+else, and every write, goes to the primary.
+
+Replicas lag behind the primary, so a user who just wrote something would
+not see it on the next page load. Any unsafe request pins its user to the
+primary for REPLICA_PIN_SECONDS (tracked in the shared cache).
+"""
+
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+# The replica serving the current read-only action, if any
+_replica = ContextVar('replica', default=None)
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def _pin_key(user_id):
+    return f'db-pin:{user_id}'
+
+
+def pin_to_primary(user_id):
+    """Serve this user's reads from the primary for a while."""
+    if replicas():
+        cache.set(_pin_key(user_id), 1, getattr(settings, 'REPLICA_PIN_SECONDS', 5))
+
+
+def is_pinned(user):
+    return bool(user and user.is_authenticated and cache.get(_pin_key(user.pk)))
+
+
+class ReplicaRouter:
+    """Reads go to a replica inside read-only actions, writes to the primary."""
+
+    def db_for_read(self, model, **hints):
+        return _replica.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Explicit, so objects read from a replica are still saved to the primary
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        pool = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema through replication
+        if db in replicas():
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    """
+    Viewset mixin: run `replica_actions` against a replica, one per request,
+    unless the user is pinned to the primary.
+    """
+
+    replica_actions = ('list', 'retrieve')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        pool = replicas()
+        if pool and self.action in self.replica_actions and not is_pinned(request.user):
+            self._replica_token = _replica.set(random.choice(pool))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            _replica.reset(token)
+            self._replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -0,0 +1,456 @@
+"""
+Synthetic LMS data at production-like volumes.
+
+LMSSeeder generates users, categories, courses with lessons, quizzes with
+questions and answers, enrollments with per-lesson progress, reviews, quiz
+attempts with their answers, and discussions with threaded comments. Rows
+are built in memory and written with bulk_create in batches; nothing goes
+through save(), so no signals fire.
+
+Primary keys are assigned up front, continuing from the largest existing
+id, so related rows can be built before their parents are written. All of
+it runs in one transaction (foreign keys are checked at commit), and on
+PostgreSQL the id sequences are reset afterwards.
+
+The same seed, counts and anchor date give the same data. Timestamps lie
+in the `days` before the anchor, which defaults to midnight UTC today, so
+"last 30 days" reports have something to show. Every seeded user gets the
+same `password`; without one, nobody can log in as a seeded user.
+"""
+
+import random
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, time as datetime_time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, models, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+FIRST_NAMES = [
+    'Ama', 'Kofi', 'Esi', 'Kwame', 'Abena', 'Yaw', 'Akosua', 'Kojo', 'Efua', 'Kwesi',
+    'Maria', 'James', 'Wei', 'Aisha', 'Lucas', 'Sofia', 'Noah', 'Fatima', 'Liam', 'Mei',
+]
+LAST_NAMES = [
+    'Mensah', 'Owusu', 'Boateng', 'Asante', 'Osei', 'Appiah', 'Addo', 'Darko',
+    'Smith', 'Garcia', 'Chen', 'Khan', 'Silva', 'Novak', 'Kim', 'Okafor',
+]
+CATEGORIES = [
+    'Programming', 'Data Science', 'Design', 'Business', 'Marketing',
+    'Photography', 'Music', 'Languages', 'Mathematics', 'Health',
+]
+TOPICS = [
+    'Python', 'Django', 'React', 'SQL', 'Statistics', 'Machine Learning', 'Typography',
+    'Accounting', 'SEO', 'Lighting', 'Guitar', 'French', 'Calculus', 'Nutrition',
+]
+LEVELS = ['Introduction to', 'Practical', 'Advanced', 'Mastering', 'Foundations of']
+WORDS = (
+    'lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor '
+    'incididunt ut labore et dolore magna aliqua enim ad minim veniam quis nostrud'
+).split()
+
+RATING_WEIGHTS = {5: 40, 4: 30, 3: 15, 2: 8, 1: 7}
+
+
+@dataclass
+class SeedConfig:
+    """How much to generate; (low, high) pairs are inclusive ranges."""
+
+    students: int = 1000
+    instructors: int = 20
+    courses: int = 50
+    lessons_per_course: tuple = (8, 30)
+    enrollments_per_student: tuple = (1, 8)
+    quiz_every: int = 4  # every nth lesson ends with a quiz
+    questions_per_quiz: tuple = (4, 10)
+    review_rate: float = 0.3  # of enrollments past 20% progress
+    discussions_per_course: tuple = (2, 20)
+    comments_per_discussion: tuple = (0, 12)
+    published_rate: float = 0.9
+    days: int = 365
+
+
+def _model(label):
+    from django.apps import apps
+    return apps.get_model(label)
+
+
+@contextmanager
+def explicit_timestamps(*model_classes):
+    """Let bulk_create keep the created_at/updated_at values we set."""
+    changed = []
+    for model in model_classes:
+        for field in model._meta.concrete_fields:
+            if isinstance(field, models.DateTimeField) and (field.auto_now or field.auto_now_add):
+                changed.append((field, field.auto_now, field.auto_now_add))
+                field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in changed:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class LMSSeeder:
+    """Generates and writes one synthetic dataset; see the module docstring."""
+
+    MODELS = [
+        'users.User', 'courses.Category', 'courses.Course', 'courses.Lesson',
+        'assessments.Quiz', 'assessments.Question', 'assessments.Answer',
+        'enrollments.Enrollment', 'enrollments.LessonProgress', 'courses.Review',
+        'assessments.QuizAttempt', 'assessments.StudentAnswer',
+        'courses.Discussion', 'courses.Comment',
+    ]
+
+    def __init__(self, config=None, seed=0, batch_size=5000, anchor=None, progress=None, password=None):
+        self.config = config or SeedConfig()
+        self.seed = seed
+        self.password = password
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        if anchor is None:
+            anchor = datetime.combine(timezone.now().date(), datetime_time.min, dt_timezone.utc)
+        self.anchor = anchor
+        self.progress = progress or (lambda message: None)
+
+        self.models = {label: _model(label) for label in self.MODELS}
+        self.buffers = defaultdict(list)
+        self.counts = defaultdict(int)
+        self.next_ids = {}
+
+    # ---- plumbing ----
+
+    def _new_id(self, label):
+        if label not in self.next_ids:
+            model = self.models[label]
+            self.next_ids[label] = (model.objects.aggregate(top=Max('pk'))['top'] or 0) + 1
+        pk = self.next_ids[label]
+        self.next_ids[label] += 1
+        return pk
+
+    def add(self, label, pk=None, **values):
+        """Queue one row; returns its primary key."""
+        if pk is None:
+            pk = self._new_id(label)
+        buffer = self.buffers[label]
+        buffer.append(self.models[label](pk=pk, **values))
+        if len(buffer) >= self.batch_size:
+            self.flush(label)
+        return pk
+
+    def flush(self, label=None):
+        for name in [label] if label else list(self.buffers):
+            rows = self.buffers.pop(name, [])
+            if rows:
+                self.models[name].objects.bulk_create(rows, batch_size=self.batch_size)
+                self.counts[name] += len(rows)
+
+    def when(self, after=None, before=None):
+        """A random moment between `after` (default: `days` ago) and `before`."""
+        start = after or self.anchor - timedelta(days=self.config.days)
+        end = before or self.anchor
+        if end <= start:
+            return end
+        return start + timedelta(seconds=self.rng.uniform(0, (end - start).total_seconds()))
+
+    def text(self, words):
+        return ' '.join(self.rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+    def between(self, bounds):
+        return self.rng.randint(*bounds)
+
+    # ---- generation ----
+
+    def run(self):
+        """Generate everything; returns {model label: rows written}."""
+        with explicit_timestamps(*self.models.values()), transaction.atomic():
+            # One hash for everyone; hashing per user would take most of the run.
+            # No password gives an unusable one.
+            self.password_hash = make_password(self.password, salt=f'lmsseed{self.seed}')
+            instructors = self.make_users('instructor', self.config.instructors)
+            students = self.make_users('student', self.config.students)
+            self.progress(f'{len(instructors) + len(students)} users')
+
+            courses = self.make_courses(instructors)
+            self.progress(f'{len(courses)} published courses with lessons and quizzes')
+
+            enrolled = self.make_enrollments(students, courses)
+            self.flush()
+            self.progress(f'{self.counts["enrollments.Enrollment"]} enrollments with progress and attempts')
+
+            self.make_discussions(courses, enrolled)
+            self.flush()
+            self.progress('discussions')
+        self.reset_sequences()
+        return dict(self.counts)
+
+    def make_users(self, role, count):
+        users = []
+        for _ in range(count):
+            joined = self.when()
+            pk = self._new_id('users.User')
+            users.append(self.add(
+                'users.User',
+                pk=pk,
+                email=f'{role}{pk}@seed.example.com',
+                password=self.password_hash,
+                first_name=self.rng.choice(FIRST_NAMES),
+                last_name=self.rng.choice(LAST_NAMES),
+                role=role,
+                date_joined=joined,
+                created_at=joined,
+                updated_at=joined,
+            ))
+        return users
+
+    def make_courses(self, instructors):
+        config = self.config
+        categories = []
+        for name in CATEGORIES:
+            pk = self._new_id('courses.Category')
+            categories.append(self.add(
+                'courses.Category',
+                pk=pk,
+                name=f'{name} {pk}', slug=f'{name.lower().replace(" ", "-")}-{pk}',
+                description=self.text(12), created_at=self.anchor - timedelta(days=config.days),
+            ))
+
+        courses = []
+        for _ in range(config.courses):
+            created = self.when(before=self.anchor - timedelta(days=config.days // 2))
+            published = self.rng.random() < config.published_rate
+            instructor = self.rng.choice(instructors)
+            course_id = self.add(
+                'courses.Course',
+                title=f'{self.rng.choice(LEVELS)} {self.rng.choice(TOPICS)}',
+                description=self.text(40),
+                instructor_id=instructor,
+                category_id=self.rng.choice(categories),
+                difficulty=self.rng.choice(['beginner', 'intermediate', 'advanced']),
+                status='published' if published else 'draft',
+                created_at=created,
+                updated_at=created,
+            )
+
+            lessons, quizzes = [], []
+            for order in range(1, self.between(config.lessons_per_course) + 1):
+                video = self.rng.random() < 0.6
+                lesson_id = self.add(
+                    'courses.Lesson',
+                    course_id=course_id,
+                    title=f'Lesson {order}: {self.text(4)[:-1]}',
+                    description=self.text(20),
+                    lesson_type='video' if video else 'text',
+                    order=order,
+                    duration=self.rng.randint(3, 45),
+                    video_url=f'https://videos.example.com/{course_id}/{order}' if video else '',
+                    text_content='' if video else self.text(200),
+                    is_free_preview=order == 1,
+                    created_at=created,
+                    updated_at=created,
+                )
+                lessons.append(lesson_id)
+                if order % config.quiz_every == 0:
+                    quizzes.append((order, self.make_quiz(lesson_id, created)))
+
+            if published:
+                courses.append({
+                    'id': course_id, 'instructor': instructor, 'created': created,
+                    'lessons': lessons, 'quizzes': quizzes,
+                })
+        return courses
+
+    def make_quiz(self, lesson_id, created):
+        quiz = {'passing_score': self.rng.choice([60, 70, 80]), 'max_attempts': 3, 'questions': []}
+        quiz['id'] = self.add(
+            'assessments.Quiz',
+            lesson_id=lesson_id,
+            title=f'Check your understanding {lesson_id}',
+            description=self.text(10),
+            passing_score=quiz['passing_score'],
+            max_attempts=quiz['max_attempts'],
+            created_at=created,
+            updated_at=created,
+        )
+        for order in range(1, self.between(self.config.questions_per_quiz) + 1):
+            true_false = self.rng.random() < 0.25
+            points = self.rng.choice([1, 1, 2])
+            question_id = self.add(
+                'assessments.Question',
+                quiz_id=quiz['id'],
+                question_text=self.text(12)[:-1] + '?',
+                question_type='true_false' if true_false else 'multiple_choice',
+                points=points,
+                order=order,
+                created_at=created,
+            )
+            options = 2 if true_false else 4
+            correct = self.rng.randrange(options)
+            answers = [
+                (self.add(
+                    'assessments.Answer',
+                    question_id=question_id,
+                    answer_text=['True', 'False'][n] if true_false else self.text(5),
+                    is_correct=n == correct,
+                    order=n,
+                ), n == correct)
+                for n in range(options)
+            ]
+            quiz['questions'].append((question_id, points, answers))
+        return quiz
+
+    def make_enrollments(self, students, courses):
+        """Enrollments, lesson progress, reviews and quiz attempts; returns {course: students}."""
+        enrolled = defaultdict(list)
+        for student in students:
+            ability = self.rng.betavariate(5, 2)  # chance of answering a question right
+            count = min(self.between(self.config.enrollments_per_student), len(courses))
+            for course in self.rng.sample(courses, count):
+                enrolled[course['id']].append(student)
+                self.make_enrollment(student, course, ability)
+        return enrolled
+
+    def make_enrollment(self, student, course, ability):
+        enrolled_at = self.when(after=course['created'])
+        lessons = course['lessons']
+        # Most learners drop off early, some finish
+        done = min(len(lessons), int(len(lessons) * self.rng.betavariate(0.8, 1.2) * 1.15))
+        finished_at = self.when(after=enrolled_at) if done else None
+
+        moment = enrolled_at
+        completed_dates = []
+        for _ in range(done):
+            moment = self.when(after=moment, before=finished_at)
+            completed_dates.append(moment)
+
+        progress = Decimal(done * 100 / len(lessons)).quantize(Decimal('0.01')) if lessons else Decimal(0)
+        enrollment_id = self.add(
+            'enrollments.Enrollment',
+            student_id=student,
+            course_id=course['id'],
+            progress_percentage=progress,
+            completed=bool(lessons) and done == len(lessons),
+            enrolled_date=enrolled_at,
+            completed_date=finished_at if lessons and done == len(lessons) else None,
+        )
+        for index, lesson_id in enumerate(lessons):
+            self.add(
+                'enrollments.LessonProgress',
+                enrollment_id=enrollment_id,
+                lesson_id=lesson_id,
+                completed=index < done,
+                completed_date=completed_dates[index] if index < done else None,
+            )
+
+        if progress >= 20 and self.rng.random() < self.config.review_rate:
+            reviewed = self.when(after=enrolled_at)
+            self.add(
+                'courses.Review',
+                course_id=course['id'],
+                student_id=student,
+                rating=self.rng.choices(list(RATING_WEIGHTS), list(RATING_WEIGHTS.values()))[0],
+                review_text=self.text(self.rng.randint(0, 40)) if self.rng.random() < 0.7 else '',
+                helpful_count=self.rng.randint(0, 10),
+                created_at=reviewed,
+                updated_at=reviewed,
+            )
+
+        for order, quiz in course['quizzes']:
+            if order <= done:
+                reached = completed_dates[order - 1]
+                self.make_attempts(student, quiz, ability, reached)
+
+    def make_attempts(self, student, quiz, ability, reached):
+        started = reached
+        for number in range(1, self.rng.choice([1, 1, 1, 2, 2, 3]) + 1):
+            started = self.when(after=started, before=started + timedelta(days=7))
+            taken = self.rng.randint(60, 1200)
+            total = earned = 0
+            answers = []
+            for question_id, points, options in quiz['questions']:
+                total += points
+                if self.rng.random() < ability:
+                    answer_id = next(pk for pk, correct in options if correct)
+                    earned += points
+                    answers.append((question_id, answer_id, True, points))
+                else:
+                    answer_id = self.rng.choice([pk for pk, correct in options if not correct])
+                    answers.append((question_id, answer_id, False, 0))
+
+            score = Decimal(earned * 100 / total).quantize(Decimal('0.01')) if total else Decimal(0)
+            completed = started + timedelta(seconds=taken)
+            attempt_id = self.add(
+                'assessments.QuizAttempt',
+                student_id=student,
+                quiz_id=quiz['id'],
+                attempt_number=number,
+                score=score,
+                total_points=total,
+                earned_points=earned,
+                passed=score >= quiz['passing_score'],
+                started_at=started,
+                completed_at=completed,
+                time_taken_seconds=taken,
+            )
+            for question_id, answer_id, correct, points in answers:
+                self.add(
+                    'assessments.StudentAnswer',
+                    attempt_id=attempt_id,
+                    question_id=question_id,
+                    selected_answer_id=answer_id,
+                    is_correct=correct,
+                    points_earned=points,
+                    answered_at=completed,
+                )
+            if score >= quiz['passing_score']:
+                break
+
+    def make_discussions(self, courses, enrolled):
+        for course in courses:
+            students = enrolled.get(course['id'])
+            if not students:
+                continue
+            instructor = course['instructor']
+            for _ in range(self.between(self.config.discussions_per_course)):
+                opened = self.when(after=course['created'])
+                discussion_id = self.add(
+                    'courses.Discussion',
+                    course_id=course['id'],
+                    user_id=self.rng.choice(students),
+                    title=self.text(6)[:-1] + '?',
+                    content=self.text(50),
+                    upvotes=self.rng.randint(0, 25),
+                    is_pinned=self.rng.random() < 0.05,
+                    is_resolved=self.rng.random() < 0.4,
+                    created_at=opened,
+                    updated_at=opened,
+                )
+                comments = []
+                moment = opened
+                for _ in range(self.between(self.config.comments_per_discussion)):
+                    moment = self.when(after=moment, before=moment + timedelta(days=3))
+                    by_instructor = self.rng.random() < 0.15
+                    parent = self.rng.choice(comments) if comments and self.rng.random() < 0.4 else None
+                    comments.append(self.add(
+                        'courses.Comment',
+                        discussion_id=discussion_id,
+                        user_id=instructor if by_instructor else self.rng.choice(students),
+                        parent_comment_id=parent,
+                        content=self.text(25),
+                        upvotes=self.rng.randint(0, 10),
+                        is_instructor_reply=by_instructor,
+                        created_at=moment,
+                        updated_at=moment,
+                    ))
+
+    def reset_sequences(self):
+        """Move the id sequences past the ids we assigned (PostgreSQL)."""
+        statements = connection.ops.sequence_reset_sql(no_style(), list(self.models.values()))
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
@@ -62,9 +62,12 @@ INSTALLED_APPS = [
     'enrollments',
     'assessments',  # Add this line
     #'ai',
+    'config',  # Database setup and operational commands
 ]
 
 MIDDLEWARE = [
+    'config.timing.RequestTimingMiddleware',  # Server-Timing and request logs
+    'config.profiling.ProfilerMiddleware',  # samples stacks of profiled requests
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # Add CORS
@@ -99,13 +102,45 @@ WSGI_APPLICATION = "config.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Pragmas are applied per connection in config/db.py
+SQLITE_OPTIONS = {
+    # Write transactions take the write lock up front (BEGIN IMMEDIATE)
+    "transaction_mode": "IMMEDIATE",
+    "timeout": 10,  # seconds to wait for the write lock
+}
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "OPTIONS": SQLITE_OPTIONS,
+        # A file rather than shared-cache memory, so that the concurrency
+        # tests' threads wait for the write lock instead of failing
+        "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
     }
 }
 
+# Runs the tests with throttling and background activity flushes off, and
+# request logs down to warnings (config/testing.py)
+TEST_RUNNER = 'config.testing.TestRunner'
+
+# Read replicas (config/replicas.py): aliases in DATABASE_REPLICAS serve the
+# read-only actions of viewsets using ReplicaReadMixin
+DATABASE_ROUTERS = ['config.replicas.ReplicaRouter']
+DATABASE_REPLICAS = []
+REPLICA_PIN_SECONDS = 5  # reads stay on the primary this long after a write
+
+# Local stand-in: point SQLITE_REPLICA at a copy of db.sqlite3
+SQLITE_REPLICA = config('SQLITE_REPLICA', default='')
+if SQLITE_REPLICA:
+    DATABASES["replica"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / SQLITE_REPLICA,
+        "OPTIONS": SQLITE_OPTIONS,
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS = ["replica"]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -159,11 +194,74 @@ AUTH_USER_MODEL = 'users.User'
 # REST Framework Settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.ClaimsJWTAuthentication',
+    ),
+    # JSONRenderer that reports its time to config.timing
+    'DEFAULT_RENDERER_CLASSES': (
+        'config.timing.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ),
+    # Scopes used by config.throttling (counted in the shared cache)
+    'DEFAULT_THROTTLE_RATES': {
+        'login': '20/min',           # per IP, login and Google sign-in
+        'login_account': '10/min',   # per target email and IP
+        'register': '10/hour',       # per IP
+        'upvote': '60/min',          # per user
+        'quiz_submit': '10/min',     # per user
+    },
+}
+
+# Seconds between bulk writes of buffered last_login/last_seen (0 disables
+# the background and exit flushes; users.activity.flush_activity() still works)
+ACTIVITY_FLUSH_INTERVAL = 30
+
+# Per-request timing (config/timing.py): send durations in a Server-Timing
+# header; one JSON line per request is logged on the config.timing logger
+SERVER_TIMING_HEADER = True
+
+# Metrics (config/metrics.py), served at /metrics to internal callers.
+# METRICS_DIR: directory shared by the worker processes of one instance;
+# empty keeps metrics per process.
+METRICS_DIR = config('METRICS_DIR', default='')
+METRICS_WRITE_INTERVAL = 5  # seconds between snapshots written to METRICS_DIR
+# Callers allowed without METRICS_TOKEN, by REMOTE_ADDR. No private ranges:
+# behind a proxy every request comes from the proxy's private address.
+METRICS_ALLOWED_NETWORKS = ['127.0.0.0/8', '::1/128']
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# Sampling profiler (config/profiling.py): profile 1 request in
+# PROFILER_SAMPLE_RATE (0: only staff requests with an X-Profile token)
+PROFILER_SAMPLE_RATE = config('PROFILER_SAMPLE_RATE', default=0, cast=int)
+PROFILER_INTERVAL = 0.005  # seconds between stack samples
+PROFILER_TOKEN_MAX_AGE = 60 * 60  # seconds an X-Profile token stays valid
+
+# Cache backends counting hits and misses for config.metrics
+CACHES = {
+    'default': {
+        'BACKEND': 'config.metrics.LocMemCache',
+    }
+}
+
+# Level of the per-request log lines (config.timing); unless it is set,
+# `manage.py test` only logs warnings
+REQUEST_LOG_LEVEL = config('REQUEST_LOG_LEVEL', default='')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'config.timing': {
+            'handlers': ['console'],
+            'level': REQUEST_LOG_LEVEL or 'INFO',
+            'propagate': False,
+        },
+    },
 }
 
 # JWT Settings
@@ -172,8 +270,11 @@ SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=1),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
-    'BLACKLIST_AFTER_ROTATION': True,
-    'UPDATE_LAST_LOGIN': True,
+    # Used refresh tokens are revoked by users.revocation, not the blacklist app
+    'BLACKLIST_AFTER_ROTATION': False,
+    'TOKEN_REFRESH_SERIALIZER': 'users.serializers.TokenRefreshSerializer',
+    # last_login is written in batches by users.activity instead
+    'UPDATE_LAST_LOGIN': False,
     'ALGORITHM': 'HS256',
     'AUTH_HEADER_TYPES': ('Bearer',),
     'USER_ID_FIELD': 'id',
@@ -203,6 +304,7 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'x-profile',  # staff profiling token, see config/profiling.py
 ]
 
 # Media Files (uploads)
@@ -219,6 +321,8 @@ MAX_VIDEO_SIZE = 500 * 1024 * 1024  # 500MB max video size
 
 # ========== GOOGLE OAUTH CONFIGURATION ==========
 GOOGLE_CLIENT_ID = config('GOOGLE_CLIENT_ID')
+# Signing certificates for Google ID tokens (cached, see users/google_auth.py)
+GOOGLE_CERTS_URL = config('GOOGLE_CERTS_URL', default='https://www.googleapis.com/oauth2/v1/certs')
 
 # ========== EMAIL CONFIGURATION (Optional - for password reset) ==========
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'  # Development only
@@ -0,0 +1,77 @@
+"""
+Streaming JSON for large list responses.
+
+StreamingListMixin takes over a viewset's list() for JSON requests. The
+queryset is read with .iterator(chunk_size=...), each object is serialized
+and encoded on its own, and the JSON array goes out through a
+StreamingHttpResponse in pieces of about STREAM_BUFFER_SIZE bytes. A worker
+holds one chunk of rows and one buffer at a time, instead of every model
+instance, the list of dicts and the whole JSON string at once.
+
+The body is the same JSON array list() returns. Paginated viewsets and
+other formats (the browsable API) keep using the regular list().
+prefetch_related() still works: iterator() prefetches per chunk.
+
+The queryset runs after the view has returned, while the content is
+consumed: config.timing counts those queries against the view's query
+budget once the stream ends. The database is chosen up front, while
+ReplicaReadMixin's routing still applies. courses.tests.StreamingListTests
+checks that peak memory stays flat as the row count grows.
+"""
+
+from django.http import StreamingHttpResponse
+from rest_framework.compat import LONG_SEPARATORS, SHORT_SEPARATORS
+from rest_framework.renderers import JSONRenderer
+
+STREAM_CHUNK_SIZE = 500  # rows fetched per database round trip
+
+# Encoded JSON is sent in pieces of roughly this many bytes
+STREAM_BUFFER_SIZE = 64 * 1024
+
+
+def stream_json_array(objects, serializer, renderer, buffer_size=STREAM_BUFFER_SIZE):
+    """Yield `objects` serialized one by one, as the bytes of a JSON array."""
+    encoder = renderer.encoder_class(
+        ensure_ascii=renderer.ensure_ascii,
+        allow_nan=not renderer.strict,
+        separators=SHORT_SEPARATORS if renderer.compact else LONG_SEPARATORS,
+    )
+    separator = SHORT_SEPARATORS[0] if renderer.compact else LONG_SEPARATORS[0]
+
+    buffer = ['[']
+    buffered = 0
+    for n, obj in enumerate(objects):
+        text = encoder.encode(serializer.to_representation(obj))
+        # Like JSONRenderer: U+2028/2029 are valid JSON but break JavaScript
+        text = text.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029')
+        if n:
+            buffer.append(separator)
+        buffer.append(text)
+        buffered += len(text)
+        if buffered >= buffer_size:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+            buffered = 0
+    buffer.append(']')
+    yield ''.join(buffer).encode('utf-8')
+
+
+class StreamingListMixin:
+    """Viewset mixin: stream unpaginated JSON lists; see the module docstring."""
+
+    stream_chunk_size = STREAM_CHUNK_SIZE
+
+    def list(self, request, *args, **kwargs):
+        renderer = request.accepted_renderer
+        if self.paginator is not None or not isinstance(renderer, JSONRenderer):
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        # Pick the database now; replica routing is reset when the view returns
+        queryset = queryset.using(queryset.db)
+        chunks = stream_json_array(
+            queryset.iterator(chunk_size=self.stream_chunk_size),
+            self.get_serializer(),
+            renderer
+        )
+        return StreamingHttpResponse(chunks, content_type=renderer.media_type)
@@ -0,0 +1,39 @@
+"""
+Test runner for `manage.py test`.
+
+The cache outlives each test's transaction, so throttle counters left by one
+test would use up the allowance of the next and make results depend on test
+order. The runner turns every throttle rate off for the whole run; throttle
+tests set the rates they exercise with override_settings and clear the
+cache first.
+
+It also turns off the background flush of users.activity, whose thread
+would write to the test database at random points; tests flush directly.
+Request log lines are only written for warnings (slow or over-budget
+requests) unless REQUEST_LOG_LEVEL is set.
+"""
+
+import logging
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._test_settings = override_settings(
+            REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}},
+            ACTIVITY_FLUSH_INTERVAL=0,
+        )
+        self._test_settings.enable()
+
+        request_logger = logging.getLogger('config.timing')
+        self._request_log_level = request_logger.level
+        request_logger.setLevel(settings.REQUEST_LOG_LEVEL or logging.WARNING)
+
+    def teardown_test_environment(self, **kwargs):
+        logging.getLogger('config.timing').setLevel(self._request_log_level)
+        self._test_settings.disable()
+        super().teardown_test_environment(**kwargs)
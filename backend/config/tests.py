@@ -0,0 +1,200 @@
+import io
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from users.models import User
+
+from .metrics import EXITED_SNAPSHOT, Registry
+from .profiling import get_profile, make_profile_token
+from .throttling import IPRateThrottle, scoped
+
+
+def exited_pid():
+    """The pid of a process that has already exited."""
+    process = subprocess.Popen([sys.executable, '-c', ''])
+    process.wait()
+    return process.pid
+
+
+class MetricsDirectoryTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        settings = override_settings(METRICS_DIR=self.directory.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.registry = Registry()
+        self.requests = self.registry.counter('lms_test_total', 'Test counter.', ('view',))
+        self.workers = self.registry.gauge('lms_test_workers', 'Test gauge.')
+
+    def write_snapshot(self, pid, requests, workers):
+        with open(os.path.join(self.directory.name, f'metrics-{pid}.json'), 'w') as f:
+            json.dump({'pid': pid, 'metrics': {
+                'lms_test_total': [[['list'], requests]],
+                'lms_test_workers': [[[], workers]],
+            }}, f)
+
+    def test_exited_workers_are_folded_into_one_file(self):
+        live = os.getppid()
+        self.write_snapshot(live, requests=1, workers=1)
+        self.write_snapshot(exited_pid(), requests=3, workers=1)
+        self.write_snapshot(exited_pid(), requests=5, workers=1)
+        self.requests.inc('list', amount=2)
+
+        for _ in range(2):
+            text = self.registry.render()
+            self.assertIn('lms_test_total{view="list"} 11', text)
+            # Gauges only come from live processes
+            self.assertIn('lms_test_workers 1', text)
+            self.assertEqual(
+                sorted(name for name in os.listdir(self.directory.name) if name.endswith('.json')),
+                sorted([EXITED_SNAPSHOT, f'metrics-{live}.json'])
+            )
+
+
+class MetricsAccessTests(SimpleTestCase):
+    def test_private_addresses_need_the_token(self):
+        # Behind a proxy, every request comes from a private address
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.7').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='127.0.0.1').status_code, 200)
+
+    @override_settings(METRICS_TOKEN='scrape-token')
+    def test_token_is_accepted_from_anywhere(self):
+        response = self.client.get(
+            '/metrics', REMOTE_ADDR='10.0.0.7', HTTP_AUTHORIZATION='Bearer scrape-token'
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+def throttle_rates(**rates):
+    """Turn on just these throttle rates (the test runner turns them all off)."""
+    return override_settings(
+        REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates}
+    )
+
+
+class ThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client = APIClient()
+
+    def login(self, password, ip):
+        return self.client.post(
+            '/api/auth/auth/login/',
+            {'email': 'throttled@example.com', 'password': password},
+            format='json',
+            REMOTE_ADDR=ip,
+        )
+
+    def test_limit_is_hit_with_retry_after(self):
+        with throttle_rates(login='3/min'), \
+                mock.patch('config.throttling.time.time', return_value=6000):
+            for _ in range(3):
+                self.assertEqual(self.login('wrong', '203.0.113.9').status_code, 401)
+            response = self.login('wrong', '203.0.113.9')
+
+        self.assertEqual(response.status_code, 429)
+        # The 3 requests must fade to 2 in the next window: 60 + 20 seconds
+        self.assertEqual(response['Retry-After'], '80')
+
+    def test_window_slides(self):
+        throttle_class = scoped(IPRateThrottle, 'test')
+        request = RequestFactory().get('/', REMOTE_ADDR='203.0.113.9')
+
+        def allowed(now):
+            with mock.patch('config.throttling.time.time', return_value=now):
+                throttle = throttle_class()
+                return throttle.allow_request(request, None), throttle.wait()
+
+        with throttle_rates(test='4/min'):
+            # Start of a window: the full allowance
+            self.assertEqual([allowed(6000)[0] for _ in range(5)], [True] * 4 + [False])
+            # Halfway through the next one, the previous 4 still count as 2
+            self.assertEqual([allowed(6090)[0] for _ in range(2)], [True, True])
+            self.assertEqual(allowed(6090), (False, 15))
+            # They count as 1 once three quarters of the window have passed
+            self.assertEqual(allowed(6105), (True, None))
+            self.assertFalse(allowed(6105)[0])
+            # Two windows later nothing is left over
+            self.assertEqual([allowed(6180)[0] for _ in range(5)], [True] * 4 + [False])
+
+    def test_account_lockout_is_per_ip(self):
+        User.objects.create_user(email='throttled@example.com', password='right-password')
+
+        with throttle_rates(login_account='2/min'):
+            for _ in range(2):
+                self.assertEqual(self.login('wrong', '203.0.113.9').status_code, 401)
+            self.assertEqual(self.login('right-password', '203.0.113.9').status_code, 429)
+            # Failing logins elsewhere doesn't lock the owner out
+            self.assertEqual(self.login('right-password', '198.51.100.4').status_code, 200)
+
+
+@override_settings(PROFILER_SAMPLE_RATE=0)
+class ProfilerTokenTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.staff = User.objects.create_superuser(email='staff@example.com', password='password')
+
+    def get_courses(self, token):
+        return self.client.get('/api/courses/', HTTP_X_PROFILE=token)
+
+    def test_valid_token_stores_a_profile(self):
+        client = APIClient()
+        client.force_authenticate(self.staff)
+        token = client.post('/api/profiling/token/').data['token']
+
+        response = self.get_courses(token)
+        self.assertEqual(response['X-Profiled'], 'CourseViewSet.list')
+        self.assertEqual(get_profile('CourseViewSet.list')['requests'], 1)
+
+    def test_invalid_tokens_are_ignored(self):
+        value, signature = make_profile_token(self.staff).rsplit(':', 1)
+        forged = f'{value}:{signature[::-1]}'
+        # Signed just over PROFILER_TOKEN_MAX_AGE ago
+        with mock.patch('django.core.signing.time.time', return_value=time.time() - 60 * 60 - 1):
+            expired = make_profile_token(self.staff)
+
+        for token in (str(self.staff.pk), forged, expired):
+            with self.subTest(token=token):
+                response = self.get_courses(token)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn('X-Profiled', response)
+        self.assertIsNone(get_profile('CourseViewSet.list'))
+
+
+class SeedCommandTests(TestCase):
+    def seed(self, *args):
+        out = io.StringIO()
+        call_command(
+            'seed_lms', '--students', '3', '--instructors', '1', '--courses', '1',
+            '--lessons', '2', '--enrollments', '1', *args, stdout=out
+        )
+        return out.getvalue()
+
+    def test_refuses_without_debug(self):
+        with self.assertRaisesMessage(CommandError, 'pass --force'):
+            self.seed()
+        self.assertFalse(User.objects.exists())
+
+    def test_users_share_a_random_password(self):
+        password = re.search(r'the password "(.+)"', self.seed('--force')).group(1)
+        self.assertGreaterEqual(len(password), 16)
+
+        users = User.objects.all()
+        self.assertEqual(len(users), 4)
+        self.assertTrue(all(user.check_password(password) for user in users))
@@ -0,0 +1,161 @@
+"""
+Cache-backed request throttling.
+
+Throttles count requests with a sliding window: a counter for the current
+and the previous fixed window, where the previous window's count is weighted
+by how much of it still overlaps the sliding window. Counters are bumped with
+cache.incr, which is atomic on shared backends (Redis, Memcached), so every
+worker sees the same counts.
+
+Rates live in REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] under a scope name.
+Views bind a throttle class to a scope with scoped(), or set a class-level
+`throttle_scope`. Throttle classes decide what is counted: the client IP,
+the authenticated user or, for logins, the target account per IP. Client
+IPs come from DRF's get_ident(), which needs REST_FRAMEWORK['NUM_PROXIES']
+behind a proxy: it then takes the address the proxy appended to
+X-Forwarded-For, and entries a client sent itself can't give it a fresh
+bucket.
+
+Throttles run in APIView.initial(), before the view body, so rejected logins
+never reach password hashing. DRF adds the Retry-After header from wait().
+"""
+
+import hashlib
+import math
+import time
+
+from django.core.cache import cache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 60 * 60 * 24}
+
+
+def parse_rate(rate):
+    """'10/min' -> (10, 60), in the same format as DRF's rates."""
+    num, period = rate.split('/')
+    return int(num), PERIODS[period[0]]
+
+
+def scoped(throttle_class, scope):
+    """A throttle_class subclass bound to a scope, for function views."""
+    return type(f'{throttle_class.__name__}[{scope}]', (throttle_class,), {'scope': scope})
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """
+    Base class: subclasses set `scope` (or views set `throttle_scope`) and
+    implement get_ident_key().
+    """
+
+    scope = None
+    key_prefix = None
+
+    def __init__(self):
+        self._wait = None
+
+    def get_scope(self, view):
+        return self.scope or getattr(view, 'throttle_scope', None)
+
+    def get_rate(self, scope):
+        return api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+
+    def get_ident_key(self, request, view):
+        """What to count requests against, or None to skip throttling."""
+        raise NotImplementedError('.get_ident_key() must be overridden')
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(view)
+        rate = self.get_rate(scope) if scope else None
+        if rate is None:
+            return True
+
+        ident = self.get_ident_key(request, view)
+        if ident is None:
+            return True
+
+        limit, duration = parse_rate(rate)
+        now = time.time()
+        window = int(now // duration)
+        elapsed = now / duration - window
+        prefix = f'throttle:{scope}:{self.key_prefix}:{ident}'
+        current_key = f'{prefix}:{window}'
+
+        # Each counter must outlive the window that follows it
+        cache.add(current_key, 0, duration * 2)
+        try:
+            current = cache.incr(current_key)
+        except ValueError:
+            # Evicted between add and incr
+            cache.set(current_key, 1, duration * 2)
+            current = 1
+        previous = cache.get(f'{prefix}:{window - 1}', 0)
+
+        if previous * (1 - elapsed) + current <= limit:
+            return True
+
+        # Rejected requests don't use up the allowance
+        try:
+            cache.decr(current_key)
+        except ValueError:
+            pass
+        self._wait = self._time_until_allowed(limit, duration, elapsed, previous, current - 1)
+        return False
+
+    @staticmethod
+    def _time_until_allowed(limit, duration, elapsed, previous, current):
+        """Seconds until one more request fits under the limit."""
+        if current + 1 > limit:
+            # Not before the next window, where `current` is the weighted count
+            next_window = (1 - elapsed) * duration
+            needed = 1 - (limit - 1) / current if current else 0
+            return next_window + max(needed, 0) * duration
+        if previous:
+            needed = 1 - (limit - current - 1) / previous
+            return max(needed - elapsed, 0) * duration
+        return 0
+
+    def wait(self):
+        if self._wait is None:
+            return None
+        return max(math.ceil(self._wait), 1)
+
+
+class IPRateThrottle(SlidingWindowThrottle):
+    """Counts requests per client IP."""
+
+    key_prefix = 'ip'
+
+    def get_ident_key(self, request, view):
+        return self.get_ident(request)
+
+
+class UserRateThrottle(SlidingWindowThrottle):
+    """Counts requests per user, falling back to the IP for anonymous requests."""
+
+    key_prefix = 'user'
+
+    def get_ident_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return request.user.pk
+        return f'anon-{self.get_ident(request)}'
+
+
+class LoginAccountThrottle(SlidingWindowThrottle):
+    """
+    Counts login attempts per target email from each client IP, to slow down
+    password guessing against one account below the IP-wide login rate.
+    Keying on the email alone would let anyone lock a victim out of their
+    account by failing logins for it from elsewhere.
+    """
+
+    scope = 'login_account'
+    key_prefix = 'account'
+
+    def get_ident_key(self, request, view):
+        email = request.data.get('email') if hasattr(request.data, 'get') else None
+        if not isinstance(email, str) or not email.strip():
+            return None
+        # Hashed so arbitrary input can't produce invalid cache keys
+        account = hashlib.sha256(email.strip().lower().encode()).hexdigest()[:32]
+        return f'{account}:{self.get_ident(request)}'
@@ -0,0 +1,187 @@
+"""
+Per-request timing.
+
+RequestTimingMiddleware measures every request: the number of SQL queries
+and the time spent in them (on every database alias), the time spent
+rendering the response data to JSON, and the total time. The figures go
+out as a Server-Timing header, which browser dev tools show next to the
+request, and as one JSON log line on the `config.timing` logger, keyed by
+the view and action that handled the request (`CourseViewSet.analytics`).
+
+Requests over their query budget (config.query_budget.QUERY_BUDGETS) are
+logged as warnings, so N+1 regressions that slip past CI still stand out.
+The same figures feed the request metrics of config.metrics.
+
+Building serializer.data happens inside the view and is counted there;
+`serialize` is the time TimedJSONRenderer spends turning it into bytes.
+Streaming responses run most of their queries while their content is
+consumed, so they are timed and logged once the last chunk is produced.
+Their Server-Timing header can only hold the figures up to the view's
+return.
+"""
+
+import json
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.renderers import JSONRenderer
+
+from .metrics import record_request
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar('request_timing', default=None)
+
+
+class RequestTiming:
+    """What one request spent its time on."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view = None
+        self.queries = 0
+        self.db = 0.0
+        self.serialize = 0.0
+        self.total = None
+
+    def record_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - start
+            self.queries += 1
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started
+
+    def server_timing(self):
+        """Server-Timing header value, durations in milliseconds."""
+        app = max(self.total - self.db - self.serialize, 0)
+        return ', '.join([
+            f'db;dur={self.db * 1000:.1f};desc="{self.queries} queries"',
+            f'serialize;dur={self.serialize * 1000:.1f}',
+            f'app;dur={app * 1000:.1f}',
+            f'total;dur={self.total * 1000:.1f}',
+        ])
+
+    def as_dict(self):
+        return {
+            'view': self.view,
+            'queries': self.queries,
+            'db_ms': round(self.db * 1000, 1),
+            'serialize_ms': round(self.serialize * 1000, 1),
+            'total_ms': round(self.total * 1000, 1),
+        }
+
+
+@contextmanager
+def counting_queries(timing):
+    """Count the queries run in the block, on every alias, into `timing`."""
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(timing.record_query))
+        yield
+
+
+def current_timing():
+    """The RequestTiming of the request being handled, if any."""
+    return _current.get()
+
+
+def view_label(view_func, method):
+    """'CourseViewSet.analytics' for viewset actions, the view name otherwise."""
+    cls = getattr(view_func, 'cls', None)
+    actions = getattr(view_func, 'actions', None)
+    if cls is not None and actions:
+        action = actions.get(method.lower())
+        if action:
+            return f'{cls.__name__}.{action}'
+    if cls is not None:
+        return cls.__name__
+    return getattr(view_func, '__name__', repr(view_func))
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """JSONRenderer that adds its rendering time to the current request."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        timing = _current.get()
+        if timing is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        start = time.perf_counter()
+        try:
+            return super().render(data, accepted_media_type, renderer_context)
+        finally:
+            timing.serialize += time.perf_counter() - start
+
+
+class RequestTimingMiddleware:
+    """Times each request and reports it in a header and a log line."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timing = RequestTiming()
+        token = _current.set(timing)
+        try:
+            with counting_queries(timing):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        timing.finish()
+
+        if getattr(settings, 'SERVER_TIMING_HEADER', True):
+            response['Server-Timing'] = timing.server_timing()
+        if response.streaming and not response.is_async:
+            response.streaming_content = self.timed_stream(
+                request, response, timing, response.streaming_content
+            )
+        else:
+            self.report(request, response, timing)
+        return response
+
+    def timed_stream(self, request, response, timing, content):
+        """Stream `content`, counting the queries run to produce each chunk."""
+        content = iter(content)
+        try:
+            while True:
+                # Counted per chunk, so no wrapper outlives an abandoned stream
+                with counting_queries(timing):
+                    chunk = next(content, None)
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            timing.finish()
+            self.report(request, response, timing)
+
+    def report(self, request, response, timing):
+        self.log(request, response, timing)
+        record_request(request, response, timing)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timing = _current.get()
+        if timing is not None:
+            timing.view = view_label(view_func, request.method)
+
+    def log(self, request, response, timing):
+        from .query_budget import budget_for
+
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            **timing.as_dict(),
+        }
+        budget = budget_for(timing.view)
+        if budget is not None and timing.queries > budget:
+            record['query_budget'] = budget
+            logger.warning(json.dumps(record))
+        else:
+            logger.info(json.dumps(record))
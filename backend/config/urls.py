@@ -8,6 +8,10 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from .views import (
+    health_view, metrics_view, profile_detail_view, profile_list_view, profile_token_view
+)
+
 urlpatterns = [
     # Admin
     path('admin/', admin.site.urls),
@@ -17,6 +21,11 @@ urlpatterns = [
     path('api/', include('courses.urls')),
     path('api/', include('enrollments.urls')),
     path('api/', include('assessments.urls')),  # Add this line
+    path('api/health/', health_view, name='health'),
+    path('metrics', metrics_view, name='metrics'),
+    path('api/profiling/', profile_list_view, name='profiling'),
+    path('api/profiling/token/', profile_token_view, name='profiling-token'),
+    path('api/profiling/<str:view>/', profile_detail_view, name='profiling-view'),
 ]
 
 # Serve media files in development
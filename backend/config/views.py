@@ -0,0 +1,145 @@
+"""
+Operational endpoints
+"""
+
+import hmac
+import ipaddress
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.http import HttpResponse, JsonResponse
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny, IsAdminUser
+from rest_framework.response import Response
+
+from .db import pool_stats
+from .metrics import CONTENT_TYPE, registry
+from .profiling import (
+    DEFAULT_TOKEN_MAX_AGE, clear_profiles, collapsed_text, flamegraph_tree,
+    get_profile, make_profile_token, profiled_views
+)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def health_view(request):
+    """
+    Check that every configured database answers; staff also get pool stats
+    GET /api/health/
+    """
+    databases = {}
+    for alias in connections:
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute('SELECT 1')
+            databases[alias] = 'ok'
+        except DatabaseError:
+            databases[alias] = 'unavailable'
+
+    healthy = all(state == 'ok' for state in databases.values())
+    data = {
+        'status': 'ok' if healthy else 'unavailable',
+        'databases': databases,
+    }
+    if request.user.is_staff:
+        data['pools'] = pool_stats()
+
+    return Response(
+        data,
+        status=status.HTTP_200_OK if healthy else status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+
+
+def is_internal(request):
+    """
+    Callers presenting METRICS_TOKEN as a bearer token, or connecting from
+    METRICS_ALLOWED_NETWORKS (loopback by default; none in production,
+    where every connection comes from the proxy).
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        header = request.META.get('HTTP_AUTHORIZATION', '')
+        if hmac.compare_digest(header.encode(), f'Bearer {token}'.encode()):
+            return True
+
+    # REMOTE_ADDR, not X-Forwarded-For, which clients can set themselves
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(
+        address in ipaddress.ip_network(network)
+        for network in getattr(settings, 'METRICS_ALLOWED_NETWORKS', [])
+    )
+
+
+def metrics_view(request):
+    """
+    Application metrics in the Prometheus text format (internal callers only)
+    GET /metrics
+    """
+    if not is_internal(request):
+        return JsonResponse({'error': 'Metrics are only available internally'}, status=403)
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
+
+
+# ========== PROFILER (staff only) ==========
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def profile_token_view(request):
+    """
+    Signed X-Profile header value; requests sending it are profiled
+    POST /api/profiling/token/
+    """
+    return Response({
+        'header': 'X-Profile',
+        'token': make_profile_token(request.user),
+        'expires_in': getattr(settings, 'PROFILER_TOKEN_MAX_AGE', DEFAULT_TOKEN_MAX_AGE),
+    })
+
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAdminUser])
+def profile_list_view(request):
+    """
+    Views with a profile, or clear all profiles
+    GET/DELETE /api/profiling/
+    """
+    if request.method == 'DELETE':
+        clear_profiles()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    return Response({
+        'views': [
+            {'view': view, 'requests': requests, 'samples': samples}
+            for view, (requests, samples) in profiled_views().items()
+        ]
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def profile_detail_view(request, view):
+    """
+    Flamegraph of one view action; ?output=collapsed for flamegraph.pl/speedscope
+    GET /api/profiling/<view>/
+    """
+    profile = get_profile(view)
+    if profile is None:
+        return Response(
+            {'error': 'No profile for this view'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+    if request.query_params.get('output') == 'collapsed':
+        return HttpResponse(collapsed_text(profile['stacks']), content_type='text/plain; charset=utf-8')
+
+    return Response({
+        'view': view,
+        'requests': profile['requests'],
+        'average_ms': round(profile['seconds'] / profile['requests'] * 1000, 1),
+        'samples': sum(profile['stacks'].values()),
+        'flamegraph': flamegraph_tree(profile['stacks'], view),
+    })
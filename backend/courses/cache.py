@@ -0,0 +1,64 @@
+"""
+Version counters for cached course data.
+
+Cached payloads put the current version of everything they depend on into
+their cache key. Bumping a version makes every key built from it unreachable,
+so stale entries simply age out instead of being deleted one by one.
+"""
+
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+def _version_key(scope, pk):
+    return f'version:{scope}:{pk}'
+
+
+def get_version(scope, pk):
+    """Return the current version for an object, creating it if needed."""
+    key = _version_key(scope, pk)
+    version = cache.get(key)
+    if version is None:
+        # Seed with a timestamp so an evicted counter never reuses an old value
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def _incr_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def bump_version(scope, pk):
+    """
+    Invalidate everything cached against the given object.
+    
+    The version is bumped again once the surrounding transaction commits, so
+    anything cached from pre-commit data in the meantime is dropped too.
+    """
+    key = _version_key(scope, pk)
+    _incr_version(key)
+    transaction.on_commit(lambda: _incr_version(key))
+
+
+def course_version(course_id):
+    """Version of a course's structure (course, lessons, quizzes)."""
+    return get_version('course', course_id)
+
+
+def learner_version(course_id, user_id):
+    """Version of one student's state in a course (progress, attempts)."""
+    return get_version('learner', f'{course_id}:{user_id}')
+
+
+def bump_course_version(course_id):
+    bump_version('course', course_id)
+
+
+def bump_learner_version(course_id, user_id):
+    bump_version('learner', f'{course_id}:{user_id}')
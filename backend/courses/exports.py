@@ -0,0 +1,231 @@
+"""
+Streaming data exports for instructors.
+
+Every export is a generator over a queryset read with .iterator(), which
+uses a server-side cursor where the database supports it. Rows are rendered
+to CSV or NDJSON line by line, batched into larger chunks and optionally
+gzipped on the fly, so memory stays flat however many rows are exported.
+
+CSV cells starting with a formula character are prefixed with a quote, so
+user-written text can't run as a formula when the file is opened in a
+spreadsheet.
+"""
+
+import csv
+import heapq
+import zlib
+from operator import itemgetter
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, F, IntegerField, Q, Value
+from django.db.models.functions import Length
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+
+from enrollments.models import Enrollment, LessonProgress
+from .models import Review, Discussion, Comment
+
+EXPORT_CHUNK_SIZE = 2000
+
+# Rendered output is sent in pieces of roughly this many bytes
+STREAM_BUFFER_SIZE = 64 * 1024
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+# Spreadsheets evaluate cells starting with these as formulas
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class Echo:
+    """File-like object that hands back what is written, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def csv_safe(value):
+    """A CSV cell value that spreadsheets won't evaluate as a formula."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+# ========== EXPORTS ==========
+# Each export returns (columns, rows) where rows yields dicts keyed by column.
+
+def roster_export(course, chunk_size=EXPORT_CHUNK_SIZE):
+    """One row per enrolled student with their progress."""
+    columns = [
+        'student_id', 'email', 'first_name', 'last_name', 'enrolled_date',
+        'progress_percentage', 'lessons_completed', 'completed', 'completed_date',
+    ]
+    rows = Enrollment.objects.filter(course=course).annotate(
+        email=F('student__email'),
+        first_name=F('student__first_name'),
+        last_name=F('student__last_name'),
+        lessons_completed=Count('lesson_progress', filter=Q(lesson_progress__completed=True)),
+    ).order_by('id').values(*columns)
+    return columns, rows.iterator(chunk_size=chunk_size)
+
+
+def lesson_completions_export(course, chunk_size=EXPORT_CHUNK_SIZE):
+    """One row per completed lesson, in completion order."""
+    columns = [
+        'completed_date', 'student_id', 'email', 'lesson_id', 'lesson_order', 'lesson_title',
+    ]
+    rows = LessonProgress.objects.filter(
+        enrollment__course=course,
+        completed=True
+    ).annotate(
+        student_id=F('enrollment__student_id'),
+        email=F('enrollment__student__email'),
+        lesson_order=F('lesson__order'),
+        lesson_title=F('lesson__title'),
+    ).order_by('completed_date', 'id').values(*columns)
+    return columns, rows.iterator(chunk_size=chunk_size)
+
+
+def reviews_export(course, chunk_size=EXPORT_CHUNK_SIZE):
+    """One row per review."""
+    columns = [
+        'review_id', 'student_id', 'email', 'rating', 'review_text',
+        'helpful_count', 'created_at', 'updated_at',
+    ]
+    rows = Review.objects.filter(course=course).annotate(
+        review_id=F('id'),
+        email=F('student__email'),
+    ).order_by('id').values(*columns)
+    return columns, rows.iterator(chunk_size=chunk_size)
+
+
+def discussion_activity_export(course, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Discussions and comments as one activity stream in time order.
+
+    Both tables are read in created_at order and merged as they stream.
+    """
+    columns = [
+        'created_at', 'type', 'id', 'discussion_id', 'parent_comment_id', 'user_id',
+        'email', 'upvotes', 'is_instructor_reply', 'content_length',
+    ]
+    discussions = Discussion.objects.filter(course=course).annotate(
+        type=Value('discussion'),
+        discussion_id=F('id'),
+        parent_comment_id=Value(None, output_field=IntegerField()),
+        email=F('user__email'),
+        is_instructor_reply=Value(False),
+        content_length=Length('content'),
+    ).order_by('created_at', 'id').values(*columns)
+    comments = Comment.objects.filter(discussion__course=course).annotate(
+        type=Value('comment'),
+        email=F('user__email'),
+        content_length=Length('content'),
+    ).order_by('created_at', 'id').values(*columns)
+    rows = heapq.merge(
+        discussions.iterator(chunk_size=chunk_size),
+        comments.iterator(chunk_size=chunk_size),
+        key=itemgetter('created_at')
+    )
+    return columns, rows
+
+
+EXPORTS = {
+    'roster': roster_export,
+    'lesson_completions': lesson_completions_export,
+    'reviews': reviews_export,
+    'discussion_activity': discussion_activity_export,
+}
+
+
+# ========== RENDERING ==========
+
+def render_csv(columns, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([csv_safe(row[column]) for column in columns])
+
+
+def render_ndjson(columns, rows):
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode({column: row[column] for column in columns}) + '\n'
+
+
+RENDERERS = {
+    'csv': render_csv,
+    'ndjson': render_ndjson,
+}
+
+
+def _buffered(lines, size=STREAM_BUFFER_SIZE):
+    """Join rendered lines into chunks of about `size` bytes."""
+    buffer = []
+    buffered = 0
+    for line in lines:
+        data = line.encode('utf-8')
+        buffer.append(data)
+        buffered += len(data)
+        if buffered >= size:
+            yield b''.join(buffer)
+            buffer = []
+            buffered = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def _gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def accepts_gzip(request):
+    """
+    Whether the request's Accept-Encoding allows gzip, by its q-values:
+    "gzip;q=0" refuses it and "*" accepts it unless gzip is listed.
+    """
+    qualities = {}
+    for coding in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, *params = coding.split(';')
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.strip().lower()] = quality
+    return qualities.get('gzip', qualities.get('*', 0.0)) > 0
+
+
+def streaming_export_response(request, lines, filename, content_type):
+    """
+    Stream rendered lines to the client, gzipped when the client accepts it.
+    """
+    chunks = _buffered(lines)
+    gzip = accepts_gzip(request)
+    if gzip:
+        chunks = _gzipped(chunks)
+
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    patch_vary_headers(response, ('Accept-Encoding',))
+    if gzip:
+        response['Content-Encoding'] = 'gzip'
+    return response
+
+
+def export_response(request, course, kind, output='csv'):
+    """Build the streaming response for one of EXPORTS."""
+    columns, rows = EXPORTS[kind](course)
+    lines = RENDERERS[output](columns, rows)
+    filename = f'{kind}-course-{course.id}.{output}'
+    return streaming_export_response(request, lines, filename, CONTENT_TYPES[output])
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.9 on 2026-10-19 00:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0005_lesson_video_file_alter_lesson_duration_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['discussion', 'parent_comment', 'created_at'], name='comment_discussion_parent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='discussion',
+            index=models.Index(fields=['course', '-is_pinned', '-created_at'], name='discussion_course_pinned_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['course', 'rating'], name='review_course_rating_idx'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.conf import settings
 from .validators import validate_video_file, validate_video_content_type
 
@@ -76,18 +77,27 @@ class Course(models.Model):
         verbose_name = 'Course'
         verbose_name_plural = 'Courses'
     
+    # The stats methods use the annotations of with_course_stats() when the
+    # course was loaded with them, and query otherwise.
+    
     def total_lessons(self):
         """Count total lessons in this course."""
+        if hasattr(self, 'lesson_total'):
+            return self.lesson_total
         return self.lessons.count()
     
     def total_students(self):
         """Count students enrolled in this course."""
+        if hasattr(self, 'student_total'):
+            return self.student_total
         return self.enrollments.count()
     
     # Add these new methods below total_students:
     
     def average_rating(self):
         """Calculate average rating from reviews."""
+        if hasattr(self, 'rating_average'):
+            return round(self.rating_average, 1) if self.rating_average is not None else 0
         reviews = self.reviews.all()
         if reviews.count() == 0:
             return 0
@@ -96,9 +106,36 @@ class Course(models.Model):
     
     def review_count(self):
         """Count total reviews."""
+        if hasattr(self, 'review_total'):
+            return self.review_total
         return self.reviews.count()
 
 
+def _per_course(queryset, aggregate):
+    """Subquery computing `aggregate` over queryset rows of the outer course."""
+    return models.Subquery(
+        queryset.filter(course=models.OuterRef('pk')).order_by()
+        .values('course').annotate(value=aggregate).values('value')
+    )
+
+
+def with_course_stats(queryset):
+    """
+    Annotate courses with what total_lessons(), total_students(),
+    average_rating() and review_count() report, one subquery each, so
+    course lists don't run four queries per course.
+    """
+    from enrollments.models import Enrollment
+    
+    zero = models.Value(0)
+    return queryset.annotate(
+        lesson_total=Coalesce(_per_course(Lesson.objects, models.Count('pk')), zero),
+        student_total=Coalesce(_per_course(Enrollment.objects, models.Count('pk')), zero),
+        review_total=Coalesce(_per_course(Review.objects, models.Count('pk')), zero),
+        rating_average=_per_course(Review.objects, models.Avg('rating')),
+    )
+
+
 class Lesson(models.Model):
     """
     A lesson within a course.
@@ -209,6 +246,9 @@ class Review(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Review'
         verbose_name_plural = 'Reviews'
+        indexes = [
+            models.Index(fields=['course', 'rating'], name='review_course_rating_idx'),
+        ]
 
 
 class Discussion(models.Model):
@@ -243,6 +283,10 @@ class Discussion(models.Model):
         ordering = ['-is_pinned', '-created_at']
         verbose_name = 'Discussion'
         verbose_name_plural = 'Discussions'
+        indexes = [
+            # Serves the course's thread list in display order
+            models.Index(fields=['course', '-is_pinned', '-created_at'], name='discussion_course_pinned_idx'),
+        ]
     
     def comment_count(self):
         """Count total comments."""
@@ -284,6 +328,12 @@ class Comment(models.Model):
     
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(
+                fields=['discussion', 'parent_comment', 'created_at'],
+                name='comment_discussion_parent_idx'
+            ),
+        ]
     
     def save(self, *args, **kwargs):
         # Auto-detect if this is from the course instructor
@@ -1,3 +1,4 @@
+from django.db.models import Count
 from rest_framework import serializers
 from .models import Course, Lesson, Category, Review, Discussion, Comment  # Add Discussion, Comment
 from django.contrib.auth import get_user_model
@@ -16,7 +17,16 @@ class CategorySerializer(serializers.ModelSerializer):
     
     def get_course_count(self, obj):
         """Count published courses in this category."""
-        return obj.courses.filter(status='published').count()
+        # Counted for all categories at once and shared through the context,
+        # so nested category fields in course lists don't query per course
+        counts = self.context.get('category_course_counts')
+        if counts is None:
+            counts = dict(
+                Course.objects.filter(status='published').order_by()
+                .values_list('category').annotate(n=Count('pk'))
+            )
+            self.context['category_course_counts'] = counts
+        return counts.get(obj.pk, 0)
 
 
 class InstructorSerializer(serializers.ModelSerializer):
@@ -171,6 +181,31 @@ class CourseDetailSerializer(serializers.ModelSerializer):
                 return request.build_absolute_uri(obj.thumbnail.url)
         return None
 
+class CourseHeaderSerializer(serializers.ModelSerializer):
+    """
+    Compact course info for the course player.
+    Avoids the per-course aggregate queries of the list/detail serializers.
+    """
+    
+    instructor = InstructorSerializer(read_only=True)
+    category_name = serializers.CharField(source='category.name', default=None, read_only=True)
+    thumbnail_url = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Course
+        fields = [
+            'id', 'title', 'description', 'instructor', 'category_name',
+            'difficulty', 'thumbnail_url', 'updated_at'
+        ]
+    
+    def get_thumbnail_url(self, obj):
+        """Return full URL for thumbnail."""
+        if obj.thumbnail:
+            request = self.context.get('request')
+            if request:
+                return request.build_absolute_uri(obj.thumbnail.url)
+        return None
+
 class CourseCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating courses (instructors only)."""
     
@@ -211,6 +246,9 @@ class CommentSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'user', 'upvotes', 'is_instructor_reply', 'created_at', 'updated_at']
     
     def get_reply_count(self, obj):
+        # Annotated by CommentViewSet.list
+        if hasattr(obj, 'reply_total'):
+            return obj.reply_total
         return obj.replies.count()
 
 
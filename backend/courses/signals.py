@@ -0,0 +1,19 @@
+"""
+Signal handlers that keep cached course data fresh.
+"""
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .cache import bump_course_version
+from .models import Course, Lesson
+
+
+@receiver([post_save, post_delete], sender=Course)
+def course_changed(sender, instance, **kwargs):
+    bump_course_version(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Lesson)
+def lesson_changed(sender, instance, **kwargs):
+    bump_course_version(instance.course_id)
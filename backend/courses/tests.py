@@ -1,3 +1,445 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import random
+import tracemalloc
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from config.query_budget import QUERY_BUDGETS, query_budget
+from config.query_plans import QueryPlanAssertions, seed_dataset
+from assessments.models import Quiz, QuizAttempt
+from enrollments.models import Enrollment, LessonProgress
+from users.models import User
+from .exports import accepts_gzip
+from .gradebook import stream_gradebook_csv
+from .models import Category, Comment, Course, Discussion, Lesson, Review
+from .serializers import CommentSerializer
+
+
+def peak_memory(func):
+    """Run func(); return (its result, peak bytes allocated meanwhile)."""
+    tracemalloc.start()
+    try:
+        result = func()
+        return result, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def make_course():
+    """A published course and its instructor."""
+    instructor = User.objects.create_user(
+        email='streaming-instructor@example.com', password='unused', role='instructor'
+    )
+    category = Category.objects.create(name='Streaming', slug='streaming')
+    course = Course.objects.create(
+        title='Streaming', description='For tests', instructor=instructor,
+        category=category, status='published'
+    )
+    return instructor, course
+
+
+def add_comments(course, user, rows):
+    """A new discussion on the course with `rows` comments."""
+    discussion = Discussion.objects.create(course=course, user=user, title='Big', content='!')
+    Comment.objects.bulk_create(
+        [Comment(discussion=discussion, user=user, content='x' * 200) for _ in range(rows)],
+        batch_size=2000
+    )
+    return discussion
+
+
+class CascadeDeleteTests(TestCase):
+    """Cache invalidation signals must not cost queries per deleted row."""
+
+    def delete_queries(self, students):
+        with transaction.atomic():
+            seed = seed_dataset(students=students)
+            course = Course.objects.get(pk=seed['ids']['course'])
+            with CaptureQueriesContext(connection) as queries:
+                course.delete()
+            transaction.set_rollback(True)
+        return len(queries)
+
+    def test_course_delete_query_count_does_not_grow_with_rows(self):
+        self.assertEqual(self.delete_queries(students=50), self.delete_queries(students=5))
+
+
+class ExportStreamingTests(TestCase):
+    """Exports stream: memory stays flat as the number of rows grows."""
+
+    def setUp(self):
+        self.instructor, self.course = make_course()
+        self.client = APIClient()
+        self.client.force_authenticate(self.instructor)
+
+    def export_peak(self, **headers):
+        def export():
+            response = self.client.get(
+                f'/api/courses/{self.course.pk}/export/discussion_activity/', **headers
+            )
+            self.assertEqual(response.status_code, 200)
+            return sum(len(chunk) for chunk in response.streaming_content)
+
+        return peak_memory(export)
+
+    def assert_flat_memory(self, **headers):
+        # Enough rows for a few fetch chunks, then five times as many
+        add_comments(self.course, self.instructor, 6000)
+        small_size, small_peak = self.export_peak(**headers)
+        add_comments(self.course, self.instructor, 24000)
+        size, peak = self.export_peak(**headers)
+
+        self.assertGreater(size, small_size * 4)
+        # Small allocations (caches warming up) shouldn't fail the test
+        self.assertLess(peak, small_peak * 1.5 + 256 * 1024)
+
+    def test_csv_export_memory_is_flat(self):
+        self.assert_flat_memory()
+
+    def test_gzipped_export_memory_is_flat(self):
+        self.assert_flat_memory(HTTP_ACCEPT_ENCODING='gzip')
+
+
+class ExportFormatTests(TestCase):
+    def setUp(self):
+        self.instructor, self.course = make_course()
+        self.client = APIClient()
+        self.client.force_authenticate(self.instructor)
+
+    def export(self, kind, **headers):
+        return self.client.get(f'/api/courses/{self.course.pk}/export/{kind}/', **headers)
+
+    def test_formulas_are_escaped(self):
+        student = User.objects.create_user(
+            email='formula@example.com', password='unused', first_name='@SUM(A1:A9)', last_name='-2+3'
+        )
+        Enrollment.objects.create(student=student, course=self.course)
+        Review.objects.create(
+            course=self.course, student=student, rating=1, review_text='=HYPERLINK("http://x", "y")'
+        )
+
+        roster = list(csv.DictReader(io.StringIO(b''.join(self.export('roster').streaming_content).decode())))
+        self.assertEqual((roster[0]['first_name'], roster[0]['last_name']), ("'@SUM(A1:A9)", "'-2+3"))
+        reviews = list(csv.DictReader(io.StringIO(b''.join(self.export('reviews').streaming_content).decode())))
+        self.assertEqual(reviews[0]['review_text'], '\'=HYPERLINK("http://x", "y")')
+
+        Quiz.objects.create(lesson=Lesson.objects.create(course=self.course, title='L', order=1), title='+1')
+        header, row = csv.reader(io.StringIO(''.join(stream_gradebook_csv(self.course))))
+        self.assertEqual((header[-1], row[2]), ("'+1", "'@SUM(A1:A9)"))
+
+    def test_accept_encoding_q_values(self):
+        cases = {
+            '': False,
+            'gzip': True,
+            'gzip, deflate, br': True,
+            'br;q=1.0, gzip;q=0.5': True,
+            'gzip;q=0': False,
+            'GZIP ; Q=0.000': False,
+            'br': False,
+            '*': True,
+            '*;q=0.1, gzip;q=0': False,
+            'br, *;q=0': False,
+            'gzip;q=nonsense': False,
+        }
+        for header, expected in cases.items():
+            with self.subTest(header=header):
+                request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=header)
+                self.assertIs(accepts_gzip(request), expected)
+
+    def test_gzip_refused(self):
+        response = self.export('roster', HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'student_id,'))
+
+
+class GradebookTests(TestCase):
+    def setUp(self):
+        self.instructor, self.course = make_course()
+        # Created out of lesson order: columns follow the lessons
+        self.final = Quiz.objects.create(
+            lesson=Lesson.objects.create(course=self.course, title='Last', order=2), title='Final'
+        )
+        self.intro = Quiz.objects.create(
+            lesson=Lesson.objects.create(course=self.course, title='First', order=1), title='Intro'
+        )
+
+        def student(name):
+            return User.objects.create_user(
+                email=f'{name}@example.com', password='unused', first_name=name.title(), last_name='Student'
+            )
+
+        def attempt(student, quiz, score, completed=True):
+            QuizAttempt.objects.create(
+                student=student, quiz=quiz, score=score,
+                attempt_number=QuizAttempt.objects.filter(student=student, quiz=quiz).count() + 1,
+                completed_at=timezone.now() if completed else None
+            )
+
+        # Students who left the course, before and between enrolled ones,
+        # still have scores the merge has to skip
+        left_first = student('left')
+        self.ada, self.bo = student('ada'), student('bo')
+        left_between = student('gone')
+        self.cy = student('cy')
+        for enrolled, progress in ((self.ada, '50.00'), (self.bo, '0.00'), (self.cy, '100.00')):
+            Enrollment.objects.create(student=enrolled, course=self.course, progress_percentage=progress)
+
+        attempt(left_first, self.intro, 90)
+        attempt(self.ada, self.intro, 40)
+        attempt(self.ada, self.intro, 80)
+        attempt(self.ada, self.final, 65)
+        attempt(self.bo, self.final, 100, completed=False)
+        attempt(left_between, self.final, 70)
+        attempt(self.cy, self.final, '55.50')
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.instructor)
+
+    def expected_rows(self):
+        return [
+            ['student_id', 'email', 'first_name', 'last_name', 'progress_percentage', 'Intro', 'Final'],
+            [str(self.ada.pk), 'ada@example.com', 'Ada', 'Student', '50.00', '80.00', '65.00'],
+            [str(self.bo.pk), 'bo@example.com', 'Bo', 'Student', '0.00', '', ''],
+            [str(self.cy.pk), 'cy@example.com', 'Cy', 'Student', '100.00', '', '55.50'],
+        ]
+
+    def test_page(self):
+        response = self.client.get(f'/api/courses/{self.course.pk}/gradebook/?page_size=2')
+        self.assertEqual(response.status_code, 200)
+        page = response.data['results']
+        self.assertEqual([quiz['title'] for quiz in page['quizzes']], ['Intro', 'Final'])
+        self.assertEqual(
+            [(row['email'], row['progress_percentage'], row['scores']) for row in page['students']],
+            [
+                ('ada@example.com', Decimal('50.00'),
+                 {self.intro.pk: Decimal('80.00'), self.final.pk: Decimal('65.00')}),
+                ('bo@example.com', Decimal('0.00'), {self.intro.pk: None, self.final.pk: None}),
+            ]
+        )
+        self.assertEqual(response.data['count'], 3)
+
+    def test_csv_merges_students_and_scores(self):
+        # One row per chunk, so the merge crosses every chunk boundary
+        lines = ''.join(stream_gradebook_csv(self.course, chunk_size=1))
+        self.assertEqual(list(csv.reader(io.StringIO(lines))), self.expected_rows())
+
+    def test_export(self):
+        path = f'/api/courses/{self.course.pk}/gradebook_export/'
+        plain = self.client.get(path)
+        compressed = self.client.get(path, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(plain['Content-Type'], 'text/csv')
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        body = b''.join(plain.streaming_content)
+        self.assertEqual(gzip.decompress(b''.join(compressed.streaming_content)), body)
+        self.assertEqual(list(csv.reader(io.StringIO(body.decode()))), self.expected_rows())
+
+
+class CoursePlayerTests(TestCase):
+    def setUp(self):
+        # Version counters outlive the test transaction; ids get reused
+        cache.clear()
+        self.addCleanup(cache.clear)
+        _, self.course = make_course()
+        self.first = Lesson.objects.create(course=self.course, title='First', order=1)
+        self.second = Lesson.objects.create(course=self.course, title='Second', order=2)
+        self.quiz = Quiz.objects.create(lesson=self.first, title='Check', max_attempts=3)
+
+        self.student = User.objects.create_user(email='player@example.com', password='unused')
+        enrollment = Enrollment.objects.create(student=self.student, course=self.course)
+        LessonProgress.objects.create(
+            enrollment=enrollment, lesson=self.first, completed=True, completed_date=timezone.now()
+        )
+        QuizAttempt.objects.create(
+            student=self.student, quiz=self.quiz, score=80, passed=True, attempt_number=1,
+            completed_at=timezone.now()
+        )
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+        self.path = f'/api/courses/{self.course.pk}/player/'
+
+    def test_response(self):
+        response = self.client.get(self.path)
+        self.assertEqual(response.status_code, 200)
+        data = response.data
+        self.assertEqual(data['course']['id'], self.course.pk)
+        self.assertEqual([lesson['title'] for lesson in data['lessons']], ['First', 'Second'])
+        self.assertEqual(list(data['progress']), [self.first.pk])
+        self.assertTrue(data['progress'][self.first.pk]['completed'])
+        self.assertEqual(data['resume_lesson_id'], self.second.pk)
+        quiz = data['quizzes'][0]
+        self.assertEqual(
+            (quiz['id'], quiz['lesson'], quiz['passed'], quiz['attempts_used'], quiz['attempts_left']),
+            (self.quiz.pk, self.first.pk, True, 1, 2)
+        )
+        self.assertEqual(Decimal(quiz['best_score']), 80)
+
+    def test_needs_enrollment(self):
+        self.client.force_authenticate(User.objects.create_user(email='visitor@example.com', password='unused'))
+        response = self.client.get(self.path)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.data['error'], 'You are not enrolled in this course')
+
+    def test_cached_until_a_lesson_changes(self):
+        first = self.client.get(self.path).data
+        # Only the course lookup; the payload comes from the cache
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(self.path).data, first)
+
+        self.second.title = 'Renamed'
+        self.second.save()
+        lessons = self.client.get(self.path).data['lessons']
+        self.assertEqual([lesson['title'] for lesson in lessons], ['First', 'Renamed'])
+
+
+class StreamingListTests(TestCase):
+    """Streamed list responses: memory stays flat as the number of rows grows."""
+
+    def setUp(self):
+        self.user, self.course = make_course()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def streamed_peak(self, discussion):
+        def stream():
+            response = self.client.get(f'/api/comments/?discussion_id={discussion.pk}')
+            self.assertTrue(response.streaming)
+            return sum(len(chunk) for chunk in response.streaming_content)
+
+        return peak_memory(stream)
+
+    def buffered_peak(self, discussion):
+        # What list() builds: every instance, the list of dicts and the JSON
+        def buffer():
+            queryset = Comment.objects.filter(discussion=discussion).select_related('user').annotate(
+                reply_total=Count('replies')
+            )
+            return len(JSONRenderer().render(CommentSerializer(queryset, many=True).data))
+
+        return peak_memory(buffer)
+
+    def test_comment_list_memory_is_flat(self):
+        _, small_peak = self.streamed_peak(add_comments(self.course, self.user, 1000))
+        large = add_comments(self.course, self.user, 10000)
+        size, peak = self.streamed_peak(large)
+        buffered_size, buffered_peak = self.buffered_peak(large)
+
+        self.assertEqual(size, buffered_size)
+        # Small allocations (caches warming up) shouldn't fail the test
+        self.assertLess(peak, small_peak * 1.5 + 256 * 1024)
+        self.assertLess(peak * 4, buffered_peak)
+
+
+class ReplicaRoutingTests(TestCase):
+    @override_settings(DATABASE_REPLICAS=['default'])
+    def test_replica_is_picked_once_per_request(self):
+        seed = seed_dataset(students=5)
+        client = APIClient()
+        client.force_authenticate(seed['users']['student'])
+
+        with mock.patch('config.replicas.random.choice', wraps=random.choice) as choice:
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(f"/api/courses/{seed['ids']['course']}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(len(queries), 1)
+        self.assertEqual(choice.call_count, 1)
+
+
+class QueryPlanTests(QueryPlanAssertions, TestCase):
+    """Hot course endpoints don't scan tables that grow with students."""
+
+    ENDPOINTS = [
+        ('course list', None, '/api/courses/'),
+        ('course detail', None, '/api/courses/{course}/'),
+        ('course lessons', 'student', '/api/courses/{course}/lessons/'),
+        ('course player', 'student', '/api/courses/{course}/player/'),
+        ('course analytics', 'instructor', '/api/courses/{course}/analytics/'),
+        ('gradebook', 'instructor', '/api/courses/{course}/gradebook/'),
+        ('reviews', 'student', '/api/reviews/?course_id={course}'),
+        ('discussions', 'student', '/api/discussions/?course_id={course}'),
+        ('comments', 'student', '/api/comments/?discussion_id={discussion}'),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seed = seed_dataset()
+
+    def test_hot_endpoints_use_indexes(self):
+        self.assertNoFullScans(self.seed, self.ENDPOINTS)
+
+
+class QueryBudgetTests(TestCase):
+    """Hot course endpoints stay within their QUERY_BUDGETS."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seed = seed_dataset()
+        cls.reviews = Review.objects.filter(course_id=cls.seed['ids']['course']).count()
+
+    def setUp(self):
+        self.course_id = self.seed['ids']['course']
+        self.anonymous = APIClient()
+        self.student = APIClient()
+        self.student.force_authenticate(self.seed['users']['student'])
+        self.instructor = APIClient()
+        self.instructor.force_authenticate(self.seed['users']['instructor'])
+
+    @query_budget(QUERY_BUDGETS['CourseViewSet.list'])
+    def test_catalog(self):
+        self.assertEqual(self.anonymous.get('/api/courses/').status_code, 200)
+
+    @query_budget(QUERY_BUDGETS['CourseViewSet.retrieve'])
+    def test_detail(self):
+        self.assertEqual(self.student.get(f'/api/courses/{self.course_id}/').status_code, 200)
+
+    @query_budget(QUERY_BUDGETS['CourseViewSet.analytics'])
+    def test_analytics(self):
+        response = self.instructor.get(f'/api/courses/{self.course_id}/analytics/')
+        self.assertEqual(response.status_code, 200)
+
+    @query_budget(QUERY_BUDGETS['ReviewViewSet.list'])
+    def test_reviews(self):
+        response = self.student.get(f'/api/reviews/?course_id={self.course_id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), self.reviews)
+
+    @query_budget(QUERY_BUDGETS['LessonViewSet.list'])
+    def test_lessons(self):
+        response = self.anonymous.get(f'/api/lessons/?course_id={self.course_id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(json.loads(b''.join(response.streaming_content)))
+
+    @query_budget(QUERY_BUDGETS['CommentViewSet.list'])
+    def test_comments(self):
+        response = self.student.get(f'/api/comments/?discussion_id={self.seed["ids"]["discussion"]}')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(json.loads(b''.join(response.streaming_content)))
+
+    def test_streamed_queries_count_against_the_budget(self):
+        path = f'/api/lessons/?course_id={self.course_id}'
+        with self.assertLogs('config.timing', 'INFO') as logs:
+            response = self.anonymous.get(path)
+            # Logged once the stream ends
+            self.assertEqual(logs.output, [])
+            b''.join(response.streaming_content)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual((record['view'], record['queries']), ('LessonViewSet.list', 1))
+
+        with mock.patch.dict(QUERY_BUDGETS, {'LessonViewSet.list': 0}), \
+                self.assertLogs('config.timing', 'WARNING') as logs:
+            b''.join(self.anonymous.get(path).streaming_content)
+        self.assertEqual(json.loads(logs.records[0].getMessage())['query_budget'], 0)
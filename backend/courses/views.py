@@ -1,14 +1,23 @@
-from django.db.models import Count, Avg, Q
+from django.core.cache import cache
+from django.db.models import Count, Avg, Q, Prefetch
+from django.db.models.functions import TruncDate
 from django.utils import timezone
 from datetime import timedelta
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from .models import Course, Lesson, Category, Review, Discussion, Comment  # Add Discussion, Comment
+from config.replicas import ReplicaReadMixin
+from config.streaming import StreamingListMixin
+from config.throttling import UserRateThrottle, scoped
+from .models import Course, Lesson, Category, Review, Discussion, Comment, with_course_stats  # Add Discussion, Comment
+from . import exports, gradebook
+from .cache import course_version, learner_version
 from .serializers import (
     CourseListSerializer, 
     CourseDetailSerializer,
+    CourseHeaderSerializer,
     CourseCreateSerializer,
     LessonSerializer,
     CategorySerializer,
@@ -21,8 +30,18 @@ from .serializers import (
     CommentCreateSerializer
 )
 
+PLAYER_CACHE_TIMEOUT = 60 * 15  # 15 minutes
 
-class CourseViewSet(viewsets.ModelViewSet):
+
+class GradebookPagination(PageNumberPagination):
+    """Gradebook pages of students."""
+    
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class CourseViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """
     API endpoints for courses.
     
@@ -38,6 +57,20 @@ class CourseViewSet(viewsets.ModelViewSet):
     search_fields = ['title', 'description', 'instructor__email', 'instructor__first_name', 'instructor__last_name']  # Add this
     ordering_fields = ['created_at', 'title']  # Add this
     ordering = ['-created_at']  # Add this - default ordering
+    replica_actions = ('list', 'retrieve', 'lessons', 'analytics')
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('player', 'list', 'retrieve'):
+            queryset = queryset.select_related('instructor', 'category')
+        if self.action in ('list', 'retrieve'):
+            queryset = with_course_stats(queryset)
+        if self.action == 'retrieve':
+            queryset = queryset.prefetch_related(
+                Prefetch('lessons', queryset=Lesson.objects.select_related('quiz')),
+                Prefetch('reviews', queryset=Review.objects.select_related('student')),
+            )
+        return queryset
     
     def get_serializer_class(self):
         """Use different serializers for different actions."""
@@ -67,6 +100,162 @@ class CourseViewSet(viewsets.ModelViewSet):
         serializer = LessonSerializer(lessons, many=True)
         return Response(serializer.data)
     
+    @action(detail=True, methods=['get'])
+    def player(self, request, pk=None):
+        """
+        Everything the course player needs in one request.
+        
+        Returns the course header, lesson outline, the current student's
+        progress, quiz summaries and the lesson to resume from. Cached per
+        student until the course or the student's progress changes.
+        """
+        from enrollments.models import Enrollment, LessonProgress
+        from assessments.attempts import attempt_summaries
+        from assessments.serializers import QuizAttemptSummarySerializer
+        
+        course = self.get_object()
+        
+        cache_key = 'course-player:{}:{}:{}:{}'.format(
+            course.pk, request.user.pk,
+            course_version(course.pk), learner_version(course.pk, request.user.pk)
+        )
+        data = cache.get(cache_key)
+        if data is not None:
+            return Response(data)
+        
+        try:
+            enrollment = Enrollment.objects.get(student=request.user, course=course)
+        except Enrollment.DoesNotExist:
+            return Response(
+                {'error': 'You are not enrolled in this course'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        lessons = list(course.lessons.select_related('quiz'))
+        
+        progress = {
+            row['lesson_id']: {
+                'completed': row['completed'],
+                'completed_date': row['completed_date'],
+            }
+            for row in LessonProgress.objects.filter(enrollment=enrollment).values(
+                'lesson_id', 'completed', 'completed_date'
+            )
+        }
+        
+        attempt_stats = {
+            row['quiz']: row
+            for row in QuizAttemptSummarySerializer(
+                attempt_summaries(request.user, course_id=course.id), many=True
+            ).data
+        }
+        
+        # Resume at the first incomplete lesson, or the first lesson if all are done
+        resume_lesson_id = next(
+            (lesson.id for lesson in lessons if not progress.get(lesson.id, {}).get('completed')),
+            lessons[0].id if lessons else None
+        )
+        
+        quizzes = []
+        for lesson in lessons:
+            if not hasattr(lesson, 'quiz'):
+                continue
+            quiz = lesson.quiz
+            stats = attempt_stats.get(quiz.id, {})
+            quizzes.append({
+                'id': quiz.id,
+                'lesson': lesson.id,
+                'title': quiz.title,
+                'best_score': stats.get('best_score'),
+                'latest_score': stats.get('latest_score'),
+                'passed': stats.get('passed', False),
+                'attempts_used': stats.get('attempts_used', 0),
+                'attempts_left': stats.get('attempts_remaining', quiz.max_attempts),
+            })
+        
+        context = {'request': request}
+        data = {
+            'course': CourseHeaderSerializer(course, context=context).data,
+            'enrollment': {
+                'id': enrollment.id,
+                'progress_percentage': enrollment.progress_percentage,
+                'completed': enrollment.completed,
+                'enrolled_date': enrollment.enrolled_date,
+            },
+            'lessons': LessonSerializer(lessons, many=True, context=context).data,
+            'progress': progress,
+            'quizzes': quizzes,
+            'resume_lesson_id': resume_lesson_id,
+        }
+        cache.set(cache_key, data, PLAYER_CACHE_TIMEOUT)
+        return Response(data)
+    
+    @action(detail=True, methods=['get'])
+    def gradebook(self, request, pk=None):
+        """Best quiz scores and progress per student, paginated (instructors only)."""
+        course = self.get_object()
+        
+        if course.instructor != request.user:
+            return Response(
+                {'error': 'Only the course instructor can view the gradebook'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        quizzes = gradebook.course_quizzes(course)
+        paginator = GradebookPagination()
+        students = paginator.paginate_queryset(gradebook.enrolled_students(course), request, view=self)
+        return paginator.get_paginated_response({
+            'quizzes': quizzes,
+            'students': gradebook.gradebook_page(course, students, quizzes),
+        })
+    
+    @action(detail=True, methods=['get'])
+    def gradebook_export(self, request, pk=None):
+        """Download the full gradebook as CSV (instructors only)."""
+        course = self.get_object()
+        
+        if course.instructor != request.user:
+            return Response(
+                {'error': 'Only the course instructor can export the gradebook'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        return exports.streaming_export_response(
+            request,
+            gradebook.stream_gradebook_csv(course),
+            f'gradebook-course-{course.id}.csv',
+            'text/csv'
+        )
+    
+    @action(detail=True, methods=['get'], url_path=r'export/(?P<kind>[a-z_]+)')
+    def export(self, request, pk=None, kind=None):
+        """
+        Stream a course export (instructors only).
+        
+        kind: roster, lesson_completions, reviews or discussion_activity
+        ?output=csv (default) or ?output=ndjson
+        """
+        course = self.get_object()
+        
+        if course.instructor != request.user:
+            return Response(
+                {'error': 'Only the course instructor can export course data'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        output = request.query_params.get('output', 'csv')
+        if kind not in exports.EXPORTS or output not in exports.RENDERERS:
+            return Response(
+                {
+                    'error': 'Unknown export',
+                    'exports': list(exports.EXPORTS),
+                    'outputs': list(exports.RENDERERS),
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return exports.export_response(request, course, kind, output)
+    
     # Add this new action below lessons
     @action(detail=True, methods=['get'])
     def analytics(self, request, pk=None):
@@ -74,7 +263,7 @@ class CourseViewSet(viewsets.ModelViewSet):
         course = self.get_object()
         
         # Check if user is the instructor
-        if course.instructor != request.user:
+        if course.instructor_id != request.user.id:
             return Response(
                 {'error': 'Only the course instructor can view analytics'},
                 status=status.HTTP_403_FORBIDDEN
@@ -85,46 +274,60 @@ class CourseViewSet(viewsets.ModelViewSet):
         # Get all enrollments for this course
         enrollments = Enrollment.objects.filter(course=course)
         
-        # Basic stats
-        total_students = enrollments.count()
-        completed_students = enrollments.filter(completed=True).count()
+        # Basic stats and progress distribution, in one pass
+        stats = enrollments.aggregate(
+            total=Count('pk'),
+            completed=Count('pk', filter=Q(completed=True)),
+            avg_progress=Avg('progress_percentage'),
+            progress_0_25=Count('pk', filter=Q(progress_percentage__lt=25)),
+            progress_25_50=Count('pk', filter=Q(progress_percentage__gte=25, progress_percentage__lt=50)),
+            progress_50_75=Count('pk', filter=Q(progress_percentage__gte=50, progress_percentage__lt=75)),
+            progress_75_100=Count('pk', filter=Q(progress_percentage__gte=75)),
+        )
+        total_students = stats['total']
+        completed_students = stats['completed']
         completion_rate = (completed_students / total_students * 100) if total_students > 0 else 0
         
         # Average progress
-        avg_progress = enrollments.aggregate(Avg('progress_percentage'))['progress_percentage__avg'] or 0
+        avg_progress = stats['avg_progress'] or 0
         
-        # Enrollments over time (last 30 days)
+        # Enrollments over time (last 30 days), grouped by date
         thirty_days_ago = timezone.now() - timedelta(days=30)
-        recent_enrollments = enrollments.filter(enrolled_date__gte=thirty_days_ago)
+        daily_counts = dict(
+            enrollments.filter(enrolled_date__gte=thirty_days_ago)
+            .annotate(day=TruncDate('enrolled_date'))
+            .order_by()
+            .values_list('day')
+            .annotate(count=Count('pk'))
+        )
         
-        # Group by date
         enrollment_timeline = []
         for i in range(30):
             date = timezone.now() - timedelta(days=29-i)
-            count = recent_enrollments.filter(
-                enrolled_date__date=date.date()
-            ).count()
             enrollment_timeline.append({
                 'date': date.strftime('%Y-%m-%d'),
-                'count': count
+                'count': daily_counts.get(date.date(), 0)
             })
         
         # Reviews stats
-        reviews = course.reviews.all()
+        ratings = dict(
+            course.reviews.order_by().values_list('rating').annotate(count=Count('pk'))
+        )
         rating_distribution = {
-            '5': reviews.filter(rating=5).count(),
-            '4': reviews.filter(rating=4).count(),
-            '3': reviews.filter(rating=3).count(),
-            '2': reviews.filter(rating=2).count(),
-            '1': reviews.filter(rating=1).count(),
+            str(rating): ratings.get(rating, 0) for rating in (5, 4, 3, 2, 1)
         }
+        total_reviews = sum(ratings.values())
+        average_rating = (
+            round(sum(rating * count for rating, count in ratings.items()) / total_reviews, 1)
+            if total_reviews else 0
+        )
         
         # Progress distribution
         progress_ranges = {
-            '0-25%': enrollments.filter(progress_percentage__lt=25).count(),
-            '25-50%': enrollments.filter(progress_percentage__gte=25, progress_percentage__lt=50).count(),
-            '50-75%': enrollments.filter(progress_percentage__gte=50, progress_percentage__lt=75).count(),
-            '75-100%': enrollments.filter(progress_percentage__gte=75).count(),
+            '0-25%': stats['progress_0_25'],
+            '25-50%': stats['progress_25_50'],
+            '50-75%': stats['progress_50_75'],
+            '75-100%': stats['progress_75_100'],
         }
         
         return Response({
@@ -132,15 +335,15 @@ class CourseViewSet(viewsets.ModelViewSet):
             'completed_students': completed_students,
             'completion_rate': round(completion_rate, 1),
             'average_progress': round(avg_progress, 1),
-            'average_rating': course.average_rating(),
-            'total_reviews': reviews.count(),
+            'average_rating': average_rating,
+            'total_reviews': total_reviews,
             'enrollment_timeline': enrollment_timeline,
             'rating_distribution': rating_distribution,
             'progress_distribution': progress_ranges,
         })
 
 
-class LessonViewSet(viewsets.ReadOnlyModelViewSet):
+class LessonViewSet(StreamingListMixin, ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoints for lessons.
     
@@ -148,7 +351,7 @@ class LessonViewSet(viewsets.ReadOnlyModelViewSet):
     retrieve: Get single lesson details
     """
     
-    queryset = Lesson.objects.all()
+    queryset = Lesson.objects.select_related('quiz')
     serializer_class = LessonSerializer
     permission_classes = [AllowAny]
     
@@ -160,7 +363,7 @@ class LessonViewSet(viewsets.ReadOnlyModelViewSet):
             queryset = queryset.filter(course_id=course_id)
         return queryset
 
-class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+class CategoryViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoints for categories.
     
@@ -174,7 +377,7 @@ class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
     lookup_field = 'slug'  # Allow lookup by slug instead of ID
     
  
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """
     API endpoints for course reviews.
     
@@ -187,10 +390,12 @@ class ReviewViewSet(viewsets.ModelViewSet):
     
     serializer_class = ReviewSerializer
     permission_classes = [IsAuthenticated]
+    replica_actions = ('list',)
     
     def get_queryset(self):
         """Filter reviews by course if provided."""
-        queryset = Review.objects.all()
+        # The serializer shows each student's name and avatar
+        queryset = Review.objects.select_related('student')
         course_id = self.request.query_params.get('course_id')
         if course_id:
             queryset = queryset.filter(course_id=course_id)
@@ -316,7 +521,7 @@ class DiscussionViewSet(viewsets.ModelViewSet):
             )
         return super().destroy(request, *args, **kwargs)
     
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'], throttle_classes=[scoped(UserRateThrottle, 'upvote')])
     def upvote(self, request, pk=None):
         """Upvote a discussion."""
         discussion = self.get_object()
@@ -342,7 +547,7 @@ class DiscussionViewSet(viewsets.ModelViewSet):
         return Response({'message': 'Discussion marked as resolved'})
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(StreamingListMixin, viewsets.ModelViewSet):
     """
     API endpoints for comments.
     
@@ -356,6 +561,8 @@ class CommentViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         queryset = Comment.objects.all()
+        if self.action == 'list':
+            queryset = queryset.select_related('user').annotate(reply_total=Count('replies'))
         discussion_id = self.request.query_params.get('discussion_id')
         if discussion_id:
             queryset = queryset.filter(discussion_id=discussion_id)
@@ -386,7 +593,7 @@ class CommentViewSet(viewsets.ModelViewSet):
             )
         return super().destroy(request, *args, **kwargs)
     
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'], throttle_classes=[scoped(UserRateThrottle, 'upvote')])
     def upvote(self, request, pk=None):
         """Upvote a comment."""
         comment = self.get_object()
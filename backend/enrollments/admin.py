@@ -1,5 +1,7 @@
 from django.contrib import admin
+from courses.cache import bump_learner_version
 from .models import Enrollment, LessonProgress
+from .signals import progress_learner
 
 
 class LessonProgressInline(admin.TabularInline):
@@ -37,6 +39,18 @@ class LessonProgressAdmin(admin.ModelAdmin):
     list_display = ['enrollment', 'lesson', 'completed', 'completed_date']
     list_filter = ['completed', 'lesson__course']
     search_fields = ['enrollment__student__email', 'lesson__title']
+    
+    # Progress has no post_delete signal (see enrollments.signals)
+    def delete_model(self, request, obj):
+        learner = progress_learner(obj)
+        super().delete_model(request, obj)
+        bump_learner_version(*learner)
+    
+    def delete_queryset(self, request, queryset):
+        learners = set(queryset.values_list('enrollment__course_id', 'enrollment__student_id'))
+        super().delete_queryset(request, queryset)
+        for learner in learners:
+            bump_learner_version(*learner)
 
 
 admin.site.register(Enrollment, EnrollmentAdmin)
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.9 on 2026-10-19 00:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0006_comment_comment_discussion_parent_idx_and_more'),
+        ('enrollments', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['course', 'enrolled_date'], name='enrollment_course_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['course', 'progress_percentage'], name='enrollment_course_progress_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lessonprogress',
+            index=models.Index(fields=['enrollment', 'completed'], name='lessonprogress_completed_idx'),
+        ),
+    ]
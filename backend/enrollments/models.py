@@ -35,6 +35,10 @@ class Enrollment(models.Model):
         ordering = ['-enrolled_date']
         verbose_name = 'Enrollment'
         verbose_name_plural = 'Enrollments'
+        indexes = [
+            models.Index(fields=['course', 'enrolled_date'], name='enrollment_course_date_idx'),
+            models.Index(fields=['course', 'progress_percentage'], name='enrollment_course_progress_idx'),
+        ]
     
     def update_progress(self):
         """Calculate and update progress percentage."""
@@ -82,4 +86,7 @@ class LessonProgress(models.Model):
         unique_together = ['enrollment', 'lesson']
         ordering = ['lesson__order']
         verbose_name = 'Lesson Progress'
-        verbose_name_plural = 'Lesson Progress'
\ No newline at end of file
+        verbose_name_plural = 'Lesson Progress'
+        indexes = [
+            models.Index(fields=['enrollment', 'completed'], name='lessonprogress_completed_idx'),
+        ]
\ No newline at end of file
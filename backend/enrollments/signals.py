@@ -0,0 +1,31 @@
+"""
+Signal handlers that keep cached learner data fresh.
+
+Lesson progress has no post_delete handler: a receiver would stop Django
+from fast-deleting progress rows when a course or enrollment is deleted,
+and those deletions bump the course or learner version themselves.
+LessonProgressAdmin bumps for rows deleted on their own.
+"""
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from courses.cache import bump_learner_version
+from .models import Enrollment, LessonProgress
+
+
+def progress_learner(progress):
+    """(course_id, student_id) of a progress row; no query if its enrollment is loaded."""
+    if LessonProgress.enrollment.is_cached(progress):
+        return progress.enrollment.course_id, progress.enrollment.student_id
+    return Enrollment.objects.values_list('course_id', 'student_id').get(pk=progress.enrollment_id)
+
+
+@receiver([post_save, post_delete], sender=Enrollment)
+def enrollment_changed(sender, instance, **kwargs):
+    bump_learner_version(instance.course_id, instance.student_id)
+
+
+@receiver(post_save, sender=LessonProgress)
+def lesson_progress_changed(sender, instance, **kwargs):
+    bump_learner_version(*progress_learner(instance))
@@ -1,3 +1,39 @@
 from django.test import TestCase
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from config.query_budget import QUERY_BUDGETS, query_budget
+from config.query_plans import QueryPlanAssertions, seed_dataset
+
+
+class QueryPlanTests(QueryPlanAssertions, TestCase):
+    """Hot enrollment endpoints don't scan tables that grow with students."""
+
+    ENDPOINTS = [
+        ('enrollments', 'student', '/api/enrollments/'),
+        ('lesson progress', 'student', '/api/progress/'),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seed = seed_dataset()
+
+    def test_hot_endpoints_use_indexes(self):
+        self.assertNoFullScans(self.seed, self.ENDPOINTS)
+
+
+class QueryBudgetTests(TestCase):
+    """Hot enrollment endpoints stay within their QUERY_BUDGETS."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seed = seed_dataset()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.seed['users']['student'])
+
+    @query_budget(QUERY_BUDGETS['EnrollmentViewSet.list'])
+    def test_enrollments(self):
+        response = self.client.get('/api/enrollments/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
@@ -2,7 +2,10 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.db.models import Prefetch
 from django.utils import timezone
+from config.streaming import StreamingListMixin
+from courses.models import Course, with_course_stats
 from .models import Enrollment, LessonProgress
 from .serializers import (
     EnrollmentSerializer,
@@ -25,7 +28,16 @@ class EnrollmentViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Only show current user's enrollments."""
-        return Enrollment.objects.filter(student=self.request.user)
+        queryset = Enrollment.objects.filter(student=self.request.user)
+        if self.action in ('list', 'retrieve'):
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    'course',
+                    queryset=with_course_stats(Course.objects.select_related('instructor', 'category'))
+                ),
+                Prefetch('lesson_progress', queryset=LessonProgress.objects.select_related('lesson__quiz')),
+            )
+        return queryset
     
     def get_serializer_class(self):
         """Use create serializer for POST requests."""
@@ -67,7 +79,7 @@ class EnrollmentViewSet(viewsets.ModelViewSet):
             )
         
         try:
-            lesson_progress = LessonProgress.objects.get(
+            lesson_progress = LessonProgress.objects.select_related('enrollment').get(
                 enrollment=enrollment,
                 lesson_id=lesson_id
             )
@@ -91,7 +103,7 @@ class EnrollmentViewSet(viewsets.ModelViewSet):
             )
 
 
-class LessonProgressViewSet(viewsets.ReadOnlyModelViewSet):
+class LessonProgressViewSet(StreamingListMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoints for lesson progress.
     
@@ -105,4 +117,4 @@ class LessonProgressViewSet(viewsets.ReadOnlyModelViewSet):
         """Only show current user's lesson progress."""
         return LessonProgress.objects.filter(
             enrollment__student=self.request.user
-        )
\ No newline at end of file
+        ).select_related('lesson__quiz')
\ No newline at end of file
@@ -0,0 +1,127 @@
+"""
+Write-behind tracking of user activity.
+
+Logins and authenticated requests only note the time in a per-process
+buffer. A background thread flushes the buffer every ACTIVITY_FLUSH_INTERVAL
+seconds, writing each user's latest last_login/last_seen once, in a few bulk
+UPDATEs. Requests never wait on a write to the user row; timestamps lag by
+at most one flush interval. The thread and a final flush at exit only start
+once something is recorded, and not at all with ACTIVITY_FLUSH_INTERVAL = 0
+(as under the test runner); flush() then has to be called directly.
+
+Buffers from several processes may flush out of order, so an update never
+moves a timestamp backwards.
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, DateTimeField, F, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_INTERVAL = 30  # seconds
+
+# Users written per UPDATE statement
+FLUSH_BATCH_SIZE = 500
+
+
+class ActivityBuffer:
+    """Coalesces activity timestamps per user until flushed."""
+
+    FIELDS = ('last_login', 'last_seen')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {field: {} for field in self.FIELDS}
+        self._flusher_pid = None
+        self._flush_at_exit_registered = False
+
+    def record(self, field, user_id, when=None):
+        when = when or timezone.now()
+        with self._lock:
+            pending = self._pending[field]
+            if user_id not in pending or pending[user_id] < when:
+                pending[user_id] = when
+        self._ensure_flusher()
+
+    def flush(self):
+        """Write buffered timestamps to the database; returns rows written."""
+        with self._lock:
+            pending, self._pending = self._pending, {field: {} for field in self.FIELDS}
+
+        written = 0
+        for field, timestamps in pending.items():
+            user_ids = list(timestamps)
+            for start in range(0, len(user_ids), FLUSH_BATCH_SIZE):
+                batch = user_ids[start:start + FLUSH_BATCH_SIZE]
+                latest = Case(
+                    *[When(pk=user_id, then=Value(timestamps[user_id])) for user_id in batch],
+                    output_field=DateTimeField()
+                )
+                # update() skips save signals, so token versions are untouched
+                written += User.objects.filter(pk__in=batch).update(
+                    **{field: Greatest(Coalesce(F(field), latest), latest)}
+                )
+        return written
+
+    def _ensure_flusher(self):
+        # A forked worker inherits the buffer but not the thread
+        if self._flusher_pid == os.getpid():
+            return
+        interval = getattr(settings, 'ACTIVITY_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+        if not interval:
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+            # Forked workers inherit the registration
+            register = not self._flush_at_exit_registered
+            self._flush_at_exit_registered = True
+        if register:
+            atexit.register(self._flush_at_exit)
+        threading.Thread(target=self._run, args=(interval,), daemon=True).start()
+
+    def _run(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Failed to flush user activity')
+            finally:
+                connection.close()
+
+    def _flush_at_exit(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Failed to flush user activity at exit')
+
+
+activity = ActivityBuffer()
+
+
+def record_login(user_id, when=None):
+    when = when or timezone.now()
+    activity.record('last_login', user_id, when)
+    activity.record('last_seen', user_id, when)
+
+
+def record_seen(user_id, when=None):
+    activity.record('last_seen', user_id, when)
+
+
+def flush_activity():
+    return activity.flush()
+
@@ -25,7 +25,7 @@ class UserAdmin(BaseUserAdmin):
         ('Personal Info', {'fields': ('first_name', 'last_name', 'bio', 'avatar')}),
         ('Role & Permissions', {'fields': ('role', 'is_active', 'is_staff', 'is_superuser')}),
         ('Google OAuth', {'fields': ('google_id', 'is_google_user')}),
-        ('Important dates', {'fields': ('last_login', 'created_at', 'updated_at')}),
+        ('Important dates', {'fields': ('last_login', 'last_seen', 'created_at', 'updated_at')}),
     )
     
     add_fieldsets = (
@@ -35,4 +35,4 @@ class UserAdmin(BaseUserAdmin):
         }),
     )
     
-    readonly_fields = ['created_at', 'updated_at', 'last_login']
+    readonly_fields = ['created_at', 'updated_at', 'last_login', 'last_seen']
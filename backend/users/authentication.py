@@ -0,0 +1,111 @@
+"""
+JWT authentication that trusts signed token claims on read requests.
+
+Access tokens carry the user's email, role and staff flag. Safe (read-only)
+requests get a ClaimsUser built from those claims, so authenticating costs
+no database query; any other field is loaded lazily if a view reads it.
+
+Claims go stale when the user's email, role, staff or active flag change.
+Each token carries the user's token_version, and a token whose version
+doesn't match the current one falls back to loading the user row.
+
+Current versions are cached only in a cache every process shares: a bump
+clears the cached version for all workers at once. With a per-process
+cache (LocMem, or none) the version is read from the database on every
+request, since another worker's copy could still let a stale token through.
+"""
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from config.replicas import pin_to_primary
+from .activity import record_seen
+from .models import User, ClaimsUser
+from .revocation import is_token_revoked
+
+CLAIM_FIELDS = ('email', 'role', 'is_staff')
+VERSION_CLAIM = 'ver'
+
+# Fields whose change must invalidate claims already handed out
+TOKEN_FIELDS = CLAIM_FIELDS + ('is_active',)
+
+TOKEN_VERSION_TIMEOUT = 60 * 60 * 24  # 1 day
+
+
+def _token_version_key(user_id):
+    return f'token-version:{user_id}'
+
+
+def cache_is_shared():
+    """Whether all processes see the same default cache."""
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+
+def get_token_version(user_id):
+    """Current token version of a user, from the shared cache when possible."""
+    shared = cache_is_shared()
+    key = _token_version_key(user_id)
+    version = cache.get(key) if shared else None
+    if version is None:
+        version = User.objects.filter(pk=user_id).values_list('token_version', flat=True).first()
+        if version is not None and shared:
+            cache.set(key, version, TOKEN_VERSION_TIMEOUT)
+    return version
+
+
+def forget_token_version(user_id):
+    cache.delete(_token_version_key(user_id))
+
+
+def add_user_claims(token, user):
+    """Embed the claims ClaimsJWTAuthentication reads into a token."""
+    for field in CLAIM_FIELDS:
+        token[field] = getattr(user, field)
+    token[VERSION_CLAIM] = user.token_version
+    return token
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that skips the user query on read requests and
+    rejects revoked tokens.
+    """
+
+    def authenticate(self, request):
+        self.use_claims = request.method in SAFE_METHODS
+        result = super().authenticate(request)
+        if result is not None:
+            record_seen(result[0].pk)
+            if not self.use_claims:
+                # About to write: read it back from the primary for a while
+                pin_to_primary(result[0].pk)
+        return result
+
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        if is_token_revoked(validated_token):
+            raise InvalidToken({'detail': 'Token has been revoked', 'code': 'token_not_valid'})
+        return validated_token
+
+    def get_user(self, validated_token):
+        if not self.use_claims or not all(
+            claim in validated_token for claim in CLAIM_FIELDS + (VERSION_CLAIM,)
+        ):
+            return super().get_user(validated_token)
+
+        user_id = validated_token[api_settings.USER_ID_CLAIM]
+        if validated_token[VERSION_CLAIM] != get_token_version(user_id):
+            # Claims are stale (or the user is gone): let the database decide
+            return super().get_user(validated_token)
+
+        # Claims are only current for active users: deactivating bumps the version
+        claims = {field: validated_token[field] for field in CLAIM_FIELDS}
+        claims.update(id=user_id, is_active=True)
+        # from_db() expects values in model field order
+        fields = [f.attname for f in ClaimsUser._meta.concrete_fields if f.attname in claims]
+        return ClaimsUser.from_db(User.objects.db, fields, [claims[name] for name in fields])
@@ -0,0 +1,155 @@
+"""
+Google ID token verification with cached signing certificates.
+
+google.oauth2.id_token.verify_oauth2_token downloads Google's certificates
+on every call. GoogleTokenVerifier keeps them in-process and in the shared
+cache for as long as Google's Cache-Control max-age allows, refreshes them
+in a background thread shortly before they expire, and checks signatures
+locally. A token signed with a key id we haven't seen forces one refresh,
+so key rotations are picked up immediately.
+
+google.auth is only imported on first use, keeping it off the startup path.
+"""
+
+import base64
+import json
+import re
+import threading
+import time
+import urllib.request
+
+from django.conf import settings
+from django.core.cache import cache
+
+GOOGLE_CERTS_URL = 'https://www.googleapis.com/oauth2/v1/certs'
+GOOGLE_ISSUERS = ('accounts.google.com', 'https://accounts.google.com')
+
+# Used when the certificate response has no usable max-age
+DEFAULT_CERTS_MAX_AGE = 60 * 60  # 1 hour
+
+# Start a background refresh when the certificates expire within this window
+CERTS_REFRESH_WINDOW = 5 * 60  # 5 minutes
+
+CERTS_FETCH_TIMEOUT = 5  # seconds
+
+# Unknown key ids trigger a refetch at most this often, so forged tokens
+# can't make us hammer Google
+MIN_REFETCH_INTERVAL = 60  # seconds
+
+MAX_AGE_RE = re.compile(r'max-age=(\d+)')
+
+
+def _max_age(cache_control):
+    match = MAX_AGE_RE.search(cache_control or '')
+    return int(match.group(1)) if match else DEFAULT_CERTS_MAX_AGE
+
+
+def _key_id(token):
+    """The kid from a JWT header, without verifying anything."""
+    if isinstance(token, bytes):
+        token = token.decode('utf-8', 'replace')
+    try:
+        header = token.split('.', 1)[0]
+        header += '=' * (-len(header) % 4)
+        return json.loads(base64.urlsafe_b64decode(header)).get('kid')
+    except (ValueError, AttributeError):
+        return None
+
+
+class GoogleTokenVerifier:
+    """Verifies Google ID tokens against cached certificates."""
+
+    def __init__(self, certs_url=GOOGLE_CERTS_URL, cache_key='google-oauth-certs'):
+        self.certs_url = certs_url
+        self.cache_key = cache_key
+        self._certs = None
+        self._expires_at = 0
+        self._fetched_at = 0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def fetch_certs(self):
+        """Download the certificates and store them everywhere."""
+        with urllib.request.urlopen(self.certs_url, timeout=CERTS_FETCH_TIMEOUT) as response:
+            certs = json.loads(response.read())
+            max_age = _max_age(response.headers.get('Cache-Control'))
+
+        now = time.time()
+        expires_at = now + max_age
+        cache.set(self.cache_key, (certs, expires_at), max_age)
+        with self._lock:
+            self._certs, self._expires_at, self._fetched_at = certs, expires_at, now
+        return certs
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def refresh():
+            try:
+                self.fetch_certs()
+            except Exception:
+                # Keep serving the current certificates; the next call retries
+                pass
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def get_certs(self):
+        """Current certificates: in-process, then shared cache, then Google."""
+        now = time.time()
+        if self._certs is None or now >= self._expires_at:
+            cached = cache.get(self.cache_key)
+            if cached is not None and cached[1] > now:
+                with self._lock:
+                    self._certs, self._expires_at = cached
+            else:
+                return self.fetch_certs()
+
+        if now >= self._expires_at - CERTS_REFRESH_WINDOW:
+            self._refresh_in_background()
+        return self._certs
+
+    def verify(self, token, audience, clock_skew_in_seconds=0):
+        """
+        Verify a Google ID token and return its claims.
+
+        Raises ValueError when the token is invalid, like verify_oauth2_token.
+        """
+        from google.auth import jwt
+
+        certs = self.get_certs()
+        key_id = _key_id(token)
+        if key_id and key_id not in certs and time.time() - self._fetched_at >= MIN_REFETCH_INTERVAL:
+            # Google may have rotated its keys since we last fetched them
+            certs = self.fetch_certs()
+
+        idinfo = jwt.decode(
+            token,
+            certs=certs,
+            audience=audience,
+            clock_skew_in_seconds=clock_skew_in_seconds
+        )
+        if idinfo.get('iss') not in GOOGLE_ISSUERS:
+            raise ValueError(f"Wrong issuer. 'iss' should be one of the following: {GOOGLE_ISSUERS}")
+        return idinfo
+
+
+_verifier = None
+
+
+def get_verifier():
+    """The process-wide verifier for settings.GOOGLE_CERTS_URL."""
+    global _verifier
+    certs_url = getattr(settings, 'GOOGLE_CERTS_URL', GOOGLE_CERTS_URL)
+    if _verifier is None or _verifier.certs_url != certs_url:
+        _verifier = GoogleTokenVerifier(certs_url)
+    return _verifier
+
+
+def verify_google_token(token, audience=None):
+    """Verify a Google ID token for this app's client id."""
+    return get_verifier().verify(token, audience or settings.GOOGLE_CLIENT_ID)
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from users.revocation import compact_revoked_tokens
+
+
+class Command(BaseCommand):
+    help = 'Delete revoked token entries whose tokens have expired'
+
+    def handle(self, *args, **options):
+        deleted = compact_revoked_tokens()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired revocation(s)'))
@@ -65,6 +65,11 @@ class User(AbstractUser):
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Written in batches by users.activity, may lag by a flush interval
+    last_seen = models.DateTimeField(blank=True, null=True)
+    
+    # Bumped when a field embedded in access tokens changes (see authentication.py)
+    token_version = models.PositiveIntegerField(default=0, editable=False)
     
     objects = UserManager()
 
@@ -83,4 +88,49 @@ class User(AbstractUser):
     
     @property
     def full_name(self):
-        return f"{self.first_name} {self.last_name}".strip() or self.email
\ No newline at end of file
+        return f"{self.first_name} {self.last_name}".strip() or self.email
+
+
+class ClaimsUser(User):
+    """
+    A user built from access token claims without touching the database.
+    
+    Only the claim fields are loaded; the rest of the row is deferred and
+    fetched in a single query the first time any of it is read.
+    """
+    
+    class Meta:
+        proxy = True
+    
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred and set(fields) <= deferred:
+            fields = deferred
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+
+
+class RevokedToken(models.Model):
+    """
+    A JWT that must no longer be accepted, by its jti claim.
+    
+    Rows are only needed until the token would have expired anyway;
+    compact_revoked_tokens deletes them after that.
+    """
+    
+    jti = models.CharField(max_length=255, unique=True)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='revoked_tokens',
+        null=True,
+        blank=True
+    )
+    token_type = models.CharField(max_length=20, blank=True)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        ordering = ['-revoked_at']
+    
+    def __str__(self):
+        return f"{self.token_type} token {self.jti}"
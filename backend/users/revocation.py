@@ -0,0 +1,170 @@
+"""
+Revocation of JWTs by jti.
+
+Revoked tokens are stored in RevokedToken until they would have expired.
+Every authenticated request has to ask "is this token revoked?", and the
+answer is almost always no, so each process keeps a Bloom filter of the
+revoked jtis: a jti that isn't in the filter is certainly not revoked and
+costs no I/O. Only filter hits (revoked tokens and rare false positives)
+are checked against the database.
+
+The filter picks up tokens revoked by other processes every SYNC_INTERVAL
+seconds with one indexed query, and is rebuilt from the live rows every
+REBUILD_INTERVAL so that expired entries drop out of it. Tokens revoked in
+this process are in its filter immediately; other processes keep accepting
+them for up to SYNC_INTERVAL seconds.
+
+Revoking is a conditional insert on the unique jti, and revoke() reports
+whether this call was the one that inserted it. Refresh token rotation uses
+that to claim the used token, so of two concurrent refreshes with the same
+token only one gets new tokens.
+"""
+
+import hashlib
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from .models import RevokedToken
+
+SYNC_INTERVAL = 5  # seconds
+REBUILD_INTERVAL = 15 * 60  # seconds
+
+# Incremental syncs look back this far, to catch rows committed late
+SYNC_OVERLAP = timedelta(seconds=60)
+
+BLOOM_ERROR_RATE = 0.001
+BLOOM_MIN_CAPACITY = 10000
+
+
+class BloomFilter:
+    """A fixed-size Bloom filter of strings."""
+
+    def __init__(self, capacity, error_rate=BLOOM_ERROR_RATE):
+        self.capacity = max(capacity, 1)
+        self.size = math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(round(self.size / self.capacity * math.log(2)), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationList:
+    """The per-process view of revoked tokens."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bloom = None
+        self._built_at = 0
+        self._synced_at = 0
+        self._sync_from = None
+
+    def is_revoked(self, jti):
+        self._refresh()
+        if jti not in self._bloom:
+            return False
+        return RevokedToken.objects.filter(jti=jti, expires_at__gt=timezone.now()).exists()
+
+    def revoke(self, jti, expires_at, user_id=None, token_type=''):
+        """Revoke a jti; returns False if it was already revoked."""
+        _, created = RevokedToken.objects.get_or_create(
+            jti=jti,
+            defaults={'expires_at': expires_at, 'user_id': user_id, 'token_type': token_type}
+        )
+        self._refresh()
+        with self._lock:
+            self._bloom.add(jti)
+        return created
+
+    def reset(self):
+        """Forget the filter; the next check rebuilds it."""
+        with self._lock:
+            self._bloom = None
+
+    def _refresh(self):
+        now = time.monotonic()
+        bloom = self._bloom
+        if bloom is not None and now - self._synced_at < SYNC_INTERVAL:
+            return
+
+        # Without a filter everybody waits for one; otherwise a single thread
+        # refreshes while the others keep using the current filter
+        if not self._lock.acquire(blocking=bloom is None):
+            return
+        try:
+            if self._bloom is None or now - self._built_at >= REBUILD_INTERVAL \
+                    or self._bloom.count > self._bloom.capacity:
+                self._rebuild()
+            elif now - self._synced_at >= SYNC_INTERVAL:
+                self._sync()
+        finally:
+            self._lock.release()
+
+    def _rebuild(self):
+        started = timezone.now()
+        live = RevokedToken.objects.filter(expires_at__gt=started)
+        bloom = BloomFilter(max(live.count() * 2, BLOOM_MIN_CAPACITY))
+        for jti in live.values_list('jti', flat=True).iterator():
+            bloom.add(jti)
+
+        self._bloom = bloom
+        self._built_at = self._synced_at = time.monotonic()
+        self._sync_from = started - SYNC_OVERLAP
+
+    def _sync(self):
+        started = timezone.now()
+        for jti in RevokedToken.objects.filter(
+            revoked_at__gte=self._sync_from,
+            expires_at__gt=started
+        ).values_list('jti', flat=True):
+            if jti not in self._bloom:
+                self._bloom.add(jti)
+
+        self._synced_at = time.monotonic()
+        self._sync_from = started - SYNC_OVERLAP
+
+
+revocation_list = RevocationList()
+
+
+def is_token_revoked(token):
+    return revocation_list.is_revoked(token[api_settings.JTI_CLAIM])
+
+
+def revoke_token(token):
+    """
+    Revoke a simplejwt token (access or refresh) until it expires; returns
+    False if it was already revoked.
+    """
+    return revocation_list.revoke(
+        token[api_settings.JTI_CLAIM],
+        datetime_from_epoch(token['exp']),
+        user_id=token.get(api_settings.USER_ID_CLAIM),
+        token_type=token.get(api_settings.TOKEN_TYPE_CLAIM, '')
+    )
+
+
+def compact_revoked_tokens(now=None):
+    """Delete revocations of tokens that have expired; returns rows deleted."""
+    deleted, _ = RevokedToken.objects.filter(expires_at__lte=now or timezone.now()).delete()
+    return deleted
@@ -5,6 +5,10 @@ Serializers for User authentication and profile management
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer as BaseTokenRefreshSerializer
+
+from .revocation import is_token_revoked, revoke_token
 
 User = get_user_model()
 
@@ -112,4 +116,31 @@ class ChangePasswordSerializer(serializers.Serializer):
         user = self.context['request'].user
         if not user.check_password(value):
             raise serializers.ValidationError("Old password is incorrect.")
-        return value
\ No newline at end of file
+        return value
+
+
+class TokenRefreshSerializer(BaseTokenRefreshSerializer):
+    """
+    Refresh serializer that rejects revoked refresh tokens and, when
+    ROTATE_REFRESH_TOKENS is on, revokes each refresh token once it is used.
+    
+    Revoking claims the token: of concurrent refreshes with the same token,
+    including ones in other processes whose revocation lists haven't synced
+    yet, only the one that inserts the revocation gets new tokens.
+    """
+    
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if is_token_revoked(refresh):
+            raise InvalidToken('Token has been revoked')
+        
+        data = super().validate(attrs)
+        if 'refresh' in data and not revoke_token(refresh):
+            raise InvalidToken('Token has been revoked')
+        return data
+
+
+class LogoutSerializer(serializers.Serializer):
+    """Serializer for logout; the refresh token is revoked when given"""
+    
+    refresh = serializers.CharField(required=False)
@@ -0,0 +1,35 @@
+"""
+Signal handlers that keep token claims honest.
+"""
+
+from django.db.models import F
+from django.db.models.signals import pre_save, post_save
+from django.dispatch import receiver
+
+from .authentication import TOKEN_FIELDS, forget_token_version
+from .models import User, ClaimsUser
+
+
+@receiver(pre_save, sender=User)
+@receiver(pre_save, sender=ClaimsUser)
+def check_token_fields(sender, instance, update_fields=None, **kwargs):
+    """Note whether a save changes anything embedded in access tokens."""
+    instance._token_fields_changed = False
+    if instance._state.adding:
+        return
+    if update_fields is not None and not set(update_fields) & set(TOKEN_FIELDS):
+        return
+    loaded = [field for field in TOKEN_FIELDS if field not in instance.get_deferred_fields()]
+    previous = User.objects.filter(pk=instance.pk).values(*loaded).first()
+    instance._token_fields_changed = previous is not None and any(
+        previous[field] != getattr(instance, field) for field in loaded
+    )
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=ClaimsUser)
+def bump_token_version(sender, instance, created, **kwargs):
+    if getattr(instance, '_token_fields_changed', False):
+        User.objects.filter(pk=instance.pk).update(token_version=F('token_version') + 1)
+        instance.token_version += 1
+        forget_token_version(instance.pk)
@@ -1,3 +1,420 @@
-from django.test import TestCase
+import json
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db.models import F
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import activity as activity_module
+from .activity import ActivityBuffer, flush_activity
+from .authentication import (
+    ClaimsJWTAuthentication, _token_version_key, add_user_claims, get_token_version
+)
+from .google_auth import CERTS_REFRESH_WINDOW, MIN_REFETCH_INTERVAL, GoogleTokenVerifier
+from .models import ClaimsUser, RevokedToken, User
+from .revocation import (
+    REBUILD_INTERVAL, SYNC_INTERVAL, BloomFilter, RevocationList, compact_revoked_tokens,
+    revocation_list
+)
+
+
+@contextmanager
+def shared_cache():
+    """A FileBasedCache, which every process shares, as the default cache."""
+    with tempfile.TemporaryDirectory() as location, override_settings(CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': location,
+        }
+    }):
+        yield
+
+
+class TokenVersionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='versions@example.com', password='unused')
+
+    def test_per_process_cache_is_not_trusted(self):
+        # What another worker's own cache could still hold after a bump
+        cache.set(_token_version_key(self.user.pk), self.user.token_version)
+        User.objects.filter(pk=self.user.pk).update(token_version=F('token_version') + 1)
+
+        self.assertEqual(get_token_version(self.user.pk), self.user.token_version + 1)
+
+    def test_shared_cache_serves_versions_until_bumped(self):
+        with shared_cache():
+            self.assertEqual(get_token_version(self.user.pk), 0)
+            with self.assertNumQueries(0):
+                self.assertEqual(get_token_version(self.user.pk), 0)
+
+            self.user.role = 'instructor'
+            self.user.save()
+            self.assertEqual(get_token_version(self.user.pk), 1)
+
+    def test_read_request_needs_no_query(self):
+        access = add_user_claims(RefreshToken.for_user(self.user), self.user).access_token
+        request = RequestFactory().get('/api/courses/', HTTP_AUTHORIZATION=f'Bearer {access}')
+        authentication = ClaimsJWTAuthentication()
+
+        with shared_cache():
+            # Caches the token version and builds the revocation list
+            authentication.authenticate(request)
+            with self.assertNumQueries(0):
+                user, token = authentication.authenticate(request)
+
+        self.assertIsInstance(user, ClaimsUser)
+        self.assertEqual((user.pk, user.email, user.role), (self.user.pk, self.user.email, self.user.role))
+
+
+class BloomFilterTests(SimpleTestCase):
+    def test_no_false_negatives_and_few_false_positives(self):
+        bloom = BloomFilter(1000)
+        for i in range(1000):
+            bloom.add(f'jti-{i}')
+
+        self.assertTrue(all(f'jti-{i}' in bloom for i in range(1000)))
+        # The error rate is 0.1%: about 10 of these
+        self.assertLess(sum(f'other-{i}' in bloom for i in range(10000)), 30)
+
+
+class RevocationListTests(TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        clock = mock.patch('users.revocation.time.monotonic', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+        self.revocations = RevocationList()
+
+    def revoke_elsewhere(self, jti, expires_in=timedelta(hours=1)):
+        """A revocation written by another process."""
+        RevokedToken.objects.create(jti=jti, expires_at=timezone.now() + expires_in)
+
+    def test_unrevoked_tokens_cost_no_query(self):
+        self.assertFalse(self.revocations.is_revoked('first'))
+        with self.assertNumQueries(0):
+            self.assertFalse(self.revocations.is_revoked('unknown'))
+
+    def test_own_revocations_apply_at_once(self):
+        self.assertTrue(self.revocations.revoke('mine', timezone.now() + timedelta(hours=1)))
+        self.assertTrue(self.revocations.is_revoked('mine'))
+        self.assertFalse(self.revocations.revoke('mine', timezone.now() + timedelta(hours=1)))
+
+    def test_other_processes_revocations_arrive_within_sync_interval(self):
+        self.assertFalse(self.revocations.is_revoked('theirs'))
+        self.revoke_elsewhere('theirs')
+
+        self.now += SYNC_INTERVAL - 1
+        with self.assertNumQueries(0):
+            self.assertFalse(self.revocations.is_revoked('theirs'))
+        self.now += 1
+        self.assertTrue(self.revocations.is_revoked('theirs'))
+
+    def test_rebuild_drops_expired_revocations(self):
+        self.revocations.revoke('expiring', timezone.now() + timedelta(hours=1))
+        RevokedToken.objects.filter(jti='expiring').update(expires_at=timezone.now())
+
+        # Syncs only add to the filter
+        self.now += SYNC_INTERVAL
+        self.assertFalse(self.revocations.is_revoked('expiring'))
+        self.assertIn('expiring', self.revocations._bloom)
+
+        self.now += REBUILD_INTERVAL
+        self.assertFalse(self.revocations.is_revoked('expiring'))
+        self.assertNotIn('expiring', self.revocations._bloom)
+
+    def test_compaction_deletes_only_expired_revocations(self):
+        self.revoke_elsewhere('expired', expires_in=-timedelta(seconds=1))
+        self.revoke_elsewhere('live')
+
+        self.assertEqual(compact_revoked_tokens(), 1)
+        self.assertQuerySetEqual(RevokedToken.objects.values_list('jti', flat=True), ['live'])
+
+
+class TokenRefreshTests(TestCase):
+    def setUp(self):
+        revocation_list.reset()
+        self.addCleanup(revocation_list.reset)
+        self.refresh_token = str(RefreshToken.for_user(
+            User.objects.create_user(email='refresh@example.com', password='unused')
+        ))
+        self.client = APIClient()
+
+    def refresh(self, token):
+        return self.client.post('/api/auth/token/refresh/', {'refresh': token}, format='json')
+
+    def test_refresh_rotates_the_token(self):
+        response = self.refresh(self.refresh_token)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.data['refresh'], self.refresh_token)
+
+        self.assertEqual(self.refresh(self.refresh_token).status_code, 401)
+        self.assertEqual(self.refresh(response.data['refresh']).status_code, 200)
+
+    def test_only_one_concurrent_refresh_succeeds(self):
+        # Both requests got past the revocation list, e.g. in two processes
+        # within SYNC_INTERVAL of each other
+        with mock.patch('users.serializers.is_token_revoked', return_value=False):
+            self.assertEqual(self.refresh(self.refresh_token).status_code, 200)
+            self.assertEqual(self.refresh(self.refresh_token).status_code, 401)
+
+
+class ActivityTests(TestCase):
+    def setUp(self):
+        # Drop what earlier tests left in the shared buffer, before their
+        # user ids are reused
+        flush_activity()
+        self.users = [
+            User.objects.create_user(email=f'active{i}@example.com', password='right-password')
+            for i in range(3)
+        ]
+        self.buffer = ActivityBuffer()
+        self.now = timezone.now()
+
+    def reload(self, user):
+        return User.objects.only('last_login', 'last_seen').get(pk=user.pk)
+
+    def test_records_are_buffered_until_flushed(self):
+        user = self.users[0]
+        self.buffer.record('last_seen', user.pk, self.now - timedelta(minutes=1))
+        self.buffer.record('last_seen', user.pk, self.now)
+        self.buffer.record('last_seen', user.pk, self.now - timedelta(minutes=2))
+        self.assertIsNone(self.reload(user).last_seen)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(self.reload(user).last_seen, self.now)
+        # Flushed entries are gone
+        self.assertEqual(self.buffer.flush(), 0)
+
+    def test_flush_writes_batches_and_never_moves_back(self):
+        newer, older, unset = self.users
+        User.objects.filter(pk=newer.pk).update(last_seen=self.now)
+        User.objects.filter(pk=older.pk).update(last_seen=self.now - timedelta(hours=1))
+        for user in self.users:
+            self.buffer.record('last_seen', user.pk, self.now - timedelta(minutes=1))
+
+        with mock.patch.object(activity_module, 'FLUSH_BATCH_SIZE', 2), self.assertNumQueries(2):
+            self.assertEqual(self.buffer.flush(), 3)
+        self.assertEqual(self.reload(newer).last_seen, self.now)
+        self.assertEqual(self.reload(older).last_seen, self.now - timedelta(minutes=1))
+        self.assertEqual(self.reload(unset).last_seen, self.now - timedelta(minutes=1))
+
+    def test_login_is_buffered(self):
+        user = self.users[0]
+        response = APIClient().post(
+            '/api/auth/auth/login/',
+            {'email': user.email, 'password': 'right-password'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(self.reload(user).last_login)
+
+        flush_activity()
+        user = self.reload(user)
+        self.assertIsNotNone(user.last_login)
+        self.assertEqual(user.last_seen, user.last_login)
+
+    @mock.patch.object(activity_module.atexit, 'register')
+    @mock.patch.object(activity_module.threading, 'Thread')
+    def test_flusher_starts_only_with_an_interval(self, thread, register):
+        # The test runner sets ACTIVITY_FLUSH_INTERVAL = 0
+        self.buffer.record('last_seen', self.users[0].pk)
+        thread.assert_not_called()
+        register.assert_not_called()
+
+        with override_settings(ACTIVITY_FLUSH_INTERVAL=30):
+            self.buffer.record('last_seen', self.users[0].pk)
+            self.buffer.record('last_seen', self.users[1].pk)
+        thread.assert_called_once_with(target=self.buffer._run, args=(30,), daemon=True)
+        register.assert_called_once_with(self.buffer._flush_at_exit)
+
+    def test_flush_at_exit(self):
+        self.buffer.record('last_login', self.users[0].pk, self.now)
+        self.buffer._flush_at_exit()
+        self.assertEqual(self.reload(self.users[0]).last_login, self.now)
+
+        # Errors are logged, not raised, while the interpreter exits
+        self.buffer.record('last_login', self.users[0].pk, self.now)
+        with mock.patch.object(self.buffer, 'flush', side_effect=RuntimeError), \
+                self.assertLogs('users.activity', 'ERROR'):
+            self.buffer._flush_at_exit()
+
+
+def make_google_key(key_id):
+    """A signer for `key_id` and its certificate in Google's PEM format."""
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.x509.oid import NameOID
+    from google.auth import crypt
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, key_id)])
+    now = datetime.now(dt_timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name).issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - timedelta(days=1)).not_valid_after(now + timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    private_pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    signer = crypt.RSASigner.from_string(private_pem, key_id=key_id)
+    return signer, cert.public_bytes(serialization.Encoding.PEM).decode()
+
+
+class CertsHandler(BaseHTTPRequestHandler):
+    """Google's certificate endpoint, serving the server's `certs`."""
+
+    def do_GET(self):
+        server = self.server
+        server.hits += 1
+        if server.failing:
+            self.send_error(503)
+            return
+        body = json.dumps(server.certs).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Cache-Control', f'public, max-age={server.max_age}, must-revalidate')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class GoogleTokenTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.keys = {key_id: make_google_key(key_id) for key_id in ('key-1', 'key-2')}
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), CertsHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.addClassCleanup(cls.server.server_close)
+        cls.addClassCleanup(cls.server.shutdown)
+        cls.certs_url = f'http://127.0.0.1:{cls.server.server_port}/oauth2/v1/certs'
+
+    def setUp(self):
+        self.server.hits = 0
+        self.server.failing = False
+        self.server.max_age = 600
+        self.serve_keys('key-1')
+
+        # Moves the verifier's and the cache's clock; google.auth checks
+        # tokens against the real time
+        self.now = self.issued = int(time.time())
+        clock = mock.patch('users.google_auth.time.time', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+        cache.delete('google-certs-test')
+        self.addCleanup(cache.delete, 'google-certs-test')
+        self.verifier = self.make_verifier()
+
+    def make_verifier(self):
+        return GoogleTokenVerifier(self.certs_url, cache_key='google-certs-test')
+
+    def serve_keys(self, *key_ids):
+        self.server.certs = {key_id: self.keys[key_id][1] for key_id in key_ids}
+
+    def token(self, key_id='key-1', audience='client-id'):
+        from google.auth import jwt
+
+        return jwt.encode(self.keys[key_id][0], {
+            'iss': 'https://accounts.google.com', 'aud': audience, 'sub': '1234',
+            'email': 'google@example.com', 'iat': self.issued, 'exp': self.issued + 3600,
+        })
+
+    def verify(self, key_id='key-1'):
+        return self.verifier.verify(self.token(key_id), 'client-id')
+
+    def wait_for_refresh(self):
+        deadline = time.monotonic() + 5
+        while self.verifier._refreshing and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_certs_are_cached(self):
+        self.assertEqual(self.verify()['email'], 'google@example.com')
+        self.verify()
+        # Another process finds them in the shared cache
+        self.verifier = self.make_verifier()
+        self.verify()
+        self.assertEqual(self.server.hits, 1)
+
+    def test_certs_expire_after_max_age(self):
+        self.verify()
+        self.now += 600 - CERTS_REFRESH_WINDOW - 1
+        self.verify()
+        self.assertEqual(self.server.hits, 1)
+
+        self.now += CERTS_REFRESH_WINDOW + 1
+        self.verifier = self.make_verifier()
+        self.verify()
+        self.assertEqual(self.server.hits, 2)
+
+    def test_certs_are_refreshed_in_the_background_before_expiry(self):
+        self.verify()
+        self.serve_keys('key-1', 'key-2')
+        self.now += 600 - CERTS_REFRESH_WINDOW
+
+        self.verify()
+        self.wait_for_refresh()
+        self.assertEqual(self.server.hits, 2)
+        self.assertIn('key-2', self.verifier.get_certs())
+
+    def test_unknown_key_id_refetches_at_most_once_a_minute(self):
+        self.verify()
+        self.serve_keys('key-1', 'key-2')
+
+        # Just fetched: Google can't have rotated again
+        with self.assertRaises(ValueError):
+            self.verify('key-2')
+        self.assertEqual(self.server.hits, 1)
+
+        self.now += MIN_REFETCH_INTERVAL
+        self.verify('key-2')
+        self.assertEqual(self.server.hits, 2)
+
+    def test_key_server_failure(self):
+        self.server.failing = True
+        with self.assertRaises(OSError):
+            self.verify()
+
+        # With certificates in hand, a failed refresh keeps them in use
+        self.server.failing = False
+        self.verify()
+        self.server.failing = True
+        self.now += 600 - CERTS_REFRESH_WINDOW
+        self.verify()
+        self.wait_for_refresh()
+        self.assertEqual(self.server.hits, 3)
+        self.verify()
+        self.wait_for_refresh()
+        self.assertEqual(self.server.hits, 4)
+
+    def test_google_sign_in(self):
+        cache.delete('google-oauth-certs')
+        self.addCleanup(cache.delete, 'google-oauth-certs')
+        # get_verifier() builds a verifier for the configured URL
+        with override_settings(GOOGLE_CERTS_URL=self.certs_url, GOOGLE_CLIENT_ID='client-id'), \
+                mock.patch('users.google_auth._verifier', None):
+            response = APIClient().post('/api/auth/auth/google/', {'token': self.token()}, format='json')
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.data['is_new_user'])
+
+            wrong_audience = self.token(audience='another-app')
+            response = APIClient().post('/api/auth/auth/google/', {'token': wrong_audience}, format='json')
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.server.hits, 1)
@@ -14,6 +14,7 @@ urlpatterns = [
     path('auth/login/', views.login_view, name='login'),
     path('auth/google/', views.google_auth_view, name='google_auth'),
     path('auth/logout/', views.logout_view, name='logout'),
+    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('auth/me/', views.current_user_view, name='current_user'),
     
     # ========== PROFILE MANAGEMENT ==========
@@ -3,22 +3,26 @@ Authentication and user management views
 """
 
 from rest_framework import status, generics
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate, get_user_model
-from google.oauth2 import id_token
-from google.auth.transport import requests
-from django.conf import settings
 
+from config.throttling import IPRateThrottle, LoginAccountThrottle, scoped
+from .activity import record_login
+from .authentication import add_user_claims
+from .google_auth import verify_google_token
+from .revocation import revoke_token
 from .serializers import (
     UserSerializer,
     RegisterSerializer,
     LoginSerializer,
     GoogleAuthSerializer,
     ProfileUpdateSerializer,
-    ChangePasswordSerializer
+    ChangePasswordSerializer,
+    LogoutSerializer
 )
 
 User = get_user_model()
@@ -27,8 +31,9 @@ User = get_user_model()
 # ========== HELPER FUNCTIONS ==========
 
 def get_tokens_for_user(user):
-    """Generate JWT tokens for a user"""
-    refresh = RefreshToken.for_user(user)
+    """Generate JWT tokens for a user, with claims for ClaimsJWTAuthentication"""
+    refresh = add_user_claims(RefreshToken.for_user(user), user)
+    record_login(user.pk)
     return {
         'access': str(refresh.access_token),
         'refresh': str(refresh),
@@ -39,6 +44,7 @@ def get_tokens_for_user(user):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([scoped(IPRateThrottle, 'register')])
 def register_view(request):
     """
     Register a new user with email and password
@@ -61,6 +67,7 @@ def register_view(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([scoped(IPRateThrottle, 'login'), LoginAccountThrottle])
 def login_view(request):
     """
     Login with email and password
@@ -92,6 +99,7 @@ def login_view(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([scoped(IPRateThrottle, 'login')])
 def google_auth_view(request):
     """
     Authenticate with Google OAuth token
@@ -105,12 +113,8 @@ def google_auth_view(request):
     token = serializer.validated_data['token']
     
     try:
-        # Verify token with Google
-        idinfo = id_token.verify_oauth2_token(
-            token,
-            requests.Request(),
-            settings.GOOGLE_CLIENT_ID
-        )
+        # Verify token against Google's cached signing certificates
+        idinfo = verify_google_token(token)
         
         # Get user info from Google
         email = idinfo.get('email')
@@ -169,9 +173,26 @@ def google_auth_view(request):
 @permission_classes([IsAuthenticated])
 def logout_view(request):
     """
-    Logout user (client should remove tokens)
+    Logout user: revokes the access token used and, if given, the refresh token
     POST /api/auth/logout/
+    Body: { "refresh": "refresh_token" } (optional)
     """
+    serializer = LogoutSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    if 'refresh' in serializer.validated_data:
+        try:
+            refresh = RefreshToken(serializer.validated_data['refresh'])
+        except TokenError:
+            # Already expired or invalid, nothing left to revoke
+            refresh = None
+        if refresh is not None and refresh.get('user_id') == request.user.pk:
+            revoke_token(refresh)
+    
+    if request.auth is not None:
+        revoke_token(request.auth)
+    
     return Response({
         'message': 'Logout successful'
     }, status=status.HTTP_200_OK)
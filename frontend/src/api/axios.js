@@ -40,8 +40,12 @@ api.interceptors.response.use(
           { refresh: refreshToken }
         );
 
-        const { access } = response.data;
+        const { access, refresh } = response.data;
         localStorage.setItem('access_token', access);
+        // Refresh tokens are rotated: the one just used is now revoked
+        if (refresh) {
+          localStorage.setItem('refresh_token', refresh);
+        }
 
         // Retry original request with new token
         originalRequest.headers.Authorization = `Bearer ${access}`;
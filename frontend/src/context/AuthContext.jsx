@@ -132,6 +132,17 @@ export const AuthProvider = ({ children }) => {
 
   // Logout user
   const logout = () => {
+    // Revoke the tokens server-side; the user is logged out locally either way
+    const access = localStorage.getItem('access_token');
+    const refresh = localStorage.getItem('refresh_token');
+    if (access) {
+      api.post(
+        '/auth/logout/',
+        refresh ? { refresh } : {},
+        { headers: { Authorization: `Bearer ${access}` } }
+      ).catch(() => {});
+    }
+
     localStorage.removeItem('access_token');
     localStorage.removeItem('refresh_token');
     setUser(null);
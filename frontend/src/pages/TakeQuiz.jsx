@@ -92,13 +92,10 @@ function TakeQuiz() {
         })
       );
 
-      const timeTaken = quiz.time_limit_minutes && timeLeft !== null
-        ? quiz.time_limit_minutes * 60 - timeLeft
-        : 0;
-
+      // The server times the attempt from its own start and deadline
       const result = await api.post(`/quizzes/${quizId}/submit/`, {
+        attempt_id: attempt.id,
         answers: formattedAnswers,
-        time_taken_seconds: timeTaken,
       });
 
       navigate(`/quiz/${quizId}/results/${result.data.id}`);